@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from app.dubbing_pipeline import DubbingPipeline, DubbingRun
+from app.pipeline import Pipeline, PipelineOutputs, PipelineRun
+from app.scheduler import CPU, GPU, NETWORK, ResourceScheduler, ResourceUsage
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    # resource held in the scheduler while `fn` runs ('' for none)
+    resource: str
+    fn: Callable[[Any], Any]
+
+
+@dataclass
+class ScheduledResult:
+    index: int
+    value: Any = None
+    error: Exception | None = None
+    failed_step: str = ''
+
+
+def run_scheduled(
+    items: list[Any],
+    steps: list[Step],
+    scheduler: ResourceScheduler,
+    *,
+    max_in_flight: int,
+) -> list[ScheduledResult]:
+    """Run every item through `steps` in order, overlapping items on different resources.
+
+    Each item runs on its own thread and each step holds its resource while it runs,
+    so the GPU transcribes one video while another downloads and a third encodes.
+    At most `max_in_flight` items are unfinished at once, which bounds how far
+    downloads run ahead. Earlier items win every contended resource. An item whose
+    step raises stops there and is reported with its error. Results come back in
+    input order.
+    """
+    results = [ScheduledResult(index=i) for i in range(len(items))]
+    in_flight = threading.Semaphore(max(1, int(max_in_flight)))
+
+    def run_item(index: int, value: Any) -> None:
+        try:
+            for step in steps:
+                try:
+                    with scheduler.use(step.resource, priority=index):
+                        value = step.fn(value)
+                except Exception as exc:  # recorded per item, the batch goes on
+                    logger.exception('Batch item failed. step=%s index=%d', step.name, index)
+                    results[index].error = exc
+                    results[index].failed_step = step.name
+                    return
+            results[index].value = value
+        finally:
+            in_flight.release()
+
+    threads: list[threading.Thread] = []
+    for index, item in enumerate(items):
+        in_flight.acquire()
+        t = threading.Thread(target=run_item, args=(index, item), name=f'batch-item-{index + 1}', daemon=True)
+        t.start()
+        threads.append(t)
+    for t in threads:
+        t.join()
+    return results
+
+
+@dataclass(frozen=True)
+class BatchItem:
+    url: str
+    outputs: PipelineOutputs | None = None
+    error: str = ''
+    failed_stage: str = ''
+
+
+@dataclass(frozen=True)
+class BatchReport:
+    items: list[BatchItem]
+    elapsed_sec: float
+    resources: list[ResourceUsage]
+
+
+def _dub_steps(dubbing: DubbingPipeline) -> list[Step]:
+    # dub steps carry (pipeline run, dubbing run) so the final step can fill in the output
+    def start(run: PipelineRun) -> tuple[PipelineRun, DubbingRun]:
+        dub = dubbing.start(
+            video_path=run.video_path,
+            audio_path=run.audio_path,
+            srt_path=run.srt_path,
+            ass_path=run.ass_path,
+            stem=run.stem,
+            separated_pair=run.separated_pair,
+            tracker=run.tracker,
+            journal=run.journal,
+        )
+        return run, dubbing.separate(dub)
+
+    def then(fn: Callable[[DubbingRun], DubbingRun]) -> Callable[[Any], Any]:
+        return lambda pair: (pair[0], fn(pair[1]))
+
+    def compose(pair: tuple[PipelineRun, DubbingRun]) -> PipelineRun:
+        run, dub = pair
+        run.dubbed_output = dubbing.compose(dub).out_video
+        run.tracker.end()
+        return run
+
+    return [
+        # Demucs, skipped (and cheap) when transcription already separated the vocals
+        Step('separate', GPU, start),
+        Step('dub_translate', NETWORK, then(dubbing.translate)),
+        Step('tts', NETWORK, then(dubbing.synthesize)),
+        Step('compose', CPU, compose),
+    ]
+
+
+def pipeline_steps(pipeline: Pipeline, resume: bool = False) -> list[Step]:
+    """Pipeline stages tagged with the resource each one is bound by."""
+    steps = [
+        Step('download', NETWORK, lambda url: pipeline.download(pipeline.start(url, resume=resume))),
+        Step('transcribe', GPU, pipeline.transcribe),
+        Step('translate', NETWORK, pipeline.translate),
+        Step('merge', CPU, pipeline.merge),
+    ]
+    if settings.pipeline_enable_dubbing:
+        return steps + _dub_steps(DubbingPipeline())
+    return steps + [Step('finish', '', pipeline.dub)]
+
+
+def run_batch(
+    urls: list[str],
+    pipeline: Pipeline,
+    *,
+    max_in_flight: int | None = None,
+    network_slots: int | None = None,
+    gpu_slots: int | None = None,
+    cpu_slots: int | None = None,
+    resume: bool = False,
+) -> BatchReport:
+    """Run many videos through the pipeline, scheduling stages by network/GPU/CPU.
+
+    `pipeline` should hold a shared transcriber so the model loads once.
+    """
+    slots = {
+        NETWORK: max(1, network_slots or settings.scheduler_network_slots),
+        GPU: max(1, gpu_slots or settings.scheduler_gpu_slots),
+        CPU: max(1, cpu_slots or settings.scheduler_cpu_slots),
+    }
+    in_flight = max(1, max_in_flight or settings.batch_max_in_flight)
+    scheduler = ResourceScheduler(slots)
+    t0 = time.perf_counter()
+    logger.info(
+        'Batch started. videos=%d max_in_flight=%d network_slots=%d gpu_slots=%d cpu_slots=%d',
+        len(urls),
+        in_flight,
+        slots[NETWORK],
+        slots[GPU],
+        slots[CPU],
+    )
+    items: list[BatchItem] = []
+    for url, res in zip(urls, run_scheduled(urls, pipeline_steps(pipeline, resume), scheduler, max_in_flight=in_flight)):
+        if res.error is not None:
+            items.append(BatchItem(url=url, error=str(res.error), failed_stage=res.failed_step))
+        else:
+            items.append(BatchItem(url=url, outputs=res.value.outputs()))
+    elapsed = time.perf_counter() - t0
+    failed = sum(1 for x in items if x.error)
+    logger.info('Batch completed. videos=%d failed=%d elapsed=%.1fs', len(items), failed, elapsed)
+    scheduler.log_report()
+    return BatchReport(items=items, elapsed_sec=elapsed, resources=scheduler.report())
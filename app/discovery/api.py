@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import base64
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from app.discovery.repository import change_counters, get_job, list_candidates_page, list_jobs_page
+
+# responses smaller than this are not worth compressing
+_GZIP_MIN_BYTES = 1024
+_MAX_PAGE = 500
+
+
+@dataclass
+class ApiResponse:
+    status: int
+    body: bytes = b''
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+class ApiError(ValueError):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def encode_cursor(values: list[object]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> list[object]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ApiError(400, 'invalid cursor') from None
+    if not isinstance(values, list):
+        raise ApiError(400, 'invalid cursor')
+    return values
+
+
+def _param(query: dict[str, list[str]], name: str, default: str = '') -> str:
+    return (query.get(name) or [default])[0].strip()
+
+
+def _int_param(query: dict[str, list[str]], name: str, default: int) -> int:
+    try:
+        return int(_param(query, name, str(default)) or default)
+    except ValueError:
+        raise ApiError(400, f'{name} must be an integer') from None
+
+
+def _candidates(db_path: Path, query: dict[str, list[str]]) -> dict[str, object]:
+    try:
+        min_score = float(_param(query, 'min_score', '0') or 0)
+    except ValueError:
+        raise ApiError(400, 'min_score must be a number') from None
+    limit = max(1, min(_int_param(query, 'limit', 100), _MAX_PAGE))
+    cursor = _param(query, 'cursor')
+    after = None
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 3:
+            raise ApiError(400, 'invalid cursor')
+        try:
+            after = (float(values[0]), str(values[1]), str(values[2]))
+        except (TypeError, ValueError):
+            raise ApiError(400, 'invalid cursor') from None
+    rows = list_candidates_page(
+        db_path,
+        min_score=min_score,
+        language=_param(query, 'lang'),
+        limit=limit + 1,
+        after=after,
+    )
+    items, more = rows[:limit], len(rows) > limit
+    for item in items:
+        item['matched_keywords'] = [x for x in str(item['matched_keywords']).split(',') if x]
+    last = items[-1] if items else None
+    next_cursor = encode_cursor([last['score'], last['discovered_at'], last['video_id']]) if more and last else ''
+    return {'items': items, 'next_cursor': next_cursor}
+
+
+def _jobs(db_path: Path, query: dict[str, list[str]]) -> dict[str, object]:
+    limit = max(1, min(_int_param(query, 'limit', 50), _MAX_PAGE))
+    cursor = _param(query, 'cursor')
+    before_id = None
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise ApiError(400, 'invalid cursor')
+        before_id = values[0]
+    rows = list_jobs_page(db_path, limit=limit + 1, before_id=before_id, status=_param(query, 'status'))
+    items, more = rows[:limit], len(rows) > limit
+    next_cursor = encode_cursor([items[-1]['id']]) if more and items else ''
+    return {'items': items, 'next_cursor': next_cursor}
+
+
+def _route(path: str) -> tuple[str, int | None]:
+    """`/api/jobs/12` -> `('jobs', 12)`; returns the resource and the optional id."""
+    parts = [p for p in path.split('/') if p][1:]
+    if parts == ['candidates']:
+        return 'candidates', None
+    if parts == ['jobs']:
+        return 'jobs', None
+    if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+        return 'job', int(parts[1])
+    raise ApiError(404, 'not found')
+
+
+_TABLE_BY_RESOURCE = {'candidates': 'discovered_videos', 'jobs': 'processing_jobs', 'job': 'processing_jobs'}
+
+
+def handle_api(db_path: Path, path: str, raw_query: str, headers: dict[str, str]) -> ApiResponse:
+    """Serve one `/api/...` GET.
+
+    The ETag hashes the table's change counter together with the request, so a client
+    revalidating with `If-None-Match` gets a `304` without any rows being read. The
+    gzip representation gets its own ETag (`-gz` suffix), and only matches while the
+    client still accepts gzip. `headers` keys are expected lower-case.
+    """
+    try:
+        resource, item_id = _route(path)
+        counter = change_counters(db_path).get(_TABLE_BY_RESOURCE[resource], 0)
+        digest = hashlib.sha1(f'{counter}|{path}|{raw_query}'.encode('utf-8')).hexdigest()[:20]
+        etag, gzip_etag = f'"{digest}"', f'"{digest}-gz"'
+        sent = [x.strip() for x in headers.get('if-none-match', '').split(',')]
+        for tag in (etag, gzip_etag) if _accepts_gzip(headers) else (etag,):
+            if tag in sent:
+                return ApiResponse(304, headers={'ETag': tag, 'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'})
+
+        query = parse_qs(raw_query)
+        if resource == 'candidates':
+            payload: dict[str, object] = _candidates(db_path, query)
+        elif resource == 'jobs':
+            payload = _jobs(db_path, query)
+        else:
+            job = get_job(db_path, int(item_id or 0))
+            if job is None:
+                raise ApiError(404, f'job {item_id} not found')
+            payload = job
+    except ApiError as exc:
+        return _json_response(exc.status, {'error': str(exc)}, headers)
+    resp = _json_response(200, payload, headers)
+    gzipped = resp.headers.get('Content-Encoding') == 'gzip'
+    resp.headers.update({'ETag': gzip_etag if gzipped else etag, 'Cache-Control': 'no-cache'})
+    return resp
+
+
+def _accepts_gzip(headers: dict[str, str]) -> bool:
+    return 'gzip' in headers.get('accept-encoding', '')
+
+
+def _json_response(status: int, payload: dict[str, object], headers: dict[str, str]) -> ApiResponse:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    out = {'Content-Type': 'application/json; charset=utf-8', 'Vary': 'Accept-Encoding'}
+    if len(body) >= _GZIP_MIN_BYTES and _accepts_gzip(headers):
+        body = gzip.compress(body, compresslevel=5)
+        out['Content-Encoding'] = 'gzip'
+    return ApiResponse(status, body, out)
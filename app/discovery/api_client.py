@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Iterator
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+
+class DashboardApiClient:
+    """Small client for the dashboard JSON API (`/api/...`).
+
+    Remembers the ETag and body of every URL it fetched, so polling an unchanged
+    resource costs a `304` with no rows read on the server and no body transferred.
+    """
+
+    def __init__(self, base_url: str, timeout_sec: float = 10.0) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.timeout_sec = timeout_sec
+        self._cache: dict[str, tuple[str, dict[str, Any]]] = {}
+        self.not_modified = 0
+
+    def fetch(self, path: str, **params: object) -> tuple[dict[str, Any], bool]:
+        """GET `path`; returns `(payload, changed)` where `changed` is False on a `304`."""
+        query = urlencode({k: v for k, v in params.items() if v not in (None, '')})
+        url = f'{self.base_url}{path}' + (f'?{query}' if query else '')
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+        cached = self._cache.get(url)
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+        try:
+            with urlopen(Request(url, headers=headers), timeout=self.timeout_sec) as resp:
+                body = resp.read()
+                if resp.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                payload = json.loads(body.decode('utf-8'))
+                etag = resp.headers.get('ETag') or ''
+        except HTTPError as exc:
+            if exc.code == 304 and cached is not None:
+                self.not_modified += 1
+                return cached[1], False
+            raise
+        if etag:
+            self._cache[url] = (etag, payload)
+        return payload, True
+
+    def iter_candidates(self, *, min_score: float = 0.0, lang: str = '', page_size: int = 100) -> Iterator[dict[str, Any]]:
+        cursor = ''
+        while True:
+            page, _ = self.fetch('/api/candidates', min_score=min_score, lang=lang, limit=page_size, cursor=cursor)
+            yield from page['items']
+            cursor = page['next_cursor']
+            if not cursor:
+                return
+
+    def iter_jobs(self, *, status: str = '', page_size: int = 50) -> Iterator[dict[str, Any]]:
+        cursor = ''
+        while True:
+            page, _ = self.fetch('/api/jobs', status=status, limit=page_size, cursor=cursor)
+            yield from page['items']
+            cursor = page['next_cursor']
+            if not cursor:
+                return
+
+    def job(self, job_id: int) -> dict[str, Any]:
+        return self.fetch(f'/api/jobs/{int(job_id)}')[0]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    conn.execute(f'PRAGMA busy_timeout={max(0, int(settings.discovery_db_busy_timeout_ms))}')
+    if settings.discovery_db_wal:
+        # WAL lets dashboard readers run while a worker holds the write lock.
+        mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        if str(mode).lower() != 'wal':
+            logger.warning('SQLite WAL mode unavailable, journal_mode=%s', mode)
+        conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA mmap_size={max(0, int(settings.discovery_db_mmap_size))}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+
+
+def _open(key: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        key,
+        timeout=max(0, int(settings.discovery_db_busy_timeout_ms)) / 1000.0,
+        isolation_level=None,
+        cached_statements=256,
+        # shared pools hand a connection to a different thread on each lease
+        check_same_thread=False,
+    )
+    _apply_pragmas(conn)
+    return conn
+
+
+class SharedConnectionPool:
+    """Bounded set of idle connections to one database, shared by short-lived threads.
+
+    `ThreadingHTTPServer` starts a thread per request, so per-thread connections would
+    be opened (and the pragmas re-run) on every request. Request threads lease from
+    here instead (see `leased_connections`). A lease never blocks: when every pooled
+    connection is in use a new one is opened, and on return it is closed if `max_idle`
+    connections are already waiting.
+    """
+
+    def __init__(self, db_path: Path, max_idle: int = 8) -> None:
+        self.key = str(Path(db_path).resolve())
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=max(1, int(max_idle)))
+        self.opened = 0
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            self.opened += 1
+            return _open(self.key)
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def get_connection(db_path: Path) -> sqlite3.Connection:
+    """Per-thread pooled connection to `db_path`.
+
+    Connections are opened once per thread in autocommit mode (transactions are explicit,
+    see `transaction`) and keep a statement cache, so the constant SQL strings used by
+    the repository are compiled once per thread instead of on every call. Inside
+    `leased_connections` the connection is leased from the shared pool instead, on
+    first use.
+    """
+    pool: dict[str, sqlite3.Connection] | None = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = {}
+        _local.pool = pool
+    key = str(Path(db_path).resolve())
+    conn = pool.get(key)
+    if conn is None:
+        shared: SharedConnectionPool | None = getattr(_local, 'shared', None)
+        if shared is not None and shared.key == key:
+            conn = shared.acquire()
+            _local.leased = conn
+        else:
+            conn = _open(key)
+        pool[key] = conn
+    return conn
+
+
+@contextmanager
+def leased_connections(shared: SharedConnectionPool) -> Iterator[None]:
+    """Serve this thread's `get_connection` for the pool's database from `shared`.
+
+    The connection is only leased when the block first touches the database (a
+    long-lived SSE stream never does), and it goes back to the pool on exit. Any
+    other connection the block opened is closed.
+    """
+    _local.shared = shared
+    _local.leased = None
+    try:
+        yield
+    finally:
+        leased = _local.leased
+        _local.shared = _local.leased = None
+        pool: dict[str, sqlite3.Connection] = getattr(_local, 'pool', None) or {}
+        if leased is not None:
+            pool.pop(shared.key, None)
+            shared.release(leased)
+        close_thread_connections()
+
+
+@contextmanager
+def transaction(db_path: Path, *, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+    """Run a block in one transaction on the pooled connection.
+
+    `immediate=True` takes the write lock up front (`BEGIN IMMEDIATE`), which is what
+    read-then-write sequences such as job claiming need to stay atomic.
+    """
+    conn = get_connection(db_path)
+    conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def close_thread_connections() -> None:
+    pool: dict[str, sqlite3.Connection] | None = getattr(_local, 'pool', None)
+    if not pool:
+        return
+    for conn in pool.values():
+        conn.close()
+    pool.clear()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import threading
+from collections import deque
+
+
+class EventBus:
+    """Bounded in-memory event log for the dashboard's SSE stream.
+
+    Every event gets a monotonically increasing id; only the newest `capacity` are
+    kept, so a slow or absent client never makes the dashboard grow. Readers block on
+    a condition variable instead of polling, and resume from `Last-Event-ID`.
+    """
+
+    def __init__(self, capacity: int = 2000) -> None:
+        self._events: deque[tuple[int, dict]] = deque(maxlen=max(1, int(capacity)))
+        self._cond = threading.Condition()
+        self._last_id = 0
+
+    @property
+    def last_id(self) -> int:
+        with self._cond:
+            return self._last_id
+
+    def publish(self, payload: dict) -> int:
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, payload))
+            self._cond.notify_all()
+            return self._last_id
+
+    def since(self, last_id: int, timeout: float | None = None) -> list[tuple[int, dict]]:
+        """Events newer than `last_id`, waiting up to `timeout` seconds for the first one.
+
+        Events already dropped from the buffer are skipped silently.
+        """
+        with self._cond:
+            if self._last_id <= last_id:
+                self._cond.wait_for(lambda: self._last_id > last_id, timeout=timeout)
+            return [(eid, payload) for eid, payload in self._events if eid > last_id]
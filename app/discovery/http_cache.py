@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from app.discovery.db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# query params that do not change the response (credentials)
+_UNCACHED_PARAMS = {'key'}
+
+
+def cache_key(url: str) -> str:
+    """URL without the API key and with sorted params, so rotating keys share entries."""
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _UNCACHED_PARAMS)
+    return f'{parts.netloc}{parts.path}?{urlencode(params)}'
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    payload: dict
+    etag: str
+    age_sec: float
+
+
+class ResponseCache:
+    """Persistent JSON response cache in the discovery DB (`http_cache` table).
+
+    Entries younger than the endpoint's TTL are served without any request; older ones
+    keep their ETag so the client can revalidate with `If-None-Match`. Bodies are stored
+    zlib-compressed since `videos` pages are mostly repeated snippet text.
+    """
+
+    def __init__(self, db_path: Path, ttl_by_endpoint: dict[str, float]) -> None:
+        self.db_path = db_path
+        self.ttl_by_endpoint = ttl_by_endpoint
+
+    def ttl(self, endpoint: str) -> float:
+        return max(0.0, float(self.ttl_by_endpoint.get(endpoint, 0.0)))
+
+    def get(self, key: str) -> CachedResponse | None:
+        row = get_connection(self.db_path).execute(
+            'SELECT etag, body, fetched_at FROM http_cache WHERE key=?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            payload = json.loads(zlib.decompress(row[1]).decode('utf-8'))
+        except (zlib.error, ValueError):
+            logger.warning('HTTP cache entry unreadable, ignoring. key=%s', key)
+            return None
+        return CachedResponse(payload=payload, etag=str(row[0]), age_sec=max(0.0, time.time() - float(row[2])))
+
+    def put(self, key: str, endpoint: str, etag: str, body: bytes) -> None:
+        get_connection(self.db_path).execute(
+            """
+            INSERT INTO http_cache(key, endpoint, etag, body, fetched_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                etag=excluded.etag,
+                body=excluded.body,
+                fetched_at=excluded.fetched_at
+            """,
+            (key, endpoint, etag, zlib.compress(body), time.time()),
+        )
+
+    def touch(self, key: str) -> None:
+        """Restart the TTL after a `304 Not Modified`."""
+        get_connection(self.db_path).execute('UPDATE http_cache SET fetched_at=? WHERE key=?', (time.time(), key))
+
+    def prune(self, max_age_sec: float) -> int:
+        cur = get_connection(self.db_path).execute(
+            'DELETE FROM http_cache WHERE fetched_at < ?',
+            (time.time() - max(0.0, max_age_sec),),
+        )
+        return int(cur.rowcount)
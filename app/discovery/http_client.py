@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import http.client
+import json
+import logging
+import ssl
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, getproxies, proxy_bypass, urlopen
+
+from app.discovery.http_cache import ResponseCache, cache_key
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_USER_AGENT = 'youtobe-parser/1.0'
+# what an idle keep-alive connection the server already closed fails with on reuse
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class ApiHttpError(RuntimeError):
+    """Non-retryable (or retries exhausted) HTTP status from the API."""
+
+    def __init__(self, status: int, url: str, body: bytes) -> None:
+        self.status = status
+        self.url = url
+        self.body = body
+        super().__init__(f'HTTP {status} for {url.split("?", 1)[0]}')
+
+    def json(self) -> dict:
+        try:
+            return json.loads(self.body.decode('utf-8'))
+        except ValueError:
+            return {}
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    cache_hits: int = 0
+    not_modified: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ApiHttpClient:
+    """Thread-safe JSON GET client with a keep-alive connection pool per host.
+
+    Idle `http.client` connections are reused across threads, so concurrent discovery
+    pays one TLS handshake per pooled connection instead of one per request. When a proxy
+    is configured in the environment it falls back to `urlopen`, which handles proxies.
+    Latency per endpoint (last path segment, e.g. `search`) is recorded for `log_summary`.
+
+    With a `ResponseCache`, fresh entries are returned without touching the network and
+    expired ones are revalidated with `If-None-Match`.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int,
+        timeout_sec: float,
+        retries: int,
+        backoff_sec: float,
+        cache: ResponseCache | None = None,
+    ) -> None:
+        self.max_connections = max(1, int(max_connections))
+        self.timeout_sec = max(1.0, float(timeout_sec))
+        self.retries = max(1, int(retries))
+        self.backoff_sec = max(0.2, float(backoff_sec))
+        self._idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self._stats: dict[str, EndpointStats] = {}
+        self._opened = 0
+        self._ssl_context = ssl.create_default_context()
+        self.cache = cache
+
+    @classmethod
+    def from_settings(cls, cache: ResponseCache | None = None) -> ApiHttpClient:
+        return cls(
+            max_connections=settings.discovery_concurrency,
+            timeout_sec=settings.discovery_http_timeout_sec,
+            retries=settings.discovery_http_retries,
+            backoff_sec=settings.discovery_http_retry_backoff_sec,
+            cache=cache,
+        )
+
+    def _acquire(self, scheme: str, netloc: str, *, fresh: bool = False) -> tuple[http.client.HTTPConnection, bool]:
+        """A pooled idle connection (`reused=True`) or, if none or `fresh`, a new one."""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle and not fresh:
+                return idle.pop(), True
+            self._opened += 1
+        if scheme == 'https':
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout_sec, context=self._ssl_context), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout_sec), False
+
+    def _release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.max_connections:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _fetch_pooled(self, url: str, headers: dict[str, str]) -> tuple[int, bytes, str]:
+        parts = urlsplit(url)
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        conn, reused = self._acquire(parts.scheme, parts.netloc)
+        while True:
+            try:
+                conn.request('GET', path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+                break
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                # the server dropped the idle connection; not an endpoint failure, so no backoff
+                logger.debug('Pooled connection closed by server, reconnecting. host=%s', parts.netloc)
+                conn, reused = self._acquire(parts.scheme, parts.netloc, fresh=True)
+            except BaseException:
+                conn.close()
+                raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(parts.scheme, parts.netloc, conn)
+        return resp.status, body, resp.getheader('ETag') or ''
+
+    def _fetch_urlopen(self, url: str, headers: dict[str, str]) -> tuple[int, bytes, str]:
+        req = Request(url, headers=headers)
+        try:
+            with urlopen(req, timeout=self.timeout_sec) as resp:
+                return int(resp.status), resp.read(), resp.headers.get('ETag') or ''
+        except HTTPError as exc:
+            return int(exc.code), exc.read(), ''
+
+    def _count(self, endpoint: str, attr: str) -> None:
+        with self._lock:
+            st = self._stats.setdefault(endpoint, EndpointStats())
+            setattr(st, attr, getattr(st, attr) + 1)
+
+    def _record(self, endpoint: str, latency: float, *, error: bool, retry: bool) -> None:
+        with self._lock:
+            st = self._stats.setdefault(endpoint, EndpointStats())
+            st.requests += 1
+            st.latencies.append(latency)
+            st.errors += int(error)
+            st.retries += int(retry)
+
+    def get_json(self, url: str, *, before_request: Callable[[], None] | None = None) -> dict:
+        """GET `url` as JSON.
+
+        `before_request` runs once right before the first network attempt (not for cache
+        hits), e.g. to charge API quota; an exception from it aborts the call.
+        """
+        parts = urlsplit(url)
+        endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1] or '/'
+        key = cache_key(url) if self.cache is not None else ''
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None and cached.age_sec < self.cache.ttl(endpoint):
+            self._count(endpoint, 'cache_hits')
+            return cached.payload
+        if before_request is not None:
+            before_request()
+
+        headers = {'Accept': 'application/json', 'User-Agent': _USER_AGENT}
+        if cached is not None and cached.etag:
+            headers['If-None-Match'] = cached.etag
+        use_proxy = bool(getproxies().get(parts.scheme)) and not proxy_bypass(parts.hostname or '')
+        last_err: Exception | None = None
+        for i in range(1, self.retries + 1):
+            t0 = time.perf_counter()
+            try:
+                fetch = self._fetch_urlopen if use_proxy else self._fetch_pooled
+                status, body, etag = fetch(url, headers)
+            except (http.client.HTTPException, URLError, ssl.SSLError, OSError) as exc:
+                # a reused keep-alive connection the server closed was already retried in `_fetch_pooled`
+                self._record(endpoint, time.perf_counter() - t0, error=True, retry=i < self.retries)
+                last_err = exc
+            else:
+                if status == 304 and cached is not None:
+                    self._record(endpoint, time.perf_counter() - t0, error=False, retry=False)
+                    self._count(endpoint, 'not_modified')
+                    self.cache.touch(key)
+                    return cached.payload
+                ok = 200 <= status < 300
+                retryable = status >= 500 or status == 429
+                self._record(endpoint, time.perf_counter() - t0, error=not ok, retry=retryable and i < self.retries)
+                if ok:
+                    payload = json.loads(body.decode('utf-8'))
+                    if self.cache is not None:
+                        # the Data API also puts the resource etag in the body
+                        self.cache.put(key, endpoint, etag or str(payload.get('etag') or ''), body)
+                    return payload
+                last_err = ApiHttpError(status, url, body)
+                # 4xx (except 429) are usually hard failures; no need to retry.
+                if not retryable:
+                    raise last_err
+            if i < self.retries:
+                time.sleep(self.backoff_sec * i)
+        if last_err is not None:
+            raise last_err
+        raise RuntimeError('Unknown http error')
+
+    @property
+    def connections_opened(self) -> int:
+        return self._opened
+
+    def stats(self) -> dict[str, EndpointStats]:
+        with self._lock:
+            return {
+                k: EndpointStats(v.requests, v.errors, v.retries, v.cache_hits, v.not_modified, list(v.latencies))
+                for k, v in self._stats.items()
+            }
+
+    def log_summary(self) -> None:
+        for endpoint, st in sorted(self.stats().items()):
+            logger.info(
+                'Discovery API latency. endpoint=%s requests=%d errors=%d retries=%d cache_hits=%d not_modified=%d '
+                'p50=%.3fs p95=%.3fs max=%.3fs',
+                endpoint,
+                st.requests,
+                st.errors,
+                st.retries,
+                st.cache_hits,
+                st.not_modified,
+                st.percentile(0.5),
+                st.percentile(0.95),
+                max(st.latencies, default=0.0),
+            )
+        logger.info('Discovery API connections opened=%d', self._opened)
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._idle.values())
+            self._idle.clear()
+        for idle in pools:
+            for conn in idle:
+                conn.close()
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Callable
+
+from app.discovery.db import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+Migration = Callable[[sqlite3.Connection], None]
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    """Add missing columns to an existing table (`CREATE TABLE IF NOT EXISTS` never alters)."""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}')
+
+
+def _v1_baseline(conn: sqlite3.Connection) -> None:
+    """Original schema; a no-op on databases created before versioning."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS discovered_videos (
+            video_id TEXT PRIMARY KEY,
+            discovered_at TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            channel_title TEXT NOT NULL,
+            published_at TEXT NOT NULL,
+            language_hint TEXT NOT NULL,
+            duration_sec INTEGER NOT NULL,
+            view_count INTEGER NOT NULL,
+            comment_count INTEGER NOT NULL,
+            like_count INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            score REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'discovered',
+            raw_json TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_discovered_score ON discovered_videos(score DESC)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_discovered_at ON discovered_videos(discovered_at DESC)')
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS processing_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id TEXT NOT NULL,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            started_at TEXT NOT NULL DEFAULT '',
+            finished_at TEXT NOT NULL DEFAULT '',
+            error TEXT NOT NULL DEFAULT '',
+            bilingual_video TEXT NOT NULL DEFAULT '',
+            dubbed_video TEXT NOT NULL DEFAULT '',
+            log_path TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON processing_jobs(status, created_at DESC)')
+
+
+def _v2_job_workers(conn: sqlite3.Connection) -> None:
+    # databases created by the unversioned init_db may already have these columns
+    _ensure_columns(
+        conn,
+        'processing_jobs',
+        {
+            'resource_class': "TEXT NOT NULL DEFAULT 'default'",
+            'worker_id': "TEXT NOT NULL DEFAULT ''",
+            'heartbeat_at': "TEXT NOT NULL DEFAULT ''",
+            'attempts': 'INTEGER NOT NULL DEFAULT 0',
+        },
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_workers (
+            worker_id TEXT PRIMARY KEY,
+            resource_class TEXT NOT NULL,
+            status TEXT NOT NULL,
+            job_id INTEGER,
+            started_at TEXT NOT NULL,
+            heartbeat_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _v3_slim_discovered_videos(conn: sqlite3.Connection) -> None:
+    """Move `description`/`raw_json` to a side table and add `language_norm`.
+
+    Listing pages only read the slim table, and the dashboard's language filter becomes
+    an index range on `language_norm` instead of a `lower(language_hint) LIKE` scan.
+    SQLite cannot drop columns in place on older versions, so the table is rebuilt.
+    """
+    conn.execute(
+        """
+        CREATE TABLE discovered_videos_raw (
+            video_id TEXT PRIMARY KEY,
+            description TEXT NOT NULL,
+            raw_json TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        'INSERT INTO discovered_videos_raw(video_id, description, raw_json) '
+        'SELECT video_id, description, raw_json FROM discovered_videos'
+    )
+    conn.execute(
+        """
+        CREATE TABLE discovered_videos_v3 (
+            video_id TEXT PRIMARY KEY,
+            discovered_at TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            channel_id TEXT NOT NULL,
+            channel_title TEXT NOT NULL,
+            published_at TEXT NOT NULL,
+            language_hint TEXT NOT NULL,
+            language_norm TEXT NOT NULL,
+            duration_sec INTEGER NOT NULL,
+            view_count INTEGER NOT NULL,
+            comment_count INTEGER NOT NULL,
+            like_count INTEGER NOT NULL,
+            keyword TEXT NOT NULL,
+            score REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'discovered'
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO discovered_videos_v3 (
+            video_id, discovered_at, url, title, channel_id, channel_title, published_at,
+            language_hint, language_norm, duration_sec, view_count, comment_count, like_count,
+            keyword, score, status
+        )
+        SELECT
+            video_id, discovered_at, url, title, channel_id, channel_title, published_at,
+            language_hint, lower(trim(language_hint)), duration_sec, view_count, comment_count, like_count,
+            keyword, score, status
+        FROM discovered_videos
+        """
+    )
+    conn.execute('DROP TABLE discovered_videos')
+    conn.execute('ALTER TABLE discovered_videos_v3 RENAME TO discovered_videos')
+    # `score >= ? ORDER BY score DESC, discovered_at DESC` walks this index without a sort step
+    conn.execute('CREATE INDEX idx_discovered_score ON discovered_videos(score DESC, discovered_at DESC)')
+    conn.execute('CREATE INDEX idx_discovered_at ON discovered_videos(discovered_at DESC)')
+    # a range on language_norm still needs a sort for ORDER BY score; replaced in v11
+    conn.execute(
+        'CREATE INDEX idx_discovered_lang_score ON discovered_videos(language_norm, score DESC, discovered_at DESC)'
+    )
+    conn.execute('CREATE INDEX idx_jobs_video_status ON processing_jobs(video_id, status)')
+
+
+def _v4_matched_keywords(conn: sqlite3.Connection) -> None:
+    # comma-joined; keywords come from comma-separated settings so they never contain one
+    _ensure_columns(conn, 'discovered_videos', {'matched_keywords': "TEXT NOT NULL DEFAULT ''"})
+
+
+def _v5_quota_ledger(conn: sqlite3.Connection) -> None:
+    # `day` is the Pacific date the API quota is counted against
+    conn.execute(
+        """
+        CREATE TABLE api_quota_ledger (
+            day TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            keyword TEXT NOT NULL,
+            calls INTEGER NOT NULL,
+            units INTEGER NOT NULL,
+            PRIMARY KEY (day, endpoint, keyword)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE keyword_stats (
+            keyword TEXT PRIMARY KEY,
+            runs INTEGER NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            kept INTEGER NOT NULL DEFAULT 0,
+            last_run_at TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+
+
+def _v6_http_cache(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE http_cache (
+            key TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            etag TEXT NOT NULL,
+            body BLOB NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute('CREATE INDEX idx_http_cache_fetched ON http_cache(fetched_at)')
+
+
+def _v7_keyword_cursors(conn: sqlite3.Connection) -> None:
+    # high-water mark per keyword for incremental discovery
+    conn.execute(
+        """
+        CREATE TABLE keyword_cursors (
+            keyword TEXT PRIMARY KEY,
+            last_published_at TEXT NOT NULL DEFAULT '',
+            page_token TEXT NOT NULL DEFAULT '',
+            last_run_at TEXT NOT NULL DEFAULT ''
+        )
+        """
+    )
+    conn.execute('CREATE INDEX idx_discovered_published ON discovered_videos(published_at DESC)')
+
+
+def _v8_change_counters(conn: sqlite3.Connection) -> None:
+    """Per-table change counters bumped by triggers; the JSON API derives ETags from them."""
+    conn.execute(
+        """
+        CREATE TABLE change_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # job heartbeats are not a visible change, so `processing_jobs` only counts these columns
+    watched = {
+        'discovered_videos': '',
+        'processing_jobs': ' OF status, started_at, finished_at, error, bilingual_video, dubbed_video, log_path',
+    }
+    for table, update_of in watched.items():
+        conn.execute('INSERT INTO change_counters(name, value) VALUES (?, 0)', (table,))
+        for event in ('INSERT', f'UPDATE{update_of}', 'DELETE'):
+            suffix = event.split()[0].lower()
+            conn.execute(
+                f"""
+                CREATE TRIGGER trg_{table}_{suffix}_changes AFTER {event} ON {table}
+                BEGIN
+                    UPDATE change_counters SET value=value + 1 WHERE name='{table}';
+                END
+                """
+            )
+
+
+def _v9_job_priority(conn: sqlite3.Connection) -> None:
+    # priority defaults to the candidate score at enqueue time; deadline_at is ISO UTC or ''
+    _ensure_columns(
+        conn,
+        'processing_jobs',
+        {
+            'priority': 'REAL NOT NULL DEFAULT 0',
+            'channel_id': "TEXT NOT NULL DEFAULT ''",
+            'deadline_at': "TEXT NOT NULL DEFAULT ''",
+        },
+    )
+    conn.execute(
+        """
+        UPDATE processing_jobs SET
+            priority=COALESCE((SELECT score FROM discovered_videos d WHERE d.video_id=processing_jobs.video_id), 0),
+            channel_id=COALESCE((SELECT channel_id FROM discovered_videos d WHERE d.video_id=processing_jobs.video_id), '')
+        WHERE status='pending'
+        """
+    )
+    # boosts and deadlines are visible changes for the JSON API ETags (see v8)
+    conn.execute('DROP TRIGGER trg_processing_jobs_update_changes')
+    conn.execute(
+        """
+        CREATE TRIGGER trg_processing_jobs_update_changes AFTER UPDATE OF
+            status, started_at, finished_at, error, bilingual_video, dubbed_video, log_path, priority, deadline_at
+        ON processing_jobs
+        BEGIN
+            UPDATE change_counters SET value=value + 1 WHERE name='processing_jobs';
+        END
+        """
+    )
+    # claim reads the best pending jobs straight off this index
+    conn.execute(
+        'CREATE INDEX idx_jobs_status_priority ON processing_jobs(status, priority DESC, created_at, id)'
+    )
+
+
+def _v10_job_api_changes(conn: sqlite3.Connection) -> None:
+    # every column the JSON API returns must bump the counter, or a strong ETag serves a stale body;
+    # heartbeat_at stays out of both the API payload and the trigger
+    conn.execute('DROP TRIGGER trg_processing_jobs_update_changes')
+    conn.execute(
+        """
+        CREATE TRIGGER trg_processing_jobs_update_changes AFTER UPDATE OF
+            status, started_at, finished_at, error, bilingual_video, dubbed_video, log_path, priority, deadline_at,
+            attempts, worker_id, resource_class, channel_id, url
+        ON processing_jobs
+        BEGIN
+            UPDATE change_counters SET value=value + 1 WHERE name='processing_jobs';
+        END
+        """
+    )
+
+
+def _v11_base_language(conn: sqlite3.Connection) -> None:
+    """Add `lang`, the base language (`en-US` -> `en`), and index the listing on it.
+
+    The dashboard's `lang=en` filter was a range on `language_norm`, which matches nearly
+    every row and left ORDER BY score to a sort of all of them. An equality on `lang`
+    walks `idx_discovered_lang_score` already in listing order, so a page reads `limit` rows.
+    """
+    _ensure_columns(conn, 'discovered_videos', {'lang': "TEXT NOT NULL DEFAULT ''"})
+    conn.execute(
+        """
+        UPDATE discovered_videos SET lang = CASE
+            WHEN instr(replace(language_norm, '_', '-'), '-') > 0
+            THEN substr(language_norm, 1, instr(replace(language_norm, '_', '-'), '-') - 1)
+            ELSE language_norm
+        END
+        """
+    )
+    conn.execute('DROP INDEX IF EXISTS idx_discovered_lang_score')
+    conn.execute(
+        'CREATE INDEX idx_discovered_lang_score '
+        'ON discovered_videos(lang, score DESC, discovered_at DESC, video_id DESC)'
+    )
+
+
+MIGRATIONS: list[tuple[int, str, Migration]] = [
+    (1, 'baseline', _v1_baseline),
+    (2, 'job workers', _v2_job_workers),
+    (3, 'slim discovered_videos', _v3_slim_discovered_videos),
+    (4, 'matched keywords', _v4_matched_keywords),
+    (5, 'quota ledger', _v5_quota_ledger),
+    (6, 'http cache', _v6_http_cache),
+    (7, 'keyword cursors', _v7_keyword_cursors),
+    (8, 'change counters', _v8_change_counters),
+    (9, 'job priority', _v9_job_priority),
+    (10, 'job api change columns', _v10_job_api_changes),
+    (11, 'base language', _v11_base_language),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(db_path: Path) -> int:
+    return int(get_connection(db_path).execute('PRAGMA user_version').fetchone()[0])
+
+
+def migrate(db_path: Path) -> int:
+    """Apply pending migrations, each in its own write transaction; returns the final version.
+
+    The version is re-read after taking the write lock, so concurrent `init_db` calls from
+    the dashboard and a CLI run apply every step exactly once.
+    """
+    if schema_version(db_path) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+    for version, name, apply in MIGRATIONS:
+        with transaction(db_path, immediate=True) as conn:
+            current = int(conn.execute('PRAGMA user_version').fetchone()[0])
+            if current >= version:
+                continue
+            apply(conn)
+            conn.execute(f'PRAGMA user_version={version}')
+        logger.info('Discovery db migrated. version=%d name=%s path=%s', version, name, db_path)
+    # refresh planner statistics for the rebuilt indexes
+    get_connection(db_path).execute('PRAGMA optimize')
+    return schema_version(db_path)
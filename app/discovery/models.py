@@ -20,4 +20,6 @@ class VideoCandidate:
     keyword: str
     score: float
     raw_json: str
+    # every keyword whose search returned this video, in keyword order
+    matched_keywords: tuple[str, ...] = ()
 
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API v3 cost per call, see the API quota calculator
+API_COST = {'search': 100, 'videos': 1}
+
+# error reasons meaning the project's daily quota is gone (403)
+QUOTA_ERROR_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+try:
+    from zoneinfo import ZoneInfo
+
+    _QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:  # tzdata missing (e.g. bare Windows): PST is close enough for day bucketing
+    _QUOTA_TZ = timezone(timedelta(hours=-8))
+
+
+def quota_day(now: datetime | None = None) -> str:
+    """Quota resets at midnight Pacific time, so usage is bucketed by the Pacific date."""
+    return (now or datetime.now(timezone.utc)).astimezone(_QUOTA_TZ).date().isoformat()
+
+
+class QuotaExhausted(RuntimeError):
+    """Raised when a call would exceed the budget or the API reports the quota is gone."""
+
+
+@dataclass(frozen=True)
+class QuotaUsage:
+    endpoint: str
+    units: int
+    keyword: str = ''
+
+
+@dataclass
+class KeywordStats:
+    keyword: str
+    runs: int = 0
+    units: int = 0
+    kept: int = 0
+    last_run_at: str = ''
+
+    @property
+    def yield_per_unit(self) -> float:
+        return self.kept / self.units if self.units > 0 else 0.0
+
+
+@dataclass
+class QuotaBudget:
+    """Thread-safe hard budget for one discovery run.
+
+    `charge` reserves the units before a call is made and refuses calls that would
+    exceed the day's budget, so discovery stops cleanly instead of hitting the API cap
+    halfway through. Each accepted search also holds back one `videos` unit until a
+    details call consumes it, so the ids searches return can still be resolved even
+    though details are fetched after the searches. Once the API itself reports the quota as gone, every
+    further call is refused. Accepted charges are kept in `usage` for the ledger.
+    """
+
+    daily_budget: int
+    spent_today: int = 0
+    usage: list[QuotaUsage] = field(default_factory=list)
+    exhausted: bool = False
+    # `videos` units held back for details of searches already charged
+    reserved: int = 0
+    _api_exhausted: bool = field(default=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.daily_budget - self.spent_today - self.reserved)
+
+    def charge(self, endpoint: str, keyword: str = '') -> None:
+        units = API_COST.get(endpoint, 1)
+        with self._lock:
+            if self._api_exhausted:
+                raise QuotaExhausted('API quota exhausted earlier in this run')
+            reserve = 0
+            release = 0
+            if endpoint == 'search':
+                reserve = API_COST['videos']
+            elif endpoint == 'videos':
+                release = min(self.reserved, units)
+            if self.spent_today + self.reserved - release + units + reserve > self.daily_budget:
+                if not self.exhausted:
+                    logger.warning(
+                        'Discovery quota budget reached, skipping further calls. spent=%d budget=%d next=%s(%d)',
+                        self.spent_today,
+                        self.daily_budget,
+                        endpoint,
+                        units,
+                    )
+                self.exhausted = True
+                raise QuotaExhausted(f'daily quota budget {self.daily_budget} reached')
+            self.spent_today += units
+            self.reserved += reserve - release
+            self.usage.append(QuotaUsage(endpoint=endpoint, units=units, keyword=keyword))
+
+    def mark_exhausted(self, reason: str) -> None:
+        with self._lock:
+            if not self._api_exhausted:
+                logger.warning('YouTube API reported quota exhausted, stopping discovery. reason=%s', reason)
+            self._api_exhausted = True
+            self.exhausted = True
+
+
+def plan_keywords(keywords: list[str], stats: dict[str, KeywordStats]) -> list[str]:
+    """Order keywords by historical candidates kept per quota unit, best first.
+
+    Keywords never run before go first so they get measured; ties keep configured order.
+    """
+    order = {kw: i for i, kw in enumerate(keywords)}
+
+    def key(kw: str) -> tuple[int, float, int]:
+        st = stats.get(kw)
+        if st is None or st.units <= 0:
+            return (0, 0.0, order[kw])
+        return (1, -st.yield_per_unit, order[kw])
+
+    return sorted(keywords, key=key)
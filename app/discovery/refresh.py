@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RefreshStatus:
+    state: str = 'idle'  # idle | running | success | failed
+    run_id: int = 0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    selected: int = 0
+    error: str = ''
+
+    @property
+    def running(self) -> bool:
+        return self.state == 'running'
+
+    def as_dict(self) -> dict[str, object]:
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            'state': self.state,
+            'run_id': self.run_id,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'elapsed_sec': round(elapsed, 3),
+            'selected': self.selected,
+            'error': self.error,
+        }
+
+
+class SingleFlightRefresh:
+    """Runs discovery refreshes in a background thread, at most one at a time.
+
+    `start()` returns immediately; while a run is in flight further calls join it
+    instead of starting a duplicate. Progress is read with `status()`.
+    """
+
+    def __init__(self, run: Callable[[], int]) -> None:
+        self._run = run
+        self._lock = threading.Lock()
+        self._status = RefreshStatus()
+
+    def status(self) -> RefreshStatus:
+        with self._lock:
+            return self._status
+
+    def start(self) -> tuple[bool, RefreshStatus]:
+        """Start a run unless one is in flight; returns `(started, status)`."""
+        with self._lock:
+            if self._status.running:
+                return False, self._status
+            self._status = RefreshStatus(state='running', run_id=self._status.run_id + 1, started_at=time.time())
+            status = self._status
+        threading.Thread(target=self._work, args=(status.run_id,), name='discovery-refresh', daemon=True).start()
+        return True, status
+
+    def wait(self, timeout: float | None = None) -> RefreshStatus:
+        """Block until the current run finishes (for tests and CLI use)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status()
+            if not status.running or (deadline is not None and time.monotonic() >= deadline):
+                return status
+            time.sleep(0.05)
+
+    def _work(self, run_id: int) -> None:
+        try:
+            selected = int(self._run())
+        except Exception as exc:
+            logger.exception('Discovery refresh failed. run=%d', run_id)
+            self._finish(state='failed', error=str(exc))
+        else:
+            logger.info('Discovery refresh done. run=%d selected=%d', run_id, selected)
+            self._finish(state='success', selected=selected)
+
+    def _finish(self, **changes: object) -> None:
+        with self._lock:
+            self._status = replace(self._status, finished_at=time.time(), **changes)
@@ -1,89 +1,59 @@
 from __future__ import annotations
 
-import sqlite3
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
 
+from app.discovery.db import get_connection, transaction
+from app.discovery.migrations import migrate
 from app.discovery.models import VideoCandidate
+from app.discovery.quota import KeywordStats, QuotaUsage
+from app.discovery.scoring import score_batch
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
 
 
 def init_db(db_path: Path) -> None:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS discovered_videos (
-                video_id TEXT PRIMARY KEY,
-                discovered_at TEXT NOT NULL,
-                url TEXT NOT NULL,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                channel_id TEXT NOT NULL,
-                channel_title TEXT NOT NULL,
-                published_at TEXT NOT NULL,
-                language_hint TEXT NOT NULL,
-                duration_sec INTEGER NOT NULL,
-                view_count INTEGER NOT NULL,
-                comment_count INTEGER NOT NULL,
-                like_count INTEGER NOT NULL,
-                keyword TEXT NOT NULL,
-                score REAL NOT NULL,
-                status TEXT NOT NULL DEFAULT 'discovered',
-                raw_json TEXT NOT NULL
-            )
-            """
-        )
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_discovered_score ON discovered_videos(score DESC)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_discovered_at ON discovered_videos(discovered_at DESC)')
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS processing_jobs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                video_id TEXT NOT NULL,
-                url TEXT NOT NULL,
-                status TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                started_at TEXT NOT NULL DEFAULT '',
-                finished_at TEXT NOT NULL DEFAULT '',
-                error TEXT NOT NULL DEFAULT '',
-                bilingual_video TEXT NOT NULL DEFAULT '',
-                dubbed_video TEXT NOT NULL DEFAULT '',
-                log_path TEXT NOT NULL DEFAULT ''
-            )
-            """
-        )
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON processing_jobs(status, created_at DESC)')
+    migrate(db_path)
+
+
+def base_language(hint: str) -> str:
+    """`'en-US'` / `'en_gb'` / `'EN'` -> `'en'`: the value stored in and matched against `lang`."""
+    return hint.strip().lower().replace('_', '-').split('-', 1)[0]
 
 
 def upsert_candidates(db_path: Path, items: list[VideoCandidate]) -> int:
     if not items:
         return 0
-    now = datetime.now(timezone.utc).isoformat()
-    with sqlite3.connect(db_path) as conn:
+    now = _utc_now()
+    with transaction(db_path) as conn:
         conn.executemany(
             """
             INSERT INTO discovered_videos (
-                video_id, discovered_at, url, title, description, channel_id, channel_title,
-                published_at, language_hint, duration_sec, view_count, comment_count, like_count,
-                keyword, score, status, raw_json
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'discovered', ?)
+                video_id, discovered_at, url, title, channel_id, channel_title, published_at,
+                language_hint, language_norm, lang, duration_sec, view_count, comment_count, like_count,
+                keyword, matched_keywords, score, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'discovered')
             ON CONFLICT(video_id) DO UPDATE SET
                 discovered_at=excluded.discovered_at,
                 url=excluded.url,
                 title=excluded.title,
-                description=excluded.description,
                 channel_id=excluded.channel_id,
                 channel_title=excluded.channel_title,
                 published_at=excluded.published_at,
                 language_hint=excluded.language_hint,
+                language_norm=excluded.language_norm,
+                lang=excluded.lang,
                 duration_sec=excluded.duration_sec,
                 view_count=excluded.view_count,
                 comment_count=excluded.comment_count,
                 like_count=excluded.like_count,
                 keyword=excluded.keyword,
-                score=excluded.score,
-                raw_json=excluded.raw_json
+                matched_keywords=excluded.matched_keywords,
+                score=excluded.score
             """,
             [
                 (
@@ -91,32 +61,82 @@ def upsert_candidates(db_path: Path, items: list[VideoCandidate]) -> int:
                     now,
                     x.url,
                     x.title,
-                    x.description,
                     x.channel_id,
                     x.channel_title,
                     x.published_at,
                     x.language_hint,
+                    x.language_hint.strip().lower(),
+                    base_language(x.language_hint),
                     x.duration_sec,
                     x.view_count,
                     x.comment_count,
                     x.like_count,
                     x.keyword,
+                    ','.join(x.matched_keywords or (x.keyword,)),
                     x.score,
-                    x.raw_json,
                 )
                 for x in items
             ],
         )
+        conn.executemany(
+            """
+            INSERT INTO discovered_videos_raw(video_id, description, raw_json) VALUES (?, ?, ?)
+            ON CONFLICT(video_id) DO UPDATE SET description=excluded.description, raw_json=excluded.raw_json
+            """,
+            [(x.video_id, x.description, x.raw_json) for x in items],
+        )
     return len(items)
 
 
-def enqueue_processing_job(db_path: Path, video_id: str) -> tuple[bool, str]:
+def rescore_candidates(db_path: Path, *, chunk_size: int = 5000, now: datetime | None = None) -> tuple[int, int]:
+    """Recompute `score` for every stored candidate; returns `(scanned, updated)`.
+
+    The freshness term decays with age, so stored scores go stale. Rows are read in
+    `video_id` keyset chunks, scored with one `score_batch` call per chunk and written
+    back with `executemany`, all in one write transaction with a single reference time.
+    """
+    now = now or datetime.now(timezone.utc)
+    size = max(1, int(chunk_size))
+    scanned = updated = 0
+    last_id = ''
+    with transaction(db_path, immediate=True) as conn:
+        while True:
+            rows = conn.execute(
+                """
+                SELECT video_id, view_count, comment_count, published_at, score FROM discovered_videos
+                WHERE video_id > ?
+                ORDER BY video_id
+                LIMIT ?
+                """,
+                (last_id, size),
+            ).fetchall()
+            if not rows:
+                break
+            last_id = str(rows[-1][0])
+            scores = score_batch([r[1] for r in rows], [r[2] for r in rows], [str(r[3]) for r in rows], now=now)
+            changed = [(s, r[0]) for r, s in zip(rows, scores.tolist()) if s != r[4]]
+            if changed:
+                conn.executemany('UPDATE discovered_videos SET score=? WHERE video_id=?', changed)
+            scanned += len(rows)
+            updated += len(changed)
+    return scanned, updated
+
+
+def enqueue_processing_job(
+    db_path: Path,
+    video_id: str,
+    resource_class: str = 'default',
+    *,
+    boost: float = 0.0,
+    deadline_at: str = '',
+) -> tuple[bool, str]:
+    """Queue a discovered video; its priority is the candidate score plus `boost`."""
     vid = video_id.strip()
     if not vid:
         return False, 'video_id is empty'
-    with sqlite3.connect(db_path) as conn:
+    with transaction(db_path, immediate=True) as conn:
         row = conn.execute(
-            'SELECT video_id, url FROM discovered_videos WHERE video_id=?',
+            'SELECT video_id, url, score, channel_id FROM discovered_videos WHERE video_id=?',
             (vid,),
         ).fetchone()
         if not row:
@@ -127,31 +147,155 @@ def enqueue_processing_job(db_path: Path, video_id: str) -> tuple[bool, str]:
         ).fetchone()
         if exists:
             return False, f'job already queued/running for {vid}'
-        now = datetime.now(timezone.utc).isoformat()
         conn.execute(
-            'INSERT INTO processing_jobs(video_id, url, status, created_at) VALUES (?, ?, ?, ?)',
-            (row[0], row[1], 'pending', now),
+            """
+            INSERT INTO processing_jobs(video_id, url, status, created_at, resource_class, priority, channel_id, deadline_at)
+            VALUES (?, ?, 'pending', ?, ?, ?, ?, ?)
+            """,
+            (
+                row[0],
+                row[1],
+                _utc_now(),
+                resource_class.strip() or 'default',
+                float(row[2]) + float(boost),
+                str(row[3]),
+                deadline_at.strip(),
+            ),
         )
     return True, f'job queued for {vid}'
 
 
-def claim_next_job(db_path: Path) -> dict[str, Any] | None:
-    with sqlite3.connect(db_path) as conn:
-        conn.isolation_level = None
-        conn.execute('BEGIN IMMEDIATE')
-        row = conn.execute(
-            "SELECT id, video_id, url FROM processing_jobs WHERE status='pending' ORDER BY id ASC LIMIT 1"
-        ).fetchone()
-        if not row:
-            conn.execute('COMMIT')
+def boost_job(db_path: Path, job_id: int, delta: float) -> bool:
+    """Raise (or lower) a pending job's priority; False if it is no longer pending."""
+    cur = get_connection(db_path).execute(
+        "UPDATE processing_jobs SET priority=priority + ? WHERE id=? AND status='pending'",
+        (float(delta), int(job_id)),
+    )
+    return cur.rowcount > 0
+
+
+def _pick_job(rows: list[tuple], running_by_channel: dict[str, int], urgent_before: str) -> tuple:
+    """Deadline due soon first, then the channel with the fewest running jobs, then priority.
+
+    `rows` come in `priority DESC, created_at, id` order, so `min` keeps that order on ties.
+    """
+
+    def key(r: tuple) -> tuple:
+        deadline = str(r[5])
+        urgent = bool(deadline) and deadline <= urgent_before
+        return (not urgent, deadline if urgent else '', running_by_channel.get(str(r[4]), 0))
+
+    return min(rows, key=key)
+
+
+def claim_next_job(
+    db_path: Path,
+    worker_id: str = '',
+    resource_class: str | None = None,
+    *,
+    fair_share_window: int = 64,
+    deadline_horizon_sec: float = 3600.0,
+) -> dict[str, Any] | None:
+    """Atomically move the best pending job to `running` and return it.
+
+    The `fair_share_window` highest-priority pending jobs are read off the
+    `(status, priority, created_at)` index, plus any job whose deadline falls within
+    `deadline_horizon_sec`. Among those, urgent deadlines win (earliest first), then
+    jobs from channels with the fewest running jobs, then priority and age; so one
+    channel's long backlog cannot hold every worker.
+
+    `resource_class=None` claims any class; otherwise only jobs tagged with that class.
+    """
+    cols = 'id, video_id, url, resource_class, channel_id, deadline_at'
+    where = "status='pending'"
+    params: list[object] = []
+    if resource_class is not None:
+        where += ' AND resource_class=?'
+        params.append(resource_class)
+    now = datetime.now(timezone.utc)
+    urgent_before = (now + timedelta(seconds=max(0.0, deadline_horizon_sec))).isoformat()
+    with transaction(db_path, immediate=True) as conn:
+        rows = conn.execute(
+            f'SELECT {cols} FROM processing_jobs WHERE {where} ORDER BY priority DESC, created_at, id LIMIT ?',
+            (*params, max(1, int(fair_share_window))),
+        ).fetchall()
+        if not rows:
             return None
-        now = datetime.now(timezone.utc).isoformat()
+        rows += conn.execute(
+            f"SELECT {cols} FROM processing_jobs WHERE {where} AND deadline_at != '' AND deadline_at <= ? "
+            'ORDER BY deadline_at LIMIT 1',
+            (*params, urgent_before),
+        ).fetchall()
+        running = {
+            str(r[0]): int(r[1])
+            for r in conn.execute(
+                "SELECT channel_id, COUNT(*) FROM processing_jobs WHERE status='running' GROUP BY channel_id"
+            )
+        }
+        row = _pick_job(rows, running, urgent_before)
+        started = now.isoformat()
+        conn.execute(
+            """
+            UPDATE processing_jobs
+            SET status='running', started_at=?, heartbeat_at=?, worker_id=?, attempts=attempts+1
+            WHERE id=?
+            """,
+            (started, started, worker_id, int(row[0])),
+        )
+    return {'id': int(row[0]), 'video_id': str(row[1]), 'url': str(row[2]), 'resource_class': str(row[3])}
+
+
+def record_heartbeat(
+    db_path: Path,
+    *,
+    worker_id: str,
+    resource_class: str,
+    status: str,
+    job_id: int | None = None,
+) -> None:
+    """Upsert the worker row and, while busy, refresh the heartbeat of its running job."""
+    now = _utc_now()
+    with transaction(db_path) as conn:
         conn.execute(
-            "UPDATE processing_jobs SET status='running', started_at=? WHERE id=?",
-            (now, int(row[0])),
+            """
+            INSERT INTO job_workers(worker_id, resource_class, status, job_id, started_at, heartbeat_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(worker_id) DO UPDATE SET
+                status=excluded.status,
+                job_id=excluded.job_id,
+                heartbeat_at=excluded.heartbeat_at
+            """,
+            (worker_id, resource_class, status, job_id, now, now),
         )
-        conn.execute('COMMIT')
-    return {'id': int(row[0]), 'video_id': str(row[1]), 'url': str(row[2])}
+        if job_id is not None:
+            conn.execute(
+                "UPDATE processing_jobs SET heartbeat_at=? WHERE id=? AND status='running'",
+                (now, int(job_id)),
+            )
+
+
+def reclaim_stale_jobs(db_path: Path, *, stale_after_sec: float, max_attempts: int) -> int:
+    """Requeue `running` jobs whose worker stopped heartbeating (e.g. the process crashed).
+
+    Jobs that already used `max_attempts` are marked failed instead of retried.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=max(1.0, stale_after_sec))).isoformat()
+    now = _utc_now()
+    with transaction(db_path, immediate=True) as conn:
+        stale = "status='running' AND (CASE WHEN heartbeat_at != '' THEN heartbeat_at ELSE started_at END) < ?"
+        failed = conn.execute(
+            f"""
+            UPDATE processing_jobs
+            SET status='failed', finished_at=?, error='worker lost (heartbeat timeout)'
+            WHERE {stale} AND attempts >= ?
+            """,
+            (now, cutoff, max(1, int(max_attempts))),
+        ).rowcount
+        requeued = conn.execute(
+            f"UPDATE processing_jobs SET status='pending', worker_id='', heartbeat_at='' WHERE {stale}",
+            (cutoff,),
+        ).rowcount
+    return int(failed) + int(requeued)
 
 
 def complete_job(
@@ -164,28 +308,216 @@ def complete_job(
     dubbed_video: str = '',
     log_path: str = '',
 ) -> None:
-    now = datetime.now(timezone.utc).isoformat()
+    now = _utc_now()
     status = 'success' if success else 'failed'
-    with sqlite3.connect(db_path) as conn:
-        conn.execute(
+    get_connection(db_path).execute(
+        """
+        UPDATE processing_jobs
+        SET status=?, finished_at=?, error=?, bilingual_video=?, dubbed_video=?, log_path=?
+        WHERE id=?
+        """,
+        (status, now, error, bilingual_video, dubbed_video, log_path, int(job_id)),
+    )
+
+
+def list_jobs(db_path: Path, limit: int = 30) -> list[tuple]:
+    cur = get_connection(db_path).execute(
+        """
+        SELECT id, video_id, status, created_at, started_at, finished_at, error, bilingual_video, dubbed_video,
+            priority
+        FROM processing_jobs
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (max(1, min(int(limit), 300)),),
+    )
+    return list(cur.fetchall())
+
+
+_CANDIDATE_API_COLUMNS = (
+    'video_id',
+    'title',
+    'url',
+    'channel_id',
+    'channel_title',
+    'published_at',
+    'discovered_at',
+    'language_hint',
+    'duration_sec',
+    'view_count',
+    'comment_count',
+    'like_count',
+    'keyword',
+    'matched_keywords',
+    'score',
+    'status',
+)
+
+_JOB_API_COLUMNS = (
+    'id',
+    'video_id',
+    'url',
+    'status',
+    'resource_class',
+    'priority',
+    'channel_id',
+    'deadline_at',
+    'attempts',
+    'worker_id',
+    'created_at',
+    'started_at',
+    'finished_at',
+    'error',
+    'bilingual_video',
+    'dubbed_video',
+    'log_path',
+)
+
+
+def change_counters(db_path: Path) -> dict[str, int]:
+    """Table name -> number of visible changes so far (maintained by triggers)."""
+    cur = get_connection(db_path).execute('SELECT name, value FROM change_counters')
+    return {str(r[0]): int(r[1]) for r in cur.fetchall()}
+
+
+def list_candidates_page(
+    db_path: Path,
+    *,
+    min_score: float = 0.0,
+    language: str = '',
+    limit: int = 100,
+    after: tuple[float, str, str] | None = None,
+) -> list[dict[str, Any]]:
+    """One page in `score DESC, discovered_at DESC, video_id DESC` order.
+
+    `after` is the `(score, discovered_at, video_id)` of the previous page's last row
+    (keyset pagination), so deep pages cost the same as the first one.
+    """
+    sql = f'SELECT {", ".join(_CANDIDATE_API_COLUMNS)} FROM discovered_videos WHERE score >= ?'
+    params: list[object] = [min_score]
+    if language.strip():
+        sql += ' AND lang = ?'
+        params.append(base_language(language))
+    if after is not None:
+        sql += ' AND (score, discovered_at, video_id) < (?, ?, ?)'
+        params.extend(after)
+    sql += ' ORDER BY score DESC, discovered_at DESC, video_id DESC LIMIT ?'
+    params.append(max(1, int(limit)))
+    cur = get_connection(db_path).execute(sql, params)
+    return [dict(zip(_CANDIDATE_API_COLUMNS, r)) for r in cur.fetchall()]
+
+
+def list_jobs_page(
+    db_path: Path,
+    *,
+    limit: int = 50,
+    before_id: int | None = None,
+    status: str = '',
+) -> list[dict[str, Any]]:
+    """Jobs newest first; `before_id` is the previous page's last id."""
+    sql = f'SELECT {", ".join(_JOB_API_COLUMNS)} FROM processing_jobs WHERE 1=1'
+    params: list[object] = []
+    if status:
+        sql += ' AND status=?'
+        params.append(status)
+    if before_id is not None:
+        sql += ' AND id < ?'
+        params.append(int(before_id))
+    sql += ' ORDER BY id DESC LIMIT ?'
+    params.append(max(1, int(limit)))
+    cur = get_connection(db_path).execute(sql, params)
+    return [dict(zip(_JOB_API_COLUMNS, r)) for r in cur.fetchall()]
+
+
+def get_job(db_path: Path, job_id: int) -> dict[str, Any] | None:
+    row = get_connection(db_path).execute(
+        f'SELECT {", ".join(_JOB_API_COLUMNS)} FROM processing_jobs WHERE id=?',
+        (int(job_id),),
+    ).fetchone()
+    return dict(zip(_JOB_API_COLUMNS, row)) if row else None
+
+
+def quota_spent(db_path: Path, day: str) -> int:
+    row = get_connection(db_path).execute(
+        'SELECT COALESCE(SUM(units), 0) FROM api_quota_ledger WHERE day=?',
+        (day,),
+    ).fetchone()
+    return int(row[0])
+
+
+def load_keyword_stats(db_path: Path) -> dict[str, KeywordStats]:
+    cur = get_connection(db_path).execute('SELECT keyword, runs, units, kept, last_run_at FROM keyword_stats')
+    return {str(r[0]): KeywordStats(str(r[0]), int(r[1]), int(r[2]), int(r[3]), str(r[4])) for r in cur.fetchall()}
+
+
+def record_quota_usage(db_path: Path, day: str, usage: list[QuotaUsage], kept_by_keyword: dict[str, int]) -> None:
+    """Append one run's API usage to the ledger and fold it into per-keyword stats."""
+    calls: dict[tuple[str, str], list[int]] = {}
+    units_by_keyword: dict[str, int] = {}
+    for u in usage:
+        agg = calls.setdefault((u.endpoint, u.keyword), [0, 0])
+        agg[0] += 1
+        agg[1] += u.units
+        if u.keyword:
+            units_by_keyword[u.keyword] = units_by_keyword.get(u.keyword, 0) + u.units
+    now = _utc_now()
+    with transaction(db_path, immediate=True) as conn:
+        conn.executemany(
             """
-            UPDATE processing_jobs
-            SET status=?, finished_at=?, error=?, bilingual_video=?, dubbed_video=?, log_path=?
-            WHERE id=?
+            INSERT INTO api_quota_ledger(day, endpoint, keyword, calls, units) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(day, endpoint, keyword) DO UPDATE SET
+                calls=calls + excluded.calls,
+                units=units + excluded.units
+            """,
+            [(day, endpoint, kw, n, units) for (endpoint, kw), (n, units) in calls.items()],
+        )
+        conn.executemany(
+            """
+            INSERT INTO keyword_stats(keyword, runs, units, kept, last_run_at) VALUES (?, 1, ?, ?, ?)
+            ON CONFLICT(keyword) DO UPDATE SET
+                runs=runs + 1,
+                units=units + excluded.units,
+                kept=kept + excluded.kept,
+                last_run_at=excluded.last_run_at
             """,
-            (status, now, error, bilingual_video, dubbed_video, log_path, int(job_id)),
+            [(kw, units, int(kept_by_keyword.get(kw, 0)), now) for kw, units in units_by_keyword.items()],
         )
 
 
-def list_jobs(db_path: Path, limit: int = 30) -> list[tuple]:
-    with sqlite3.connect(db_path) as conn:
-        cur = conn.execute(
+def load_keyword_cursors(db_path: Path) -> dict[str, str]:
+    """keyword -> `publishedAt` up to which its search results are stored."""
+    cur = get_connection(db_path).execute(
+        "SELECT keyword, last_published_at FROM keyword_cursors WHERE last_published_at != ''"
+    )
+    return {str(r[0]): str(r[1]) for r in cur.fetchall()}
+
+
+def update_keyword_cursors(db_path: Path, searched: list[str], marks: dict[str, str]) -> None:
+    """Record a run for searched keywords and advance those in `marks`; a cursor never moves backwards."""
+    if not searched:
+        return
+    now = _utc_now()
+    with transaction(db_path) as conn:
+        conn.executemany(
             """
-            SELECT id, video_id, status, created_at, started_at, finished_at, error, bilingual_video, dubbed_video
-            FROM processing_jobs
-            ORDER BY id DESC
-            LIMIT ?
+            INSERT INTO keyword_cursors(keyword, last_published_at, last_run_at) VALUES (?, ?, ?)
+            ON CONFLICT(keyword) DO UPDATE SET
+                last_published_at=MAX(last_published_at, excluded.last_published_at),
+                last_run_at=excluded.last_run_at
             """,
-            (max(1, min(int(limit), 300)),),
+            [(kw, marks.get(kw, ''), now) for kw in searched],
         )
-        return list(cur.fetchall())
+
+
+def known_candidates_since(db_path: Path, published_after: str, limit: int) -> dict[str, tuple[str, ...]]:
+    """Stored candidates published inside the window, newest first: video_id -> matched keywords."""
+    cur = get_connection(db_path).execute(
+        """
+        SELECT video_id, matched_keywords, keyword FROM discovered_videos
+        WHERE published_at >= ?
+        ORDER BY published_at DESC
+        LIMIT ?
+        """,
+        (published_after, max(0, int(limit))),
+    )
+    return {str(r[0]): tuple(x for x in str(r[1] or r[2]).split(',') if x) for r in cur.fetchall()}
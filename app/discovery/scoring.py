@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-import math
+import heapq
+import warnings
 from datetime import datetime, timezone
+from typing import Iterable, Sequence
+
+import numpy as np
 
 from app.discovery.models import VideoCandidate
 
@@ -42,28 +46,116 @@ def should_keep_candidate(
     return True
 
 
-def compute_hot_score(view_count: int, comment_count: int, published_at: str) -> float:
+def _parse_published(published_at: Sequence[str]) -> np.ndarray:
+    """ISO-8601 strings -> UTC `datetime64[s]`; unparsable entries become NaT."""
+    # YouTube always sends `...Z`; numpy parses naive ISO strings in one vectorized call
+    cleaned = [p[:-1] if p.endswith('Z') else p for p in published_at]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            return np.array(cleaned, dtype='datetime64[s]')
+    except (ValueError, DeprecationWarning, UserWarning):
+        pass
+    out = np.full(len(published_at), np.datetime64('NaT'), dtype='datetime64[s]')
+    for i, p in enumerate(published_at):
+        try:
+            dt = datetime.fromisoformat(p.replace('Z', '+00:00')).astimezone(timezone.utc)
+        except Exception:
+            continue
+        out[i] = np.datetime64(dt.replace(tzinfo=None), 's')
+    return out
+
+
+def score_batch(
+    view_counts: Sequence[int] | np.ndarray,
+    comment_counts: Sequence[int] | np.ndarray,
+    published_at: Sequence[str],
+    now: datetime | None = None,
+) -> np.ndarray:
+    """Hot score for a whole batch: one `now`, vectorized log and freshness terms.
+
+    Same formula as `compute_hot_score`, which delegates here.
+    """
+    views = np.maximum(10.0, np.asarray(view_counts, dtype=np.float64))
+    comments = np.maximum(5.0, np.asarray(comment_counts, dtype=np.float64))
+    ref = np.datetime64((now or datetime.now(timezone.utc)).astimezone(timezone.utc).replace(tzinfo=None), 'us')
+    published = _parse_published(published_at)
+    age_hours = (ref - published).astype('timedelta64[us]').astype(np.float64) / 3.6e9
+    valid = ~np.isnat(published)
+    freshness = np.zeros(len(published), dtype=np.float64)
+    freshness[valid] = 24.0 / np.maximum(1.0, age_hours[valid])
+    score = np.log10(views) + np.log10(comments) * 1.3 + freshness
+    return np.round(score, 6)
+
+
+def compute_hot_score(view_count: int, comment_count: int, published_at: str, now: datetime | None = None) -> float:
     """Simple ranking score balancing views/comments/freshness."""
-    views_term = math.log10(max(10, view_count))
-    comments_term = math.log10(max(5, comment_count)) * 1.3
+    return float(score_batch([view_count], [comment_count], [published_at], now=now)[0])
 
-    freshness_term = 0.0
-    try:
-        dt = datetime.fromisoformat(published_at.replace('Z', '+00:00')).astimezone(timezone.utc)
-        age_hours = max(1.0, (datetime.now(timezone.utc) - dt).total_seconds() / 3600.0)
-        freshness_term = 24.0 / age_hours
-    except Exception:
-        freshness_term = 0.0
 
-    return round(views_term + comments_term + freshness_term, 6)
+class TopN:
+    """Streaming top-N by `score` with dedupe on `video_id` (the best score per id wins).
+
+    Holds at most N live entries in a min-heap, so selecting from a large stream costs
+    O(total log N) instead of a full sort. Superseded entries are dropped lazily. Equal
+    scores keep first-seen order of the id, like a stable sort over a dedupe dict.
+    """
+
+    def __init__(self, n: int) -> None:
+        self.n = max(1, int(n))
+        # (score, -first_seen, video_id); the heap root is the entry to evict next
+        self._heap: list[tuple[float, int, str]] = []
+        self._live: dict[str, VideoCandidate] = {}
+        # one int per distinct id; evicted ids that come back keep their tie rank
+        self._first_seen: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def _drop_stale(self) -> None:
+        while self._heap:
+            score, _, vid = self._heap[0]
+            live = self._live.get(vid)
+            if live is not None and live.score == score:
+                return
+            heapq.heappop(self._heap)
+
+    def cutoff(self) -> float | None:
+        """Lowest score still in the top N, or None while fewer than N are held."""
+        if len(self._live) < self.n:
+            return None
+        self._drop_stale()
+        return self._heap[0][0]
+
+    def push(self, item: VideoCandidate) -> None:
+        vid = item.video_id
+        seq = self._first_seen.setdefault(vid, len(self._first_seen))
+        live = self._live.get(vid)
+        if live is not None:
+            if item.score > live.score:
+                # the old heap entry goes stale and is skipped by `_drop_stale`
+                self._live[vid] = item
+                heapq.heappush(self._heap, (item.score, -seq, vid))
+            return
+        if len(self._live) >= self.n:
+            self._drop_stale()
+            low_score, low_neg_seq, low_vid = self._heap[0]
+            if (item.score, -seq) <= (low_score, low_neg_seq):
+                return
+            heapq.heappop(self._heap)
+            del self._live[low_vid]
+        self._live[vid] = item
+        heapq.heappush(self._heap, (item.score, -seq, vid))
+
+    def extend(self, items: Iterable[VideoCandidate]) -> TopN:
+        for item in items:
+            self.push(item)
+        return self
 
+    def items(self) -> list[VideoCandidate]:
+        """Best first; equal scores in first-seen order."""
+        return sorted(self._live.values(), key=lambda x: (-x.score, self._first_seen[x.video_id]))
 
-def dedupe_and_sort(candidates: list[VideoCandidate], top_n: int) -> list[VideoCandidate]:
-    latest: dict[str, VideoCandidate] = {}
-    for item in candidates:
-        prev = latest.get(item.video_id)
-        if prev is None or item.score > prev.score:
-            latest[item.video_id] = item
-    ordered = sorted(latest.values(), key=lambda x: x.score, reverse=True)
-    return ordered[: max(1, top_n)]
 
+def dedupe_and_sort(candidates: Iterable[VideoCandidate], top_n: int) -> list[VideoCandidate]:
+    return TopN(top_n).extend(candidates).items()
@@ -4,13 +4,29 @@ import logging
 import os
 from pathlib import Path
 
+from app.discovery.http_cache import ResponseCache
+from app.discovery.http_client import ApiHttpClient
 from app.discovery.models import VideoCandidate
+from app.discovery.quota import API_COST, QuotaBudget, plan_keywords, quota_day
+from app.discovery.repository import (
+    init_db,
+    known_candidates_since,
+    load_keyword_cursors,
+    load_keyword_stats,
+    quota_spent,
+    record_quota_usage,
+    update_keyword_cursors,
+    upsert_candidates,
+)
 from app.discovery.scoring import dedupe_and_sort
-from app.discovery.youtube_discovery import discover_candidates
+from app.discovery.youtube_discovery import discover, iso_after
 from app.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# expired entries are kept this long for ETag revalidation, then dropped
+_HTTP_CACHE_MAX_AGE_SEC = 7 * 86400
+
 
 def _csv_values(s: str) -> list[str]:
     return [x.strip() for x in s.split(',') if x.strip()]
@@ -69,7 +85,25 @@ def _load_api_key_runtime() -> str:
     return ''
 
 
-def run_discovery_once(*, top_n: int = 0, days_back: int = 0) -> tuple[list[VideoCandidate], list[VideoCandidate]]:
+def run_discovery_once(
+    *,
+    top_n: int = 0,
+    days_back: int = 0,
+    db_path: Path | None = None,
+    incremental: bool = False,
+    dry_run: bool = False,
+) -> tuple[list[VideoCandidate], list[VideoCandidate]]:
+    """One discovery pass under the daily quota budget; `selected` is stored unless `dry_run`.
+
+    Keywords are ordered by historical yield per quota unit, and the API usage of the run
+    is written to the ledger in `db_path` (default `DISCOVERY_DB_PATH`) even for dry runs,
+    since the quota was spent either way. Keyword cursors only move after the upsert and
+    only past stored results (see `DiscoveryRun.cursor_marks`), so a dry run leaves them.
+
+    `incremental` searches each keyword only past its stored cursor and refreshes the
+    statistics of up to `DISCOVERY_REFRESH_LIMIT` known candidates in the window; those
+    refreshed candidates are returned in `selected` as well so their rows get updated.
+    """
     api_key = _load_api_key_runtime()
     if not api_key:
         raise RuntimeError('YOUTUBE_API_KEY is required for daily discovery')
@@ -80,16 +114,77 @@ def run_discovery_once(*, top_n: int = 0, days_back: int = 0) -> tuple[list[Vide
     top = top_n if top_n > 0 else settings.discovery_top_n
     days = days_back if days_back > 0 else settings.discovery_days_back
 
-    raw = discover_candidates(
-        api_key=api_key,
-        keywords=keywords,
-        days_back=days,
-        max_results_per_keyword=settings.discovery_max_results_per_keyword,
-        min_views=settings.discovery_min_views,
-        min_comments=settings.discovery_min_comments,
-        min_duration_sec=settings.discovery_min_duration_sec,
-        max_duration_sec=settings.discovery_max_duration_sec,
+    db = db_path or settings.discovery_db_path.resolve()
+    init_db(db)
+    day = quota_day()
+    budget = QuotaBudget(daily_budget=settings.discovery_daily_quota_budget, spent_today=quota_spent(db, day))
+    if budget.remaining < API_COST['search'] + API_COST['videos']:
+        raise RuntimeError(
+            f'daily YouTube API quota budget used up: spent={budget.spent_today} '
+            f'budget={budget.daily_budget} (resets at midnight Pacific time)'
+        )
+    planned = plan_keywords(keywords, load_keyword_stats(db))
+    cursors: dict[str, str] = {}
+    refresh: dict[str, tuple[str, ...]] = {}
+    if incremental:
+        cursors = load_keyword_cursors(db)
+        refresh = known_candidates_since(db, iso_after(days), settings.discovery_refresh_limit)
+
+    cache: ResponseCache | None = None
+    if settings.discovery_http_cache_enabled:
+        cache = ResponseCache(
+            db,
+            {
+                'search': settings.discovery_http_cache_ttl_search_sec,
+                'videos': settings.discovery_http_cache_ttl_videos_sec,
+            },
+        )
+        cache.prune(_HTTP_CACHE_MAX_AGE_SEC)
+    client = ApiHttpClient.from_settings(cache=cache)
+    try:
+        run = discover(
+            api_key=api_key,
+            keywords=planned,
+            days_back=days,
+            max_results_per_keyword=settings.discovery_max_results_per_keyword,
+            min_views=settings.discovery_min_views,
+            min_comments=settings.discovery_min_comments,
+            min_duration_sec=settings.discovery_min_duration_sec,
+            max_duration_sec=settings.discovery_max_duration_sec,
+            client=client,
+            budget=budget,
+            published_after_by_keyword=cursors,
+            refresh=refresh,
+            top_n=top,
+        )
+    finally:
+        client.close()
+    raw = run.candidates
+    kept: dict[str, int] = {}
+    for c in raw:
+        if c.video_id in run.refreshed_ids:
+            continue
+        for kw in c.matched_keywords or (c.keyword,):
+            kept[kw] = kept.get(kw, 0) + 1
+    record_quota_usage(db, day, budget.usage, kept)
+    run_units = sum(u.units for u in budget.usage)
+    logger.info(
+        'Discovery quota. run_units=%d day=%s spent=%d budget=%d exhausted=%s',
+        run_units,
+        day,
+        budget.spent_today,
+        budget.daily_budget,
+        budget.exhausted,
     )
+
     selected = dedupe_and_sort(raw, top_n=top)
-    logger.info('Daily discovery selected=%d (raw=%d)', len(selected), len(raw))
+    if run.refreshed_ids:
+        chosen = {c.video_id for c in selected}
+        selected += [c for c in raw if c.video_id in run.refreshed_ids and c.video_id not in chosen]
+    logger.info('Daily discovery selected=%d (raw=%d refreshed=%d)', len(selected), len(raw), len(run.refreshed_ids))
+    if not dry_run:
+        upsert_candidates(db, selected)
+        marks = run.cursor_marks({c.video_id for c in selected})
+        update_keyword_cursors(db, run.searched, marks)
+        logger.info('Keyword cursors updated. searched=%d advanced=%d', len(run.searched), len(marks))
     return raw, selected
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from app.discovery.repository import claim_next_job, complete_job, reclaim_stale_jobs, record_heartbeat
+
+logger = logging.getLogger(__name__)
+
+ANY_RESOURCE_CLASS = '*'
+
+
+@dataclass(frozen=True)
+class JobResult:
+    success: bool
+    error: str = ''
+    bilingual_video: str = ''
+    dubbed_video: str = ''
+    log_path: str = ''
+
+
+JobRunner = Callable[[dict[str, Any]], JobResult]
+
+
+def parse_worker_spec(spec: str) -> list[tuple[str, int]]:
+    """`"gpu:1,cpu:2"` -> `[('gpu', 1), ('cpu', 2)]`; a bare number means that many `*` workers."""
+    out: list[tuple[str, int]] = []
+    for part in (x.strip() for x in spec.split(',')):
+        if not part:
+            continue
+        if ':' in part:
+            name, count = part.split(':', 1)
+        elif part.isdigit():
+            name, count = ANY_RESOURCE_CLASS, part
+        else:
+            name, count = part, '1'
+        n = int(count.strip() or '1')
+        if n > 0:
+            out.append((name.strip() or ANY_RESOURCE_CLASS, n))
+    return out or [(ANY_RESOURCE_CLASS, 1)]
+
+
+class JobWorkerPool:
+    """N threads claiming `processing_jobs` concurrently.
+
+    Workers sleep on a condition variable and are woken by `notify()` right after an
+    enqueue; `idle_poll_sec` only bounds the wait so jobs enqueued by other processes
+    are still picked up. A single housekeeping thread writes heartbeats for every
+    worker and requeues `running` jobs whose heartbeat went stale after a crash.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        run_job: JobRunner,
+        *,
+        worker_spec: str,
+        heartbeat_sec: float,
+        stale_after_sec: float,
+        idle_poll_sec: float,
+        max_attempts: int,
+        fair_share_window: int = 64,
+        deadline_horizon_sec: float = 3600.0,
+    ) -> None:
+        self.db_path = db_path
+        self.run_job = run_job
+        self.worker_spec = parse_worker_spec(worker_spec)
+        self.heartbeat_sec = max(1.0, float(heartbeat_sec))
+        self.stale_after_sec = max(self.heartbeat_sec * 2, float(stale_after_sec))
+        self.idle_poll_sec = max(0.5, float(idle_poll_sec))
+        self.max_attempts = max(1, int(max_attempts))
+        self.fair_share_window = max(1, int(fair_share_window))
+        self.deadline_horizon_sec = max(0.0, float(deadline_horizon_sec))
+        self._wakeup = threading.Condition()
+        self._pending_signals = 0
+        self._stop = threading.Event()
+        self._busy: dict[str, int | None] = {}
+        self._classes: dict[str, str] = {}
+        self._busy_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._id_prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def start(self) -> None:
+        reclaimed = reclaim_stale_jobs(self.db_path, stale_after_sec=self.stale_after_sec, max_attempts=self.max_attempts)
+        if reclaimed:
+            logger.warning('Reclaimed stale running jobs at startup. count=%d', reclaimed)
+        for resource_class, count in self.worker_spec:
+            for i in range(1, count + 1):
+                worker_id = f'{self._id_prefix}:{resource_class}:{i}'
+                self._busy[worker_id] = None
+                self._classes[worker_id] = resource_class
+                t = threading.Thread(
+                    target=self._worker_loop,
+                    args=(worker_id, resource_class),
+                    name=f'job-worker-{resource_class}-{i}',
+                    daemon=True,
+                )
+                self._threads.append(t)
+        housekeeping = threading.Thread(target=self._housekeeping_loop, name='job-worker-heartbeat', daemon=True)
+        self._threads.append(housekeeping)
+        for t in self._threads:
+            t.start()
+        logger.info('Job worker pool started. workers=%s', ', '.join(f'{c}:{n}' for c, n in self.worker_spec))
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued."""
+        with self._wakeup:
+            self._pending_signals += 1
+            self._wakeup.notify_all()
+
+    def describe(self) -> str:
+        with self._busy_lock:
+            busy = sum(1 for j in self._busy.values() if j is not None)
+        return f'{len(self._busy)} workers ({busy} busy): ' + ', '.join(f'{c}:{n}' for c, n in self.worker_spec)
+
+    @property
+    def resource_classes(self) -> list[str]:
+        """Named worker classes in spec order; `*` workers are left out since they take anything."""
+        return list(dict.fromkeys(c for c, _ in self.worker_spec if c != ANY_RESOURCE_CLASS))
+
+    def serves(self, resource_class: str) -> bool:
+        """Whether some worker will ever claim a job of `resource_class`."""
+        return any(c in (ANY_RESOURCE_CLASS, resource_class) for c, _ in self.worker_spec)
+
+    def check_job_classes(self, job_classes: Iterable[str]) -> None:
+        """Warn about job classes no worker claims and worker classes no job is queued with."""
+        offered = set(job_classes)
+        for job_class in sorted(offered):
+            if not self.serves(job_class):
+                logger.warning('No worker claims this job resource class; such jobs stay pending. resource_class=%s', job_class)
+        for worker_class in self.resource_classes:
+            if worker_class not in offered:
+                logger.warning('Workers of this resource class never receive jobs. resource_class=%s', worker_class)
+
+    def _wait_for_work(self) -> None:
+        with self._wakeup:
+            if self._pending_signals == 0 and not self._stop.is_set():
+                self._wakeup.wait(timeout=self.idle_poll_sec)
+            self._pending_signals = max(0, self._pending_signals - 1)
+
+    def _set_busy(self, worker_id: str, job_id: int | None) -> None:
+        with self._busy_lock:
+            self._busy[worker_id] = job_id
+        self._heartbeat(worker_id)
+
+    def _heartbeat(self, worker_id: str) -> None:
+        with self._busy_lock:
+            job_id = self._busy.get(worker_id)
+        try:
+            record_heartbeat(
+                self.db_path,
+                worker_id=worker_id,
+                resource_class=self._classes[worker_id],
+                status='busy' if job_id is not None else 'idle',
+                job_id=job_id,
+            )
+        except Exception:
+            logger.warning('Worker heartbeat failed. worker=%s', worker_id, exc_info=True)
+
+    def _worker_loop(self, worker_id: str, resource_class: str) -> None:
+        claim_class = None if resource_class == ANY_RESOURCE_CLASS else resource_class
+        self._heartbeat(worker_id)
+        while not self._stop.is_set():
+            try:
+                job = claim_next_job(
+                    self.db_path,
+                    worker_id=worker_id,
+                    resource_class=claim_class,
+                    fair_share_window=self.fair_share_window,
+                    deadline_horizon_sec=self.deadline_horizon_sec,
+                )
+            except Exception:
+                logger.warning('Job claim failed. worker=%s', worker_id, exc_info=True)
+                job = None
+            if not job:
+                self._wait_for_work()
+                continue
+
+            job_id = int(job['id'])
+            self._set_busy(worker_id, job_id)
+            logger.info('Job claimed. worker=%s job=%d video=%s', worker_id, job_id, job['video_id'])
+            try:
+                result = self.run_job(job)
+            except Exception as exc:
+                logger.exception('Job runner crashed. worker=%s job=%d', worker_id, job_id)
+                result = JobResult(success=False, error=str(exc))
+            try:
+                complete_job(
+                    self.db_path,
+                    job_id=job_id,
+                    success=result.success,
+                    error=result.error,
+                    bilingual_video=result.bilingual_video,
+                    dubbed_video=result.dubbed_video,
+                    log_path=result.log_path,
+                )
+            finally:
+                self._set_busy(worker_id, None)
+
+    def _housekeeping_loop(self) -> None:
+        while not self._stop.wait(self.heartbeat_sec):
+            for worker_id in list(self._busy):
+                self._heartbeat(worker_id)
+            try:
+                reclaimed = reclaim_stale_jobs(
+                    self.db_path,
+                    stale_after_sec=self.stale_after_sec,
+                    max_attempts=self.max_attempts,
+                )
+            except Exception:
+                logger.warning('Stale job reclamation failed.', exc_info=True)
+                continue
+            if reclaimed:
+                logger.warning('Reclaimed stale running jobs. count=%d', reclaimed)
+                self.notify()
@@ -1,50 +1,77 @@
 from __future__ import annotations
 
+import heapq
 import json
 import logging
-import ssl
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable
 from urllib.parse import urlencode
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
 
+from app.discovery.http_client import ApiHttpClient, ApiHttpError
 from app.discovery.models import VideoCandidate
+from app.discovery.quota import QUOTA_ERROR_REASONS, QuotaBudget, QuotaExhausted
 from app.discovery.scoring import compute_hot_score, safe_int, should_keep_candidate
 from app.settings import settings
 
 logger = logging.getLogger(__name__)
 
-_YOUTUBE_API_BASE = 'https://www.googleapis.com/youtube/v3'
+# `videos.list` accepts at most 50 ids per call (1 quota unit regardless of count)
+_VIDEOS_BATCH = 50
+# `search.list` returns at most 50 results per page (100 quota units per page)
+_SEARCH_PAGE = 50
 
 
-def _http_get_json(url: str) -> dict:
-    req = Request(url, headers={'Accept': 'application/json', 'User-Agent': 'youtobe-parser/1.0'})
-    retries = max(1, int(settings.discovery_http_retries))
-    backoff = max(0.2, float(settings.discovery_http_retry_backoff_sec))
-    last_err: Exception | None = None
-    for i in range(1, retries + 1):
-        try:
-            with urlopen(req, timeout=30) as resp:
-                payload = resp.read()
-            return json.loads(payload.decode('utf-8'))
-        except HTTPError as exc:
-            last_err = exc
-            # 4xx (except 429) are usually hard failures; no need to retry.
-            if exc.code < 500 and exc.code != 429:
-                raise
-        except (URLError, ssl.SSLError, TimeoutError) as exc:
-            last_err = exc
-        if i < retries:
-            time.sleep(backoff * i)
-    if last_err is not None:
-        raise last_err
-    raise RuntimeError('Unknown http error')
-
-
-def _iso_after(days_back: int) -> str:
+class _RunningCutoff:
+    """Thread-safe score of the current N-th best candidate (min-heap of the top N)."""
+
+    def __init__(self, top_n: int) -> None:
+        self.top_n = max(0, int(top_n))
+        self._heap: list[float] = []
+        self._lock = threading.Lock()
+
+    def add(self, score: float) -> None:
+        if self.top_n <= 0:
+            return
+        with self._lock:
+            if len(self._heap) < self.top_n:
+                heapq.heappush(self._heap, score)
+            elif score > self._heap[0]:
+                heapq.heapreplace(self._heap, score)
+
+    def value(self) -> float | None:
+        """None until N candidates were seen, i.e. while any score still makes the cut."""
+        with self._lock:
+            if self.top_n <= 0 or len(self._heap) < self.top_n:
+                return None
+            return self._heap[0]
+
+
+
+def _api_url(endpoint: str, params: dict[str, object]) -> str:
+    return f"{settings.discovery_api_base.rstrip('/')}/{endpoint}?{urlencode(params)}"
+
+
+def _quota_error_reason(exc: Exception) -> str:
+    """Reason string if `exc` is the API saying the daily quota is used up, else ''."""
+    if not isinstance(exc, ApiHttpError) or exc.status != 403:
+        return ''
+    errors = (exc.json().get('error') or {}).get('errors') or []
+    for err in errors:
+        reason = str((err or {}).get('reason') or '')
+        if reason in QUOTA_ERROR_REASONS:
+            return reason
+    return ''
+
+
+def iso_after(days_back: int) -> str:
     dt = datetime.now(timezone.utc) - timedelta(days=max(1, days_back))
-    return dt.replace(microsecond=0).isoformat().replace('+00:00', 'Z')
+    # whole hours keep the search URL stable between runs, so cached responses can hit
+    return dt.replace(minute=0, second=0, microsecond=0).isoformat().replace('+00:00', 'Z')
 
 
 def _parse_iso8601_duration_to_sec(duration: str) -> int:
@@ -68,43 +95,149 @@ def _parse_iso8601_duration_to_sec(duration: str) -> int:
     return hours * 3600 + minutes * 60 + seconds
 
 
-def _search_video_ids(api_key: str, query: str, published_after: str, max_results: int) -> list[str]:
+def _search_page(
+    client: ApiHttpClient,
+    api_key: str,
+    query: str,
+    published_after: str,
+    max_results: int,
+    before_request: Callable[[], None] | None = None,
+    page_token: str = '',
+) -> tuple[list[str], str]:
+    """One `search.list` page (at most 50 ids) and its `nextPageToken` ('' on the last page)."""
     params = {
         'part': 'id',
         'q': query,
         'type': 'video',
         'order': 'viewCount',
         'publishedAfter': published_after,
-        'maxResults': max(1, min(max_results, 50)),
+        'maxResults': max(1, min(max_results, _SEARCH_PAGE)),
         'key': api_key,
         'regionCode': 'US',
         'relevanceLanguage': 'en',
     }
-    url = f'{_YOUTUBE_API_BASE}/search?{urlencode(params)}'
-    data = _http_get_json(url)
+    if page_token:
+        params['pageToken'] = page_token
+    data = client.get_json(_api_url('search', params), before_request=before_request)
     ids: list[str] = []
     for item in data.get('items', []):
         vid = ((item.get('id') or {}).get('videoId') or '').strip()
         if vid:
             ids.append(vid)
-    return ids
+    return ids, str(data.get('nextPageToken') or '')
 
 
-def _videos_details(api_key: str, video_ids: list[str]) -> list[dict]:
+def _videos_details(
+    client: ApiHttpClient,
+    api_key: str,
+    video_ids: list[str],
+    before_request: Callable[[], None] | None = None,
+) -> list[dict]:
     if not video_ids:
         return []
     params = {
         'part': 'snippet,contentDetails,statistics',
         'id': ','.join(video_ids),
-        'maxResults': 50,
+        'maxResults': _VIDEOS_BATCH,
         'key': api_key,
     }
-    url = f'{_YOUTUBE_API_BASE}/videos?{urlencode(params)}'
-    data = _http_get_json(url)
-    return list(data.get('items', []))
+    data = client.get_json(_api_url('videos', params), before_request=before_request)
+    by_id = {str(item.get('id') or ''): item for item in data.get('items', [])}
+    # the API does not promise response order; keep the request order for stable output
+    return [by_id[vid] for vid in video_ids if vid in by_id]
+
+
+def _build_candidate(
+    item: dict,
+    matched_keywords: tuple[str, ...],
+    *,
+    min_views: int,
+    min_comments: int,
+    min_duration_sec: int,
+    max_duration_sec: int,
+) -> VideoCandidate | None:
+    vid = (item.get('id') or '').strip()
+    if not vid:
+        return None
+    snippet = item.get('snippet') or {}
+    stats = item.get('statistics') or {}
+    content = item.get('contentDetails') or {}
+    duration_sec = _parse_iso8601_duration_to_sec(str(content.get('duration') or ''))
+    lang_hint = str(snippet.get('defaultAudioLanguage') or snippet.get('defaultLanguage') or '')
+    view_count = safe_int(stats.get('viewCount'))
+    comment_count = safe_int(stats.get('commentCount'))
+    like_count = safe_int(stats.get('likeCount'))
+    if not should_keep_candidate(
+        view_count=view_count,
+        comment_count=comment_count,
+        duration_sec=duration_sec,
+        language_hint=lang_hint,
+        min_views=min_views,
+        min_comments=min_comments,
+        min_duration_sec=min_duration_sec,
+        max_duration_sec=max_duration_sec,
+    ):
+        return None
+    published_at = str(snippet.get('publishedAt') or '')
+    return VideoCandidate(
+        video_id=vid,
+        url=f'https://www.youtube.com/watch?v={vid}',
+        title=str(snippet.get('title') or ''),
+        description=str(snippet.get('description') or ''),
+        channel_id=str(snippet.get('channelId') or ''),
+        channel_title=str(snippet.get('channelTitle') or ''),
+        published_at=published_at,
+        language_hint=lang_hint,
+        duration_sec=duration_sec,
+        view_count=view_count,
+        comment_count=comment_count,
+        like_count=like_count,
+        keyword=matched_keywords[0] if matched_keywords else '',
+        score=compute_hot_score(view_count, comment_count, published_at),
+        raw_json=json.dumps(item, ensure_ascii=False),
+        matched_keywords=matched_keywords,
+    )
+
+
+@dataclass
+class DiscoveryRun:
+    candidates: list[VideoCandidate]
+    # keywords whose search succeeded
+    searched: list[str] = field(default_factory=list)
+    # search result ids per keyword, and keywords whose window was paged to the end
+    found: dict[str, list[str]] = field(default_factory=dict)
+    fully_paged: set[str] = field(default_factory=set)
+    # `publishedAt` of every detailed video
+    published_at: dict[str, str] = field(default_factory=dict)
+    # known ids that were only refreshed (not returned by any search this run)
+    refreshed_ids: set[str] = field(default_factory=set)
+
+    def cursor_marks(self, saved_ids: set[str]) -> dict[str, str]:
+        """keyword -> how far its cursor may advance once `saved_ids` are stored.
+
+        A cursor must never pass a video the next incremental search would then miss, so
+        it only moves for keywords whose window was paged to the end, and only up to the
+        newest `publishedAt` before the oldest result that was not stored (filtered out,
+        below the top-N, or without details).
+        """
+        marks: dict[str, str] = {}
+        for kw in self.searched:
+            if kw not in self.fully_paged:
+                continue
+            ids = self.found.get(kw, [])
+            order = sorted(ids, key=lambda vid: self.published_at.get(vid, ''))
+            mark = ''
+            for vid in order:
+                published = self.published_at.get(vid, '')
+                if not published or vid not in saved_ids:
+                    break
+                mark = published
+            if mark:
+                marks[kw] = mark
+        return marks
 
 
-def discover_candidates(
+def discover(
     *,
     api_key: str,
     keywords: list[str],
@@ -114,73 +247,208 @@ def discover_candidates(
     min_comments: int,
     min_duration_sec: int,
     max_duration_sec: int,
-) -> list[VideoCandidate]:
-    out: list[VideoCandidate] = []
-    published_after = _iso_after(days_back)
+    client: ApiHttpClient | None = None,
+    budget: QuotaBudget | None = None,
+    published_after_by_keyword: dict[str, str] | None = None,
+    refresh: dict[str, tuple[str, ...]] | None = None,
+    top_n: int = 0,
+) -> DiscoveryRun:
+    """Search every keyword, then fetch details once per distinct video.
+
+    Searches run concurrently (`DISCOVERY_CONCURRENCY` in flight). Ids from all keywords'
+    first pages are deduplicated and packed into `videos` calls of `_VIDEOS_BATCH` ids, so
+    a video found by several keywords costs one detail lookup; the keywords that found it
+    are attributed back via `matched_keywords` (`keyword` is the first one).
+
+    When `max_results_per_keyword` exceeds one page, each keyword then follows
+    `nextPageToken` lazily: every further page is detailed and scored as it arrives, and
+    paging stops once a page has no candidate above the running top-`top_n` cutoff
+    (results are ordered by view count, so later pages rarely do better). Output follows
+    first-seen order: all first pages in keyword order, then later pages per keyword.
+
+    `published_after_by_keyword` narrows a keyword's search to results newer than its
+    cursor (never earlier than the `days_back` window). `refresh` maps already-known
+    video ids to their stored keywords; they ride along in the first `videos` batches so
+    their statistics and score are updated without searching again.
+
+    With a `budget`, every network call is charged before it is made (cache hits are
+    free); once the budget or the API quota is exhausted the remaining calls are skipped
+    and the partial result returned.
+    """
+    window_start = iso_after(days_back)
+    cursors = published_after_by_keyword or {}
+    kws = [k.strip() for k in keywords if k.strip()]
+    concurrency = max(1, int(settings.discovery_concurrency))
+    max_results = max(1, int(max_results_per_keyword))
     logger.info(
-        'Discovery started. keywords=%d days_back=%d max_results_per_keyword=%d',
-        len(keywords),
+        'Discovery started. keywords=%d days_back=%d max_results_per_keyword=%d concurrency=%d incremental=%d refresh=%d',
+        len(kws),
         days_back,
-        max_results_per_keyword,
+        max_results,
+        concurrency,
+        sum(1 for k in kws if k in cursors),
+        len(refresh or {}),
     )
+    api = client or ApiHttpClient.from_settings()
+    filters = {
+        'min_views': min_views,
+        'min_comments': min_comments,
+        'min_duration_sec': min_duration_sec,
+        'max_duration_sec': max_duration_sec,
+    }
+    cutoff = _RunningCutoff(top_n)
+    matched: dict[str, list[str]] = {}
+    matched_lock = threading.Lock()
+    built: dict[str, VideoCandidate | None] = {}
+    found: dict[str, list[str]] = {}
+    fully_paged: set[str] = set()
+    counters = {'pages': 0, 'hits': 0}
 
-    for kw in keywords:
-        kw = kw.strip()
-        if not kw:
-            continue
+    def search(kw: str, page_token: str = '', limit: int = _SEARCH_PAGE) -> tuple[list[str], str] | None:
+        published_after = max(window_start, cursors.get(kw, ''))
         try:
-            ids = _search_video_ids(api_key, kw, published_after, max_results_per_keyword)
-            if not ids:
-                continue
-            details = _videos_details(api_key, ids)
-            for item in details:
-                vid = (item.get('id') or '').strip()
-                if not vid:
-                    continue
-                snippet = item.get('snippet') or {}
-                stats = item.get('statistics') or {}
-                content = item.get('contentDetails') or {}
-                duration_sec = _parse_iso8601_duration_to_sec(str(content.get('duration') or ''))
-                lang_hint = str(snippet.get('defaultAudioLanguage') or snippet.get('defaultLanguage') or '')
-                view_count = safe_int(stats.get('viewCount'))
-                comment_count = safe_int(stats.get('commentCount'))
-                like_count = safe_int(stats.get('likeCount'))
-                if not should_keep_candidate(
-                    view_count=view_count,
-                    comment_count=comment_count,
-                    duration_sec=duration_sec,
-                    language_hint=lang_hint,
-                    min_views=min_views,
-                    min_comments=min_comments,
-                    min_duration_sec=min_duration_sec,
-                    max_duration_sec=max_duration_sec,
-                ):
-                    continue
-                published_at = str(snippet.get('publishedAt') or '')
-                title = str(snippet.get('title') or '')
-                description = str(snippet.get('description') or '')
-                score = compute_hot_score(view_count, comment_count, published_at)
-                out.append(
-                    VideoCandidate(
-                        video_id=vid,
-                        url=f'https://www.youtube.com/watch?v={vid}',
-                        title=title,
-                        description=description,
-                        channel_id=str(snippet.get('channelId') or ''),
-                        channel_title=str(snippet.get('channelTitle') or ''),
-                        published_at=published_at,
-                        language_hint=lang_hint,
-                        duration_sec=duration_sec,
-                        view_count=view_count,
-                        comment_count=comment_count,
-                        like_count=like_count,
-                        keyword=kw,
-                        score=score,
-                        raw_json=json.dumps(item, ensure_ascii=False),
-                    )
-                )
+            charge = partial(budget.charge, 'search', kw) if budget is not None else None
+            result = _search_page(api, api_key, kw, published_after, limit, charge, page_token)
+        except QuotaExhausted:
+            return None
         except Exception as exc:
-            logger.warning('Discovery keyword failed. keyword=%s err=%s', kw, exc)
-            continue
-    logger.info('Discovery completed. candidates=%d', len(out))
-    return out
+            reason = _quota_error_reason(exc)
+            if reason and budget is not None:
+                budget.mark_exhausted(reason)
+            else:
+                logger.warning('Discovery keyword failed. keyword=%s err=%s', kw, exc)
+            return None
+        with matched_lock:
+            counters['pages'] += 1
+            counters['hits'] += len(result[0])
+        return result
+
+    def details(batch: list[str]) -> list[dict]:
+        try:
+            charge = partial(budget.charge, 'videos') if budget is not None else None
+            return _videos_details(api, api_key, batch, charge)
+        except QuotaExhausted:
+            logger.warning('Discovery video details skipped, quota exhausted. ids=%d', len(batch))
+            return []
+        except Exception as exc:
+            reason = _quota_error_reason(exc)
+            if reason and budget is not None:
+                budget.mark_exhausted(reason)
+            logger.warning('Discovery video details failed. ids=%d err=%s', len(batch), exc)
+            return []
+
+    def score(items: list[dict]) -> float | None:
+        """Build and remember candidates for fresh items; feed the cutoff; return the best score."""
+        best = None
+        for item in items:
+            vid = str(item.get('id') or '').strip()
+            cand = _build_candidate(item, (), **filters)
+            with matched_lock:
+                built[vid] = cand
+            if cand is not None:
+                cutoff.add(cand.score)
+                best = cand.score if best is None else max(best, cand.score)
+        return best
+
+    def attribute(kw: str, ids: list[str]) -> list[str]:
+        """Record `kw` for `ids` and return the ids not seen before."""
+        fresh: list[str] = []
+        with matched_lock:
+            found.setdefault(kw, []).extend(ids)
+            for vid in ids:
+                found_by = matched.get(vid)
+                if found_by is None:
+                    matched[vid] = [kw]
+                    fresh.append(vid)
+                elif kw not in found_by:
+                    found_by.append(kw)
+        return fresh
+
+    def more_pages(kw: str, page_token: str, fetched: int) -> list[dict]:
+        """Follow `nextPageToken` for one keyword until the cutoff or the result cap stops it."""
+        out: list[dict] = []
+        while page_token and fetched < max_results:
+            page = search(kw, page_token, min(_SEARCH_PAGE, max_results - fetched))
+            if page is None:
+                break
+            ids, page_token = page
+            fetched += len(ids)
+            if not page_token:
+                with matched_lock:
+                    fully_paged.add(kw)
+            page_items = details(attribute(kw, ids))
+            out.extend(page_items)
+            best = score(page_items)
+            bar = cutoff.value()
+            if bar is not None and (best is None or best < bar):
+                logger.info(
+                    'Discovery paging stopped below top-N cutoff. keyword=%s fetched=%d best=%s cutoff=%.3f',
+                    kw,
+                    fetched,
+                    f'{best:.3f}' if best is not None else '-',
+                    bar,
+                )
+                break
+        return out
+
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='discovery') as pool:
+            first = list(pool.map(lambda kw: search(kw, limit=min(_SEARCH_PAGE, max_results)), kws))
+            for kw, page in zip(kws, first):
+                attribute(kw, page[0] if page else [])
+                if page is not None and not page[1]:
+                    fully_paged.add(kw)
+            from_search = len(matched)
+            for vid, stored in (refresh or {}).items():
+                if vid not in matched:
+                    matched[vid] = list(stored)
+            unique_ids = list(matched)
+            batches = [unique_ids[i : i + _VIDEOS_BATCH] for i in range(0, len(unique_ids), _VIDEOS_BATCH)]
+            items = [item for batch in pool.map(details, batches) for item in batch]
+            score(items)
+
+            paging = [
+                (kw, page[1], len(page[0]))
+                for kw, page in zip(kws, first)
+                if page is not None and page[1] and len(page[0]) < max_results
+            ]
+            for more in pool.map(lambda p: more_pages(*p), paging):
+                items.extend(more)
+    finally:
+        api.log_summary()
+        if client is None:
+            api.close()
+
+    run = DiscoveryRun(
+        candidates=[],
+        searched=[kw for kw, page in zip(kws, first) if page is not None],
+        found=found,
+        fully_paged=fully_paged,
+    )
+    for item in items:
+        vid = str(item.get('id') or '').strip()
+        found_by = tuple(matched.get(vid, ()))
+        run.published_at[vid] = str((item.get('snippet') or {}).get('publishedAt') or '')
+        cand = built.get(vid)
+        if cand is not None:
+            run.candidates.append(replace(cand, keyword=found_by[0] if found_by else '', matched_keywords=found_by))
+    run.refreshed_ids = set(unique_ids[from_search:])
+    search_ids = len(matched) - len(run.refreshed_ids)
+    logger.info(
+        'Discovery completed. candidates=%d search_pages=%d search_hits=%d unique_videos=%d refreshed=%d '
+        'overlap=%.2f elapsed=%.2fs',
+        len(run.candidates),
+        counters['pages'],
+        counters['hits'],
+        search_ids,
+        len(run.refreshed_ids),
+        counters['hits'] / search_ids if search_ids else 0.0,
+        time.perf_counter() - t0,
+    )
+    return run
+
+
+def discover_candidates(**kwargs: Any) -> list[VideoCandidate]:
+    """`discover(...)` returning only the candidates."""
+    return discover(**kwargs).candidates
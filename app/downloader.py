@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import logging
 import re
+import threading
+import time
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Any
 from urllib.error import URLError
@@ -10,6 +13,7 @@ from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
 import yt_dlp
 
+from app import progress
 from app.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -85,13 +89,125 @@ def _build_video_metadata(info: dict[str, Any], source_url: str, normalized_url:
     }
 
 
-def _ytdlp_opts(out_dir: Path, selector: str, cookie_file: str, proxy_url: str) -> dict[str, Any]:
+@dataclass
+class StreamThroughput:
+    """Download report of one media stream, kept in the video metadata as `download_report`."""
+
+    stream: str
+    path: str = ''
+    size_bytes: int = 0
+    # already on disk (a `.part` from an earlier run, or the finished file) when the download started
+    resumed_bytes: int = 0
+    transferred_bytes: int = 0
+    elapsed_sec: float = 0.0
+    avg_bytes_per_sec: float = 0.0
+    peak_bytes_per_sec: float = 0.0
+    fragments: int = 0
+    attempts: int = 0
+
+
+class _ThroughputHook:
+    """yt-dlp progress hook that accumulates a `StreamThroughput` across retry attempts.
+
+    With concurrent fragment downloads yt-dlp may call the hook from its worker
+    threads, so state is locked and progress goes to the tracker captured up front
+    rather than the calling thread's.
+    """
+
+    def __init__(self, stream: str, out_dir: Path) -> None:
+        self.report = StreamThroughput(stream=stream)
+        self.out_dir = out_dir
+        self.tmpfilename = ''
+        self._lock = threading.Lock()
+        self._tracker = progress.current_tracker()
+        self._attempt_first: int | None = None
+        self._attempt_last = 0
+        self._started = 0.0
+        self._part_sizes: dict[str, int] = {}
+
+    def begin_attempt(self) -> None:
+        with self._lock:
+            self.report.attempts += 1
+            self._close_attempt()
+            self._attempt_last = 0
+            self._started = time.monotonic()
+            # bytes already in each `.part`, the baseline yt-dlp continues from
+            self._part_sizes = {}
+            for p in self.out_dir.glob('*.part'):
+                try:
+                    self._part_sizes[p.name] = p.stat().st_size
+                except OSError:  # finished and renamed by a concurrent batch download
+                    continue
+
+    def _close_attempt(self) -> None:
+        if self._attempt_first is not None:
+            self.report.transferred_bytes += max(0, self._attempt_last - self._attempt_first)
+            self.report.elapsed_sec += time.monotonic() - self._started
+            self._attempt_first = None
+
+    def __call__(self, d: dict[str, Any]) -> None:
+        status = d.get('status')
+        done = int(d.get('downloaded_bytes') or 0)
+        total = int(d.get('total_bytes') or d.get('total_bytes_estimate') or 0)
+        with self._lock:
+            self.tmpfilename = str(d.get('tmpfilename') or self.tmpfilename)
+            if status == 'downloading':
+                if self._attempt_first is None:
+                    self._attempt_first = self._part_sizes.get(Path(self.tmpfilename).name, 0)
+                    if self.report.attempts <= 1:
+                        self.report.resumed_bytes = self._attempt_first
+                self._attempt_last = done
+                self.report.peak_bytes_per_sec = max(self.report.peak_bytes_per_sec, float(d.get('speed') or 0.0))
+                self.report.fragments = max(self.report.fragments, int(d.get('fragment_count') or 0))
+                self.report.size_bytes = max(self.report.size_bytes, total)
+            elif status == 'finished':
+                if self._attempt_first is None and self.report.transferred_bytes == 0:
+                    # yt-dlp found the finished file on disk and downloaded nothing
+                    self.report.resumed_bytes = done or total
+                self.report.path = str(d.get('filename') or '')
+                self.report.size_bytes = max(self.report.size_bytes, total, done)
+                self._attempt_last = max(self._attempt_last, done)
+                self._close_attempt()
+        if status == 'downloading' and self._tracker is not None and total > 0:
+            self._tracker.update(done, total, message=f'{self.report.stream} {done}/{total} bytes')
+
+    def finish(self, path: Path) -> StreamThroughput:
+        with self._lock:
+            self._close_attempt()
+            r = self.report
+            r.path = str(path)
+            if path.exists():
+                r.size_bytes = path.stat().st_size
+            r.avg_bytes_per_sec = r.transferred_bytes / r.elapsed_sec if r.elapsed_sec > 0 else 0.0
+            return r
+
+
+def _ytdlp_opts(
+    out_dir: Path,
+    selector: str,
+    cookie_file: str,
+    proxy_url: str,
+    progress_hooks: list[Any] | None = None,
+) -> dict[str, Any]:
     opts: dict[str, Any] = {
         'quiet': False,
         'noplaylist': True,
         'outtmpl': str(out_dir / '%(id)s.%(ext)s'),
         'format': selector,
+        # keep `.part` files and continue them on the next attempt or process run
+        'continuedl': True,
+        'nopart': False,
+        'concurrent_fragment_downloads': max(1, settings.ytdlp_concurrent_fragments),
+        'retries': settings.ytdlp_retries,
+        'fragment_retries': settings.ytdlp_retries,
+        # a missing fragment fails the attempt (and is resumed) instead of leaving a gap in the file
+        'skip_unavailable_fragments': False,
     }
+    if settings.ytdlp_http_chunk_size > 0:
+        # ranged requests of this size; also sidesteps per-connection throttling on long streams
+        opts['http_chunk_size'] = settings.ytdlp_http_chunk_size
+    if progress_hooks:
+        opts['progress_hooks'] = progress_hooks
     if cookie_file:
         opts['cookiefile'] = cookie_file
     if proxy_url:
@@ -113,32 +229,80 @@ def _selector_candidates(stream_kind: str) -> list[str]:
     return candidates
 
 
-def _download_stream(normalized_url: str, out_dir: Path, stream_kind: str, cookie_file: str, proxy_url: str) -> tuple[dict[str, Any], Path]:
+# the server refuses to continue a `.part` file (e.g. it changed or expired upstream)
+_RANGE_NOT_SATISFIABLE = re.compile(r'HTTP Error 416\b|Requested Range Not Satisfiable')
+# the video itself cannot be fetched; neither a retry nor another format will help
+_PERMANENT_FAILURE = re.compile(
+    r'Private video|Video unavailable|This video (has been removed|is no longer available|is not available)'
+    r'|Sign in to confirm|members-only|account associated with this video has been terminated',
+    re.IGNORECASE,
+)
+
+
+def _discard_partial(tmpfilename: str) -> None:
+    """Drop a `.part` file (and yt-dlp's fragment state) the server refuses to continue."""
+    if not tmpfilename:
+        return
+    for p in (Path(tmpfilename), Path(tmpfilename + '.ytdl')):
+        if p.exists():
+            logger.warning('Discarding unresumable partial download. path=%s', p)
+            p.unlink(missing_ok=True)
+
+
+def _download_stream(
+    normalized_url: str,
+    out_dir: Path,
+    stream_kind: str,
+    cookie_file: str,
+    proxy_url: str,
+) -> tuple[dict[str, Any], Path, StreamThroughput]:
     last_exc: Exception | None = None
     info: dict[str, Any] | None = None
-    selector_used = ''
+    hook = _ThroughputHook(stream_kind, out_dir)
+    attempts = max(1, settings.ytdlp_stream_attempts)
 
     for selector in _selector_candidates(stream_kind):
-        selector_used = selector
-        opts = _ytdlp_opts(out_dir=out_dir, selector=selector, cookie_file=cookie_file, proxy_url=proxy_url)
-        try:
-            with yt_dlp.YoutubeDL(opts) as ydl:
-                info = ydl.extract_info(normalized_url, download=True)
+        opts = _ytdlp_opts(
+            out_dir=out_dir,
+            selector=selector,
+            cookie_file=cookie_file,
+            proxy_url=proxy_url,
+            progress_hooks=[hook],
+        )
+        unavailable = False
+        for attempt in range(1, attempts + 1):
+            hook.begin_attempt()
+            try:
+                with yt_dlp.YoutubeDL(opts) as ydl:
+                    info = ydl.extract_info(normalized_url, download=True)
+                break
+            except Exception as exc:
+                last_exc = exc
+                message = str(exc)
+                unavailable = 'Requested format is not available' in message
+                permanent = _PERMANENT_FAILURE.search(message) is not None
+                logger.warning(
+                    'yt-dlp %s download failed with selector=%s. attempt=%d/%d unavailable=%s permanent=%s err=%s',
+                    stream_kind,
+                    selector,
+                    attempt,
+                    attempts,
+                    unavailable,
+                    permanent,
+                    message,
+                )
+                if permanent:
+                    raise
+                if unavailable:
+                    break
+                if attempt >= attempts:
+                    raise
+                if _RANGE_NOT_SATISFIABLE.search(message):
+                    _discard_partial(hook.tmpfilename)
+                # the next attempt continues the `.part` file where this one stopped
+                time.sleep(settings.ytdlp_retry_backoff_sec * 2 ** (attempt - 1))
+        if info is not None:
             break
-        except Exception as exc:
-            last_exc = exc
-            message = str(exc)
-            unavailable = 'Requested format is not available' in message
-            logger.warning(
-                'yt-dlp %s download failed with selector=%s. unavailable=%s err=%s',
-                stream_kind,
-                selector,
-                unavailable,
-                message,
-            )
-            if unavailable:
-                continue
-            raise
 
     if info is None:
         raise RuntimeError(
@@ -151,20 +315,34 @@ def _download_stream(normalized_url: str, out_dir: Path, stream_kind: str, cooki
 
     ext = 'mp4' if stream_kind == 'video' else 'm4a'
     target = out_dir / f'{video_id}.{ext}'
-    if target.exists():
-        return info, target
-
-    # strict extension rule: video must be mp4, audio must be m4a
-    same_ext = sorted(out_dir.glob(f'{video_id}.{ext}'))
-    if same_ext:
-        return info, same_ext[0]
-
-    existing = _candidate_downloads(out_dir, video_id)
-    existing_str = ', '.join(str(p) for p in existing) if existing else 'none'
-    raise RuntimeError(
-        f'{stream_kind} download must be .{ext}, but no .{ext} file exists for id={video_id}. '
-        f'found={existing_str}. please adjust YTDLP format selector or source availability.'
+    if not target.exists():
+        # strict extension rule: video must be mp4, audio must be m4a
+        same_ext = sorted(out_dir.glob(f'{video_id}.{ext}'))
+        if not same_ext:
+            existing = _candidate_downloads(out_dir, video_id)
+            existing_str = ', '.join(str(p) for p in existing) if existing else 'none'
+            raise RuntimeError(
+                f'{stream_kind} download must be .{ext}, but no .{ext} file exists for id={video_id}. '
+                f'found={existing_str}. please adjust YTDLP format selector or source availability.'
+            )
+        target = same_ext[0]
+
+    report = hook.finish(target)
+    logger.info(
+        'Stream downloaded. stream=%s path=%s size=%d resumed=%d transferred=%d elapsed=%.1fs '
+        'avg=%.2fMB/s peak=%.2fMB/s fragments=%d attempts=%d',
+        stream_kind,
+        target,
+        report.size_bytes,
+        report.resumed_bytes,
+        report.transferred_bytes,
+        report.elapsed_sec,
+        report.avg_bytes_per_sec / 1e6,
+        report.peak_bytes_per_sec / 1e6,
+        report.fragments,
+        report.attempts,
     )
+    return info, target, report
 
 
 def _candidate_downloads(out_dir: Path, video_id: str) -> list[Path]:
@@ -229,6 +407,53 @@ def _download_best_thumbnail(info: dict[str, Any], out_dir: Path, proxy_url: str
     return target, best
 
 
+_CHANNEL_PATH = re.compile(r'^/(@[^/]+|channel/[^/]+|c/[^/]+|user/[^/]+)/?$')
+
+
+def _is_single_video_url(url: str) -> bool:
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    if 'list' in query:
+        return False
+    return bool(query.get('v')) or parsed.netloc.endswith('youtu.be') or parsed.path.startswith('/shorts/')
+
+
+def expand_urls(url: str, cookie_file: str = '', proxy_url: str = '', limit: int = 0) -> list[str]:
+    """Playlist/channel URL -> video URLs via a flat yt-dlp extraction (no downloads).
+
+    Plain video URLs are returned as-is without a request. A bare channel URL is read
+    from its `/videos` tab. `limit > 0` keeps only the first entries.
+    """
+    if _is_single_video_url(url):
+        return [url]
+    parsed = urlparse(url)
+    if _CHANNEL_PATH.match(parsed.path):
+        url = urlunparse(parsed._replace(path=parsed.path.rstrip('/') + '/videos'))
+    opts: dict[str, Any] = {'quiet': True, 'extract_flat': 'in_playlist', 'skip_download': True, 'noplaylist': False}
+    if limit > 0:
+        opts['playlistend'] = limit
+    if cookie_file:
+        opts['cookiefile'] = cookie_file
+    if proxy_url:
+        opts['proxy'] = proxy_url
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False) or {}
+    if info.get('_type') not in {'playlist', 'multi_video'}:
+        return [str(info.get('webpage_url') or url)]
+    out: list[str] = []
+    for entry in info.get('entries') or []:
+        if not entry:
+            continue
+        video_id = str(entry.get('id') or '').strip()
+        entry_url = str(entry.get('url') or '')
+        if video_id and not entry_url.startswith('http'):
+            entry_url = f'https://www.youtube.com/watch?v={video_id}'
+        if entry_url and entry_url not in out:
+            out.append(entry_url)
+    logger.info('Expanded URL. url=%s videos=%d title=%s', url, len(out), info.get('title', ''))
+    return out[:limit] if limit > 0 else out
+
+
 def download_media(
     url: str,
     out_dir: Path,
@@ -248,8 +473,8 @@ def download_media(
 
     logger.info('yt-dlp start. url=%s proxy=%s output_dir=%s strategy=%s video_format=%s audio_format=%s', normalized_url, proxy_url or 'none', out_dir, playlist_strategy, settings.ytdlp_video_format, settings.ytdlp_audio_format)
 
-    video_info, video_path = _download_stream(normalized_url, out_dir, 'video', cookie_file, proxy_url)
-    _audio_info, audio_path = _download_stream(normalized_url, out_dir, 'audio', cookie_file, proxy_url)
+    video_info, video_path, video_report = _download_stream(normalized_url, out_dir, 'video', cookie_file, proxy_url)
+    _audio_info, audio_path, audio_report = _download_stream(normalized_url, out_dir, 'audio', cookie_file, proxy_url)
     thumbnail_path, thumbnail_meta = _download_best_thumbnail(video_info, out_dir, proxy_url=proxy_url)
 
     metadata = _build_video_metadata(
@@ -260,6 +485,7 @@ def download_media(
     )
     metadata['best_thumbnail'] = thumbnail_meta
     metadata['thumbnail_path'] = str(thumbnail_path) if thumbnail_path else ''
+    metadata['download_report'] = [asdict(video_report), asdict(audio_report)]
 
     logger.info(
         'yt-dlp completed. id=%s title=%s video=%s audio=%s thumbnail=%s',
@@ -1,24 +1,50 @@
 from __future__ import annotations
 
+import json
 import logging
 import re
 import wave
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
 import numpy as np
 
+from app import progress
 from app.audio_separation import separate_vocals_with_demucs
 from app.dubbing_mixer import AlignedDubClip, DubClip, compose_dubbed_video, media_duration, mix_voice_with_bgm, render_dub_voice_track
 from app.dubbing_segments import DubbingSegment, build_semantic_segments, estimate_chars_per_sec
+from app.run_journal import RunJournal, fingerprint, fingerprint_matches
 from app.settings import settings
 from app.srt_tools import read_srt
-from app.subtitles import Segment, write_ass
+from app.subtitles import SegmentTable, write_ass
 from app.translator import SubtitleTranslator
 from app.tts_engine import create_tts_engine
+from app.word_timings import WordTimings, words_path_for
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class DubbingRun:
+    """State of one video moving through the dubbing stages (see `DubbingPipeline.run`)."""
+
+    video_path: Path
+    audio_path: Path
+    srt_path: Path
+    ass_path: Path
+    stem: str
+    tracker: progress.StageTracker
+    journal: RunJournal
+    own_tracker: bool = False
+    separated_pair: tuple[Path, Path] | None = None
+    bgm: Path = Path()
+    translated: list[DubbingSegment] = field(default_factory=list)
+    segments_path: Path = Path()
+    dub_voice: Path = Path()
+    aligned: list[AlignedDubClip] = field(default_factory=list)
+    out_video: Path = Path()
+
+
 class DubbingPipeline:
     def __init__(self) -> None:
         self.work_dir = settings.work_dir.resolve() / settings.dubbing_work_dirname
@@ -27,6 +53,7 @@ class DubbingPipeline:
         self.audio_dir = self.work_dir / 'audio'
         self.subtitle_dir = self.work_dir / 'subtitles'
         self.output_dir = self.work_dir / 'output'
+        self.journal_dir = settings.work_dir.resolve() / settings.journal_dirname
         for d in (self.sep_dir, self.tts_dir, self.audio_dir, self.subtitle_dir, self.output_dir):
             d.mkdir(parents=True, exist_ok=True)
 
@@ -47,19 +74,25 @@ class DubbingPipeline:
         return out or [cleaned]
 
     @staticmethod
-    def _reflow_zh_subtitles(translated: list[DubbingSegment], aligned: list[AlignedDubClip]) -> list[Segment]:
+    def _reflow_zh_subtitles(translated: list[DubbingSegment], aligned: list[AlignedDubClip]) -> SegmentTable:
         if len(translated) != len(aligned):
             raise ValueError('translated and aligned clips length mismatch')
         if not settings.dubbing_reflow_subtitles:
-            out: list[Segment] = []
+            starts: list[float] = []
+            ends: list[float] = []
+            texts: list[str] = []
             for seg, clip in zip(translated, aligned):
                 text = (seg.translated_text or seg.source_text).strip()
                 if not text:
                     continue
-                out.append(Segment(start=clip.start, end=clip.end, text=text))
-            return out
+                starts.append(clip.start)
+                ends.append(clip.end)
+                texts.append(text)
+            return SegmentTable.from_columns(starts, ends, texts)
 
-        timed_clauses: list[Segment] = []
+        clause_starts: list[float] = []
+        clause_ends: list[float] = []
+        clause_texts: list[str] = []
         for seg, clip in zip(translated, aligned):
             text = (seg.translated_text or seg.source_text).strip()
             if not text:
@@ -75,35 +108,43 @@ class DubbingPipeline:
                 else:
                     end = cursor + span * (weight / max(1, total_weight))
                 end = max(end, cursor + 0.05)
-                timed_clauses.append(Segment(start=cursor, end=end, text=clause))
+                clause_starts.append(cursor)
+                clause_ends.append(end)
+                clause_texts.append(clause)
                 cursor = end
 
-        if not timed_clauses:
-            return []
+        if not clause_texts:
+            return SegmentTable.empty()
 
         # Re-pack timed clauses into readable subtitle chunks.
         max_chars = max(8, int(settings.dubbing_subtitle_max_chars))
         max_duration = max(1.2, float(settings.dubbing_subtitle_max_duration_sec))
         max_gap = max(0.0, float(settings.dubbing_subtitle_max_gap_sec))
-        repacked: list[Segment] = []
+        out_starts: list[float] = []
+        out_ends: list[float] = []
+        out_texts: list[str] = []
 
-        cur_start = timed_clauses[0].start
-        cur_end = timed_clauses[0].end
-        cur_text = timed_clauses[0].text
+        cur_start = clause_starts[0]
+        cur_end = clause_ends[0]
+        cur_text = clause_texts[0]
 
-        for seg in timed_clauses[1:]:
-            cand_text = f'{cur_text}{seg.text}'
-            cand_duration = seg.end - cur_start
-            gap = max(0.0, seg.start - cur_end)
+        for start, end, text in zip(clause_starts[1:], clause_ends[1:], clause_texts[1:]):
+            cand_text = f'{cur_text}{text}'
+            cand_duration = end - cur_start
+            gap = max(0.0, start - cur_end)
             if len(cand_text) <= max_chars and cand_duration <= max_duration and gap <= max_gap:
                 cur_text = cand_text
-                cur_end = max(cur_end, seg.end)
+                cur_end = max(cur_end, end)
                 continue
-            repacked.append(Segment(start=cur_start, end=cur_end, text=cur_text))
-            cur_start, cur_end, cur_text = seg.start, seg.end, seg.text
+            out_starts.append(cur_start)
+            out_ends.append(cur_end)
+            out_texts.append(cur_text)
+            cur_start, cur_end, cur_text = start, end, text
 
-        repacked.append(Segment(start=cur_start, end=cur_end, text=cur_text))
-        return repacked
+        out_starts.append(cur_start)
+        out_ends.append(cur_end)
+        out_texts.append(cur_text)
+        return SegmentTable.from_columns(out_starts, out_ends, out_texts)
 
     @staticmethod
     def _write_mono_ass_from_aligned(
@@ -116,29 +157,41 @@ class DubbingPipeline:
         return output_ass
 
     def _translate_for_dub(self, items: list[DubbingSegment]) -> list[DubbingSegment]:
-        src = [Segment(start=s.start, end=s.end, text=s.source_text) for s in items]
-        translated = SubtitleTranslator(target_language=settings.dub_target_language).translate(src)
-        out: list[DubbingSegment] = []
+        translated = SubtitleTranslator(target_language=settings.dub_target_language).translate_texts(
+            [s.source_text for s in items]
+        )
         max_cps = float(settings.dubbing_max_chars_per_sec)
-        for seg, tr in zip(items, translated):
-            zh = tr.text.strip()
+        for seg, zh in zip(items, translated):
+            zh = zh.strip()
             cps = estimate_chars_per_sec(zh, seg.duration)
             if (not settings.dubbing_preserve_full_text) and cps > max_cps:
                 # Keep first iteration deterministic: limit over-long Chinese text by simple truncation.
                 cap = max(4, int(seg.duration * max_cps))
                 zh = ''.join(ch for ch in zh if not ch.isspace())[:cap]
-            out.append(DubbingSegment(id=seg.id, start=seg.start, end=seg.end, source_text=seg.source_text, translated_text=zh))
-        return out
+            seg.translated_text = zh
+        return items
 
-    def _tts_segments(self, items: list[DubbingSegment], stem: str) -> list[DubClip]:
-        tts = create_tts_engine()
+    def _tts_segments(self, items: list[DubbingSegment], stem: str, journal: RunJournal | None = None) -> list[DubClip]:
+        tts = None
         clips: list[DubClip] = []
-        for seg in items:
+        reused = 0
+        for i, seg in enumerate(items, start=1):
             text = seg.translated_text.strip() or seg.source_text.strip()
             out = self.tts_dir / stem / f'seg_{seg.id:04d}.wav'
-            tts.synthesize_to_wav(text=text, out_path=out)
-            self._trim_tts_wav_silence(out)
+            done = journal.partial_get('tts', str(seg.id)) if journal is not None and journal.resume else None
+            if done is not None and done.get('text') == text and fingerprint_matches(done.get('wav')):
+                reused += 1
+            else:
+                # the engine is created lazily so a fully resumed stage never loads it
+                tts = tts or create_tts_engine()
+                tts.synthesize_to_wav(text=text, out_path=out)
+                self._trim_tts_wav_silence(out)
+                if journal is not None:
+                    journal.partial_set('tts', str(seg.id), {'text': text, 'wav': fingerprint(out)})
             clips.append(DubClip(start=seg.start, end=seg.end, wav_path=out))
+            progress.update(i, len(items))
+        if reused:
+            logger.info('TTS segments resumed from journal. stem=%s reused=%d total=%d', stem, reused, len(items))
         return clips
 
     @staticmethod
@@ -194,7 +247,7 @@ class DubbingPipeline:
             wf.setframerate(sample_rate)
             wf.writeframes(shaped.astype(np.int16).tobytes())
 
-    def run(
+    def start(
         self,
         video_path: Path,
         audio_path: Path,
@@ -202,42 +255,127 @@ class DubbingPipeline:
         ass_path: Path,
         stem: str | None = None,
         separated_pair: tuple[Path, Path] | None = None,
-    ) -> Path:
+        tracker: progress.StageTracker | None = None,
+        journal: RunJournal | None = None,
+        resume: bool = False,
+    ) -> DubbingRun:
         for p in (video_path, audio_path, srt_path, ass_path):
             if not p.exists():
                 raise FileNotFoundError(f'Input file not found: {p}')
         stem = stem or video_path.stem
         logger.info('Dubbing pipeline started. stem=%s', stem)
+        return DubbingRun(
+            video_path=video_path,
+            audio_path=audio_path,
+            srt_path=srt_path,
+            ass_path=ass_path,
+            stem=stem,
+            separated_pair=separated_pair,
+            tracker=tracker or progress.StageTracker(total=8),
+            journal=journal or RunJournal.for_stem(self.journal_dir, stem, resume=resume),
+            own_tracker=tracker is None,
+        )
 
+    def separate(self, run: DubbingRun) -> DubbingRun:
         logger.info('Stage 5/8: separate vocals and accompaniment')
-        if separated_pair is not None:
-            vocals_en, bgm = separated_pair
+        run.tracker.begin('separate', 5)
+        if run.separated_pair is not None:
+            vocals_en, bgm = run.separated_pair
             if not vocals_en.exists() or not bgm.exists():
                 raise FileNotFoundError(f'Invalid separated_pair: vocals={vocals_en} bgm={bgm}')
             logger.info('Reuse pre-separated stems. vocals=%s bgm=%s', vocals_en, bgm)
+        elif (record := run.journal.completed('separate', {'audio': run.audio_path})) is not None:
+            vocals_en, bgm = record.output_path('vocals'), record.output_path('bgm')
         else:
-            vocals_en, bgm = separate_vocals_with_demucs(audio_path=audio_path, out_dir=self.sep_dir / stem)
+            vocals_en, bgm = separate_vocals_with_demucs(audio_path=run.audio_path, out_dir=self.sep_dir / run.stem)
+            run.journal.record('separate', {'audio': run.audio_path}, {'vocals': vocals_en, 'bgm': bgm})
+        run.bgm = bgm
         logger.info('Separation done. vocals=%s bgm=%s', vocals_en, bgm)
+        return run
 
+    def translate(self, run: DubbingRun) -> DubbingRun:
         logger.info('Stage 6/8: build semantic segments and translate to %s', settings.dub_target_language)
-        srt_segments = read_srt(srt_path)
-        semantic_segments = build_semantic_segments(srt_segments)
-        translated = self._translate_for_dub(semantic_segments)
-        logger.info('Translation for dubbing done. semantic_segments=%d', len(translated))
+        run.tracker.begin('dub_translate', 6)
+        words_path = words_path_for(run.srt_path)
+        inputs: dict[str, Path | None] = {'srt': run.srt_path, 'words': words_path if words_path.exists() else None}
+        record = run.journal.completed('dub_translate', inputs)
+        if record is not None:
+            run.segments_path = record.output_path('segments')
+            raw = json.loads(run.segments_path.read_text(encoding='utf-8'))
+            run.translated = [DubbingSegment(**item) for item in raw]
+            return run
+        srt_segments = read_srt(run.srt_path)
+        words = WordTimings.load_for_srt(run.srt_path, expected_segments=len(srt_segments))
+        semantic_segments = build_semantic_segments(srt_segments, words=words)
+        if words is not None:
+            logger.info('Semantic segments cut on word-level pauses. words=%d', len(words))
+        run.translated = self._translate_for_dub(semantic_segments)
+        logger.info('Translation for dubbing done. semantic_segments=%d', len(run.translated))
+        run.segments_path = self.subtitle_dir / f'{run.stem}.dub_segments.json'
+        payload = [asdict(seg) for seg in run.translated]
+        run.segments_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+        run.journal.record('dub_translate', inputs, {'segments': run.segments_path})
+        return run
 
+    def synthesize(self, run: DubbingRun) -> DubbingRun:
         logger.info('Stage 7/8: synthesize TTS and align into dub voice track')
-        clips = self._tts_segments(translated, stem=stem)
-        total_duration = media_duration(audio_path)
-        dub_voice = self.audio_dir / f'{stem}.zh_voice.wav'
-        _, aligned = render_dub_voice_track(clips=clips, out_path=dub_voice, total_duration_sec=total_duration)
-        logger.info('Dub voice rendered. path=%s', dub_voice)
+        run.tracker.begin('tts', 7)
+        inputs: dict[str, Path | None] = {'segments': run.segments_path, 'audio': run.audio_path}
+        record = run.journal.completed('tts', inputs)
+        if record is not None:
+            run.dub_voice = record.output_path('voice')
+            run.aligned = [AlignedDubClip(**{**item, 'wav_path': Path(item['wav_path'])}) for item in record.data['aligned']]
+            return run
+        clips = self._tts_segments(run.translated, stem=run.stem, journal=run.journal)
+        total_duration = media_duration(run.audio_path)
+        run.dub_voice = self.audio_dir / f'{run.stem}.zh_voice.wav'
+        _, run.aligned = render_dub_voice_track(clips=clips, out_path=run.dub_voice, total_duration_sec=total_duration)
+        logger.info('Dub voice rendered. path=%s', run.dub_voice)
+        aligned = [{**asdict(clip), 'wav_path': str(clip.wav_path)} for clip in run.aligned]
+        run.journal.record('tts', inputs, {'voice': run.dub_voice}, {'aligned': aligned})
+        return run
 
+    def compose(self, run: DubbingRun) -> DubbingRun:
         logger.info('Stage 8/8: mix dub voice + bgm and compose final video')
-        mixed = self.audio_dir / f'{stem}.dub_mix.m4a'
-        mix_voice_with_bgm(voice_wav=dub_voice, bgm_wav=bgm, out_audio_path=mixed)
-        mono_ass = self.subtitle_dir / f'{stem}.dub.ass'
-        self._write_mono_ass_from_aligned(translated, aligned, mono_ass)
-        out_video = self.output_dir / f'{stem}.dubbed.mp4'
-        compose_dubbed_video(video_path=video_path, mixed_audio_path=mixed, ass_path=mono_ass, out_path=out_video)
-        logger.info('Dubbing pipeline completed. output=%s', out_video)
-        return out_video
+        run.tracker.begin('compose', 8)
+        inputs: dict[str, Path | None] = {
+            'video': run.video_path,
+            'voice': run.dub_voice,
+            'bgm': run.bgm,
+            'segments': run.segments_path,
+        }
+        record = run.journal.completed('compose', inputs)
+        if record is not None:
+            run.out_video = record.output_path('video')
+            if run.own_tracker:
+                run.tracker.end()
+            return run
+        mixed = self.audio_dir / f'{run.stem}.dub_mix.m4a'
+        mix_voice_with_bgm(voice_wav=run.dub_voice, bgm_wav=run.bgm, out_audio_path=mixed)
+        mono_ass = self.subtitle_dir / f'{run.stem}.dub.ass'
+        self._write_mono_ass_from_aligned(run.translated, run.aligned, mono_ass)
+        run.out_video = self.output_dir / f'{run.stem}.dubbed.mp4'
+        compose_dubbed_video(video_path=run.video_path, mixed_audio_path=mixed, ass_path=mono_ass, out_path=run.out_video)
+        logger.info('Dubbing pipeline completed. output=%s', run.out_video)
+        run.journal.record('compose', inputs, {'video': run.out_video, 'ass': mono_ass})
+        if run.own_tracker:
+            run.tracker.end()
+        return run
+
+    def run(
+        self,
+        video_path: Path,
+        audio_path: Path,
+        srt_path: Path,
+        ass_path: Path,
+        stem: str | None = None,
+        separated_pair: tuple[Path, Path] | None = None,
+        tracker: progress.StageTracker | None = None,
+        journal: RunJournal | None = None,
+        resume: bool = False,
+    ) -> Path:
+        """Run the dubbing stages; with `resume` skip those the stem's run journal shows as done."""
+        run = self.start(video_path, audio_path, srt_path, ass_path, stem, separated_pair, tracker, journal, resume)
+        for stage in (self.separate, self.translate, self.synthesize, self.compose):
+            run = stage(run)
+        return run.out_video
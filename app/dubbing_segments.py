@@ -3,11 +3,14 @@ from __future__ import annotations
 from dataclasses import dataclass
 import re
 
+import numpy as np
+
 from app.settings import settings
-from app.subtitles import Segment
+from app.subtitles import Segments, SegmentTable
+from app.word_timings import WordTimings
 
 
-@dataclass
+@dataclass(slots=True)
 class DubbingSegment:
     id: int
     start: float
@@ -46,34 +49,62 @@ def _collapse_repeated_clauses(text: str) -> str:
     return ' '.join(deduped)
 
 
-def build_semantic_segments(segments: list[Segment]) -> list[DubbingSegment]:
-    if not segments:
-        return []
+def _build_from_words(words: WordTimings, gap_limit: float, max_duration: float) -> list[DubbingSegment]:
+    """Group words into dubbing segments, cutting on measured pauses instead of subtitle boundaries.
 
+    A pause longer than `gap_limit` always cuts. When a group would outgrow `max_duration`,
+    it is cut at its longest internal pause rather than right before the overflowing word.
+    """
+    n = len(words)
+    if n == 0:
+        return []
+    pauses = words.pauses()
     out: list[DubbingSegment] = []
+
+    def emit(first: int, last: int) -> None:
+        text = _collapse_repeated_clauses(words.text_range(first, last))
+        if not text:
+            return
+        out.append(
+            DubbingSegment(
+                id=len(out) + 1,
+                start=round(float(words.starts[first]), 3),
+                end=round(float(words.ends[last - 1]), 3),
+                source_text=text,
+            )
+        )
+
+    first = 0
+    for i in range(1, n):
+        if pauses[i] > gap_limit:
+            emit(first, i)
+            first = i
+        elif words.ends[i] - words.starts[first] > max_duration:
+            cut = first + 1 + int(np.argmax(pauses[first + 1 : i + 1]))
+            emit(first, cut)
+            first = cut
+    emit(first, n)
+    return out
+
+
+def build_semantic_segments(segments: Segments, words: WordTimings | None = None) -> list[DubbingSegment]:
     gap_limit = float(settings.dubbing_segment_gap_sec)
     max_duration = float(settings.dubbing_max_segment_duration_sec)
-    pending: list[Segment] = [segments[0]]
+    if words is not None and len(words) > 0:
+        return _build_from_words(words, gap_limit=gap_limit, max_duration=max_duration)
 
-    def flush() -> None:
-        if not pending:
-            return
-        i = len(out) + 1
-        text = ' '.join(s.text.strip().replace('\n', ' ') for s in pending if s.text.strip())
-        text = _collapse_repeated_clauses(text)
-        out.append(DubbingSegment(id=i, start=pending[0].start, end=pending[-1].end, source_text=text))
-        pending.clear()
-
-    for seg in segments[1:]:
-        cur = pending[-1]
-        gap = max(0.0, seg.start - cur.end)
-        new_duration = seg.end - pending[0].start
-        if gap <= gap_limit and new_duration <= max_duration:
-            pending.append(seg)
-        else:
-            flush()
-            pending.append(seg)
-    flush()
+    table = SegmentTable.coerce(segments)
+    out: list[DubbingSegment] = []
+    for first, last in table.group_by_gap(gap_limit, max_duration):
+        text = ' '.join(t.strip().replace('\n', ' ') for t in table.texts[first:last] if t.strip())
+        out.append(
+            DubbingSegment(
+                id=len(out) + 1,
+                start=float(table.starts[first]),
+                end=float(table.ends[last - 1]),
+                source_text=_collapse_repeated_clauses(text),
+            )
+        )
     return out
 
 
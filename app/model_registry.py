@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST_NAME = 'registry.json'
+_HASH_CHUNK = 1024 * 1024
+
+# one lock per cache directory, shared by every `ModelRegistry` on it: a background `verify`
+# and a concurrent `register`/`invalidate` each read-modify-write the same manifest
+_DIR_LOCKS: dict[Path, threading.Lock] = {}
+_DIR_LOCKS_GUARD = threading.Lock()
+
+
+def _dir_lock(cache_dir: Path) -> threading.Lock:
+    key = cache_dir.expanduser().resolve()
+    with _DIR_LOCKS_GUARD:
+        return _DIR_LOCKS.setdefault(key, threading.Lock())
+
+
+@dataclass
+class RegistryEntry:
+    key: str
+    path: str
+    files: dict[str, int] = field(default_factory=dict)
+    registered_at: str = ''
+    content_sha256: str = ''
+    verified_at: str = ''
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _list_files(root: Path) -> dict[str, int]:
+    """Relative path -> size for every regular file under `root`."""
+    out: dict[str, int] = {}
+    for p in sorted(root.rglob('*')):
+        rel = p.relative_to(root)
+        # skip hub bookkeeping such as `.cache/` and lock files
+        if not p.is_file() or any(part.startswith('.') for part in rel.parts):
+            continue
+        out[rel.as_posix()] = p.stat().st_size
+    return out
+
+
+def _content_sha256(root: Path, files: dict[str, int]) -> str:
+    digest = hashlib.sha256()
+    for rel in sorted(files):
+        digest.update(rel.encode('utf-8'))
+        with (root / rel).open('rb') as f:
+            while chunk := f.read(_HASH_CHUNK):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Disk manifest mapping a model ref (e.g. `huggingface:large-v3`) to a local directory.
+
+    `lookup` only stats files (size check), so resolving a cached model never touches
+    the network. The full content checksum is computed lazily by `verify`: pinned in the
+    background after the first successful load, and re-checked when a registered model
+    fails to load or on explicit request.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+        self.manifest_path = cache_dir / _MANIFEST_NAME
+        self._lock = _dir_lock(cache_dir)
+
+    def _load(self) -> dict[str, RegistryEntry]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            raw = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            logger.warning('Model registry manifest unreadable, ignoring. path=%s', self.manifest_path)
+            return {}
+        return {k: RegistryEntry(**v) for k, v in (raw.get('models') or {}).items()}
+
+    def _save(self, entries: dict[str, RegistryEntry]) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # unique per writer so a crashed or concurrent write never leaves a half file in place
+        tmp = self.manifest_path.with_name(f'{_MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp')
+        payload = {'models': {k: asdict(v) for k, v in entries.items()}}
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, self.manifest_path)
+
+    def get(self, key: str) -> RegistryEntry | None:
+        return self._load().get(key)
+
+    def lookup(self, key: str) -> Path | None:
+        """Return the registered local path if it still exists with the recorded file sizes."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        root = Path(entry.path)
+        if not root.is_dir():
+            logger.info('Registered model path missing. key=%s path=%s', key, root)
+            return None
+        for rel, size in entry.files.items():
+            p = root / rel
+            if not p.is_file() or p.stat().st_size != size:
+                logger.warning('Registered model file changed or missing. key=%s file=%s', key, p)
+                return None
+        return root
+
+    def register(self, key: str, path: Path) -> RegistryEntry:
+        root = Path(path).resolve()
+        entry = RegistryEntry(key=key, path=str(root), files=_list_files(root), registered_at=_now_iso())
+        with self._lock:
+            entries = self._load()
+            entries[key] = entry
+            self._save(entries)
+        logger.info('Model registered. key=%s path=%s files=%d', key, root, len(entry.files))
+        return entry
+
+    def find_key_by_path(self, path: Path) -> str | None:
+        root = str(Path(path).resolve())
+        for key, entry in self._load().items():
+            if entry.path == root:
+                return key
+        return None
+
+    def verify(self, key: str, pin: bool = True) -> bool:
+        """Deep integrity check. With `pin`, the first successful check pins the content checksum.
+
+        With `pin=False` (checking a model that just failed to load) an entry without a
+        pinned checksum cannot be vouched for and counts as failed.
+        """
+        entry = self.get(key)
+        root = self.lookup(key)
+        if entry is None or root is None:
+            return False
+        if not pin and not entry.content_sha256:
+            return False
+        digest = _content_sha256(root, entry.files)
+        if entry.content_sha256 and entry.content_sha256 != digest:
+            logger.warning('Model checksum mismatch. key=%s expected=%s actual=%s', key, entry.content_sha256, digest)
+            return False
+        if not pin:
+            return True
+        with self._lock:
+            entries = self._load()
+            current = entries.get(key)
+            if current is not None:
+                current.content_sha256 = digest
+                current.verified_at = _now_iso()
+                self._save(entries)
+        return True
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            entries = self._load()
+            if entries.pop(key, None) is not None:
+                self._save(entries)
+                logger.info('Model registry entry invalidated. key=%s', key)
+
+    def pin_in_background(self, key: str) -> None:
+        """Compute and store the content checksum off the hot path if it is not pinned yet."""
+        entry = self.get(key)
+        if entry is None or entry.content_sha256:
+            return
+        thread = threading.Thread(target=self.verify, args=(key,), name=f'model-verify-{key}', daemon=True)
+        thread.start()
@@ -6,14 +6,18 @@ import gc
 from dataclasses import dataclass
 from pathlib import Path
 
+from app import progress
 from app.audio_separation import separate_vocals_with_demucs
 from app.dubbing_pipeline import DubbingPipeline
 from app.downloader import download_media
 from app.ffmpeg_tools import merge_av_with_ass
+from app.run_journal import RunJournal, StageRecord
 from app.settings import settings
-from app.subtitles import make_bilingual_segments, write_ass, write_srt
-from app.transcriber import FastWhisperTranscriber
+from app.srt_tools import read_srt
+from app.subtitles import SegmentTable, make_bilingual_segments, write_ass, write_srt
+from app.transcriber import FastWhisperTranscriber, ShardedWhisperTranscriber, create_transcriber
 from app.translator import SubtitleTranslator
+from app.word_timings import words_path_for
 
 logger = logging.getLogger(__name__)
 
@@ -34,14 +38,47 @@ class PipelineOutputs:
     stem: str
 
 
+@dataclass
+class PipelineRun:
+    """State of one URL moving through the pipeline stages (see `Pipeline.run`)."""
+
+    url: str
+    tracker: progress.StageTracker
+    stem: str = ''
+    video_path: Path = Path()
+    audio_path: Path = Path()
+    separated_pair: tuple[Path, Path] | None = None
+    segments: SegmentTable | None = None
+    srt_path: Path = Path()
+    ass_path: Path = Path()
+    output_path: Path = Path()
+    dubbed_output: Path | None = None
+    resume: bool = False
+    journal: RunJournal | None = None
+
+    def outputs(self) -> PipelineOutputs:
+        return PipelineOutputs(
+            bilingual_video=self.output_path,
+            dubbed_video=self.dubbed_output,
+            srt_path=self.srt_path,
+            ass_path=self.ass_path,
+            video_path=self.video_path,
+            audio_path=self.audio_path,
+            stem=self.stem,
+        )
+
+
 class Pipeline:
-    def __init__(self) -> None:
+    def __init__(self, transcriber: FastWhisperTranscriber | ShardedWhisperTranscriber | None = None) -> None:
+        # An injected transcriber is owned by the caller and kept loaded across runs.
+        self._shared_transcriber = transcriber
         self.work_dir = settings.work_dir.resolve()
         self.download_dir = self.work_dir / 'downloads'
         self.subtitle_dir = self.work_dir / 'subtitles'
         self.output_dir = self.work_dir / 'output'
         self.metadata_dir = self.work_dir / settings.metadata_dirname
         self.transcribe_sep_dir = self.work_dir / settings.transcribe_separation_dirname
+        self.journal_dir = self.work_dir / settings.journal_dirname
         for d in (self.download_dir, self.subtitle_dir, self.output_dir, self.metadata_dir, self.transcribe_sep_dir):
             d.mkdir(parents=True, exist_ok=True)
         logger.info('Pipeline initialized. work_dir=%s', self.work_dir)
@@ -69,69 +106,158 @@ class Pipeline:
                 return audio_path, None
             raise
 
-    def run(self, url: str) -> PipelineOutputs:
+    @staticmethod
+    def _resumed(run: PipelineRun, stage: str, inputs: dict[str, Path | None]) -> StageRecord | None:
+        return run.journal.completed(stage, inputs) if run.journal is not None else None
+
+    @staticmethod
+    def _record(run: PipelineRun, stage: str, inputs: dict[str, Path | None], outputs: dict[str, Path | None]) -> None:
+        if run.journal is not None:
+            run.journal.record(stage, inputs, outputs)
+
+    def start(self, url: str, resume: bool = False) -> PipelineRun:
+        # with dubbing enabled DubbingPipeline reports stages 5-8 on the same tracker
+        run = PipelineRun(
+            url=url,
+            tracker=progress.StageTracker(total=8 if settings.pipeline_enable_dubbing else 4),
+            resume=resume,
+        )
+        if resume:
+            run.journal = RunJournal.find_by_url(self.journal_dir, url)
+            if run.journal is None:
+                logger.info('No run journal for url, starting from stage 1. url=%s', url)
+        return run
+
+    def download(self, run: PipelineRun) -> PipelineRun:
         logger.info('Stage 1/4: parse and download media')
+        run.tracker.begin('download', 1)
+        record = self._resumed(run, 'download', {})
+        if record is not None and run.journal is not None:
+            run.video_path, run.audio_path = record.output_path('video'), record.output_path('audio')
+            run.stem = run.journal.stem
+            return run
         media = download_media(
-            url=url,
+            url=run.url,
             out_dir=self.download_dir,
             cookie_file=settings.cookie_file,
             proxy_url=settings.ytdlp_proxy,
             playlist_strategy=settings.playlist_strategy,
         )
-        video_path = Path(media['video_path'])
-        audio_path = Path(media['audio_path'])
-        stem = self._artifact_stem(media)
-        logger.info('Downloaded media. video=%s audio=%s stem=%s', video_path, audio_path, stem)
+        run.video_path = Path(media['video_path'])
+        run.audio_path = Path(media['audio_path'])
+        run.stem = self._artifact_stem(media)
+        logger.info('Downloaded media. video=%s audio=%s stem=%s', run.video_path, run.audio_path, run.stem)
 
-        metadata_path = self.metadata_dir / f'{stem}.video_info.json'
+        metadata_path = self.metadata_dir / f'{run.stem}.video_info.json'
         metadata_path.write_text(json.dumps(media.get('metadata', {}), ensure_ascii=False, indent=2), encoding='utf-8')
         logger.info('Video metadata written. path=%s', metadata_path)
 
+        if run.journal is None or run.journal.stem != run.stem:
+            run.journal = RunJournal.for_stem(self.journal_dir, run.stem, resume=run.resume)
+        run.journal.url = run.url
+        self._record(run, 'download', {}, {'video': run.video_path, 'audio': run.audio_path, 'metadata': metadata_path})
+        return run
+
+    def transcribe(self, run: PipelineRun) -> PipelineRun:
         logger.info('Stage 2/4: transcribe audio to SRT segments')
-        transcribe_audio_path, separated_pair = self._resolve_transcription_audio(audio_path=audio_path, stem=stem)
-        transcriber = FastWhisperTranscriber()
-        segments = transcriber.transcribe(str(transcribe_audio_path))
-        del transcriber
-        gc.collect()
-        if torch is not None and torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        srt_path = self.subtitle_dir / f'{stem}.srt'
-        write_srt(segments, srt_path)
-        logger.info('SRT written. path=%s segments=%d transcribe_audio=%s', srt_path, len(segments), transcribe_audio_path)
+        run.tracker.begin('transcribe', 2)
+        inputs: dict[str, Path | None] = {'audio': run.audio_path}
+        record = self._resumed(run, 'transcribe', inputs)
+        if record is not None:
+            run.srt_path = record.output_path('srt')
+            vocals, bgm = record.output_path('vocals'), record.output_path('bgm')
+            run.separated_pair = (vocals, bgm) if vocals is not None and bgm is not None else None
+            run.segments = SegmentTable.from_segments(read_srt(run.srt_path))
+            return run
+        transcribe_audio_path, run.separated_pair = self._resolve_transcription_audio(
+            audio_path=run.audio_path,
+            stem=run.stem,
+        )
+        if self._shared_transcriber is not None:
+            segments, words = self._shared_transcriber.transcribe_with_words(str(transcribe_audio_path))
+        else:
+            transcriber = create_transcriber()
+            try:
+                segments, words = transcriber.transcribe_with_words(str(transcribe_audio_path))
+            finally:
+                if isinstance(transcriber, ShardedWhisperTranscriber):
+                    transcriber.close()
+            del transcriber
+            gc.collect()
+            if torch is not None and torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        run.segments = segments
+        run.srt_path = self.subtitle_dir / f'{run.stem}.srt'
+        write_srt(segments, run.srt_path)
+        logger.info(
+            'SRT written. path=%s segments=%d transcribe_audio=%s',
+            run.srt_path,
+            len(segments),
+            transcribe_audio_path,
+        )
+        words_path: Path | None = None
+        if words is not None:
+            words_path = words.save(words_path_for(run.srt_path))
+            logger.info('Word timings written. path=%s words=%d', words_path, len(words))
+        else:
+            # never leave a sidecar from an earlier run next to a freshly written SRT
+            words_path_for(run.srt_path).unlink(missing_ok=True)
+        vocals, bgm = run.separated_pair or (None, None)
+        self._record(run, 'transcribe', inputs, {'srt': run.srt_path, 'words': words_path, 'vocals': vocals, 'bgm': bgm})
+        return run
 
+    def translate(self, run: PipelineRun) -> PipelineRun:
         logger.info('Stage 3/4: translate segments and write bilingual ASS')
-        translated = SubtitleTranslator().translate(segments)
-        bilingual = make_bilingual_segments(segments, translated)
-        ass_path = self.subtitle_dir / f'{stem}.ass'
-        write_ass(bilingual, ass_path)
-        logger.info('ASS written (bilingual). path=%s segments=%d', ass_path, len(bilingual))
+        run.tracker.begin('translate', 3)
+        inputs: dict[str, Path | None] = {'srt': run.srt_path}
+        record = self._resumed(run, 'translate', inputs)
+        if record is not None:
+            run.ass_path = record.output_path('ass')
+            return run
+        translated = SubtitleTranslator().translate(run.segments)
+        bilingual = make_bilingual_segments(run.segments, translated)
+        run.ass_path = self.subtitle_dir / f'{run.stem}.ass'
+        write_ass(bilingual, run.ass_path)
+        logger.info('ASS written (bilingual). path=%s segments=%d', run.ass_path, len(bilingual))
+        self._record(run, 'translate', inputs, {'ass': run.ass_path})
+        return run
 
+    def merge(self, run: PipelineRun) -> PipelineRun:
         logger.info('Stage 4/4: merge video + audio + ASS')
-        output_path = self.output_dir / f'{stem}.mp4'
-        merge_av_with_ass(video=video_path, audio=audio_path, ass=ass_path, out=output_path)
-        logger.info('Merge completed. output=%s', output_path)
+        run.tracker.begin('merge', 4)
+        inputs: dict[str, Path | None] = {'video': run.video_path, 'audio': run.audio_path, 'ass': run.ass_path}
+        record = self._resumed(run, 'merge', inputs)
+        if record is not None:
+            run.output_path = record.output_path('output')
+            return run
+        run.output_path = self.output_dir / f'{run.stem}.mp4'
+        merge_av_with_ass(video=run.video_path, audio=run.audio_path, ass=run.ass_path, out=run.output_path)
+        logger.info('Merge completed. output=%s', run.output_path)
+        self._record(run, 'merge', inputs, {'output': run.output_path})
+        return run
 
-        dubbed_output: Path | None = None
+    def dub(self, run: PipelineRun) -> PipelineRun:
         if settings.pipeline_enable_dubbing:
             logger.info('Stage 5/5: run Chinese dubbing pipeline')
-            dubbed_output = DubbingPipeline().run(
-                video_path=video_path,
-                audio_path=audio_path,
-                srt_path=srt_path,
-                ass_path=ass_path,
-                stem=stem,
-                separated_pair=separated_pair,
+            run.dubbed_output = DubbingPipeline().run(
+                video_path=run.video_path,
+                audio_path=run.audio_path,
+                srt_path=run.srt_path,
+                ass_path=run.ass_path,
+                stem=run.stem,
+                separated_pair=run.separated_pair,
+                tracker=run.tracker,
+                journal=run.journal,
             )
-            logger.info('Dubbing completed. output=%s', dubbed_output)
+            logger.info('Dubbing completed. output=%s', run.dubbed_output)
         else:
             logger.info('Dubbing stage disabled by PIPELINE_ENABLE_DUBBING=false')
+        run.tracker.end()
+        return run
 
-        return PipelineOutputs(
-            bilingual_video=output_path,
-            dubbed_video=dubbed_output,
-            srt_path=srt_path,
-            ass_path=ass_path,
-            video_path=video_path,
-            audio_path=audio_path,
-            stem=stem,
-        )
+    def run(self, url: str, resume: bool = False) -> PipelineOutputs:
+        """Run all stages for `url`; with `resume` skip stages its run journal shows as done."""
+        run = self.start(url, resume=resume)
+        for stage in (self.download, self.transcribe, self.translate, self.merge, self.dub):
+            run = stage(run)
+        return run.outputs()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Iterator
+
+# subprocess jobs print events on stdout behind this prefix; the dashboard parses them
+PROGRESS_PREFIX = '@@progress '
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    """One structured pipeline progress event.
+
+    `event` is `start`/`progress`/`end`; `index`/`total` place the stage in the run
+    (e.g. 2 of 5) and `percent`/`eta_sec` describe progress inside the stage.
+    """
+
+    stage: str
+    event: str
+    index: int = 0
+    total: int = 0
+    percent: float | None = None
+    eta_sec: float | None = None
+    elapsed_sec: float = 0.0
+    message: str = ''
+    ts: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict[str, object]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> ProgressEvent:
+        known = {k: data[k] for k in cls.__dataclass_fields__ if k in data}
+        return cls(**known)
+
+
+Sink = Callable[[ProgressEvent], None]
+
+_global_sinks: list[Sink] = []
+_global_lock = threading.Lock()
+_local = threading.local()
+
+
+def add_sink(sink: Sink) -> None:
+    """Receive events from every thread (e.g. the stdout sink of a CLI run)."""
+    with _global_lock:
+        _global_sinks.append(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    with _global_lock:
+        if sink in _global_sinks:
+            _global_sinks.remove(sink)
+
+
+@contextmanager
+def thread_sink(sink: Sink) -> Iterator[None]:
+    """Receive events emitted by the current thread only (in-process dashboard jobs)."""
+    sinks = getattr(_local, 'sinks', [])
+    _local.sinks = [*sinks, sink]
+    try:
+        yield
+    finally:
+        _local.sinks = sinks
+
+
+def stdout_sink(event: ProgressEvent) -> None:
+    sys.stdout.write(PROGRESS_PREFIX + json.dumps(event.to_dict(), ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def parse_progress_line(line: str) -> ProgressEvent | None:
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    try:
+        return ProgressEvent.from_dict(json.loads(line[len(PROGRESS_PREFIX) :]))
+    except (ValueError, TypeError):
+        return None
+
+
+def emit(event: ProgressEvent) -> None:
+    with _global_lock:
+        sinks = [*_global_sinks, *getattr(_local, 'sinks', [])]
+    for sink in sinks:
+        try:
+            sink(event)
+        except Exception:  # progress reporting must never break the pipeline
+            pass
+
+
+class StageTracker:
+    """Emits start/end events as a run moves through its numbered stages.
+
+    `begin` closes the previous stage; `update` reports units done inside the current
+    stage and estimates the ETA from the rate so far. Percent updates are throttled to
+    `min_interval_sec` so per-segment loops do not flood the event stream.
+    """
+
+    def __init__(self, total: int, min_interval_sec: float = 0.5) -> None:
+        self.total = total
+        self.min_interval_sec = min_interval_sec
+        self._stage = ''
+        self._index = 0
+        self._started = 0.0
+        self._last_update = 0.0
+
+    def begin(self, stage: str, index: int, message: str = '') -> None:
+        self.end()
+        self._stage, self._index = stage, index
+        self._started = self._last_update = time.monotonic()
+        _local.tracker = self
+        emit(ProgressEvent(stage=stage, event='start', index=index, total=self.total, percent=0.0, message=message))
+
+    def update(self, done: int, units: int, message: str = '') -> None:
+        if not self._stage or units <= 0:
+            return
+        now = time.monotonic()
+        if done < units and now - self._last_update < self.min_interval_sec:
+            return
+        self._last_update = now
+        elapsed = now - self._started
+        ratio = min(1.0, max(0.0, done / units))
+        eta = elapsed * (1.0 - ratio) / ratio if ratio > 0 else None
+        emit(
+            ProgressEvent(
+                stage=self._stage,
+                event='progress',
+                index=self._index,
+                total=self.total,
+                percent=round(ratio * 100.0, 1),
+                eta_sec=round(eta, 1) if eta is not None else None,
+                elapsed_sec=round(elapsed, 3),
+                message=message or f'{done}/{units}',
+            )
+        )
+
+    def end(self, message: str = '') -> None:
+        if not self._stage:
+            return
+        emit(
+            ProgressEvent(
+                stage=self._stage,
+                event='end',
+                index=self._index,
+                total=self.total,
+                percent=100.0,
+                elapsed_sec=round(time.monotonic() - self._started, 3),
+                message=message,
+            )
+        )
+        self._stage = ''
+        if getattr(_local, 'tracker', None) is self:
+            _local.tracker = None
+
+
+def current_tracker() -> StageTracker | None:
+    return getattr(_local, 'tracker', None)
+
+
+def update(done: int, units: int, message: str = '') -> None:
+    """Report progress inside the stage the current thread's tracker is in (no-op otherwise)."""
+    tracker = current_tracker()
+    if tracker is not None:
+        tracker.update(done, units, message)
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_SUFFIX = '.journal.json'
+_PARTIAL_SUFFIX = '.journal.partial.jsonl'
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def fingerprint(path: Path) -> dict[str, Any] | None:
+    """Cheap identity of a file on disk: resolved path, size and mtime (None if missing)."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if not path.is_file():
+        return None
+    return {'path': str(path.resolve()), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def fingerprint_matches(fp: dict[str, Any] | None) -> bool:
+    return fp is not None and fingerprint(Path(fp['path'])) == fp
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    inputs: dict[str, dict[str, Any] | None] = field(default_factory=dict)
+    outputs: dict[str, dict[str, Any] | None] = field(default_factory=dict)
+    data: dict[str, Any] = field(default_factory=dict)
+    completed_at: str = ''
+
+    def output_path(self, name: str) -> Path | None:
+        fp = self.outputs.get(name)
+        return Path(fp['path']) if fp else None
+
+
+class RunJournal:
+    """Per-stem record of completed pipeline stages, rewritten atomically after each one.
+
+    A stage record holds fingerprints of the files it read and wrote plus any small
+    state a later stage needs. On resume a stage is skipped only if its recorded inputs
+    match the current files and its outputs are still on disk unchanged; since every
+    stage's inputs are an earlier stage's outputs, re-running one stage invalidates
+    everything after it. `partial` keeps per-item progress inside a stage (e.g. which
+    TTS segments are already synthesized); callers validate those items themselves.
+    Partial items are appended one line each to a side log, so a stage with hundreds
+    of items costs one small write per item; the next full save folds the log in.
+    """
+
+    def __init__(self, path: Path, *, resume: bool = False) -> None:
+        self.path = path
+        self.partial_path = path.with_name(path.name.removesuffix(_SUFFIX) + _PARTIAL_SUFFIX)
+        self.resume = resume
+        self._lock = threading.Lock()
+        self.stem = ''
+        self.url = ''
+        self.stages: dict[str, StageRecord] = {}
+        self.partial: dict[str, dict[str, Any]] = {}
+        self._load()
+
+    @classmethod
+    def for_stem(cls, journal_dir: Path, stem: str, *, resume: bool = False) -> RunJournal:
+        journal = cls(journal_dir / f'{stem}{_SUFFIX}', resume=resume)
+        journal.stem = stem
+        return journal
+
+    @classmethod
+    def find_by_url(cls, journal_dir: Path, url: str) -> RunJournal | None:
+        """Most recently written journal of a `yp-run` for `url`, if any."""
+        if not journal_dir.is_dir():
+            return None
+        found = sorted(journal_dir.glob(f'*{_SUFFIX}'), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+        for path in found:
+            journal = cls(path, resume=True)
+            if journal.url == url:
+                return journal
+        return None
+
+    def _load(self) -> None:
+        if self.path.exists():
+            try:
+                raw = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                logger.warning('Run journal unreadable, starting over. path=%s', self.path)
+                return
+            self.stem = str(raw.get('stem') or '')
+            self.url = str(raw.get('url') or '')
+            self.stages = {k: StageRecord(**v) for k, v in (raw.get('stages') or {}).items()}
+            self.partial = dict(raw.get('partial') or {})
+        self._replay_partial()
+
+    def _replay_partial(self) -> None:
+        if not self.partial_path.exists():
+            return
+        try:
+            lines = self.partial_path.read_text(encoding='utf-8').splitlines()
+        except OSError:
+            logger.warning('Run journal partial log unreadable, ignoring it. path=%s', self.partial_path)
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                self.partial.setdefault(str(entry['stage']), {})[str(entry['key'])] = entry['value']
+            except (ValueError, KeyError, TypeError):
+                # a line cut short by a crash; the items before it are still good
+                continue
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        payload = {
+            'stem': self.stem,
+            'url': self.url,
+            'updated_at': _now_iso(),
+            'stages': {k: asdict(v) for k, v in self.stages.items()},
+            'partial': self.partial,
+        }
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, self.path)
+        # everything in the side log is in the journal now; replaying it again would be harmless
+        self.partial_path.unlink(missing_ok=True)
+
+    def completed(self, stage: str, inputs: dict[str, Path | None]) -> StageRecord | None:
+        """The stage's record if resuming and it is still valid for these inputs, else None."""
+        if not self.resume:
+            return None
+        with self._lock:
+            record = self.stages.get(stage)
+        if record is None:
+            return None
+        current = {name: fingerprint(p) if p is not None else None for name, p in inputs.items()}
+        if current != record.inputs:
+            logger.info('Journal stage stale, inputs changed. stem=%s stage=%s', self.stem, stage)
+            return None
+        for name, fp in record.outputs.items():
+            if fp is not None and not fingerprint_matches(fp):
+                logger.info('Journal stage stale, output changed or missing. stem=%s stage=%s output=%s', self.stem, stage, name)
+                return None
+        logger.info('Stage resumed from journal. stem=%s stage=%s', self.stem, stage)
+        return record
+
+    def record(
+        self,
+        stage: str,
+        inputs: dict[str, Path | None],
+        outputs: dict[str, Path | None],
+        data: dict[str, Any] | None = None,
+    ) -> StageRecord:
+        record = StageRecord(
+            stage=stage,
+            inputs={name: fingerprint(p) if p is not None else None for name, p in inputs.items()},
+            outputs={name: fingerprint(p) if p is not None else None for name, p in outputs.items()},
+            data=data or {},
+            completed_at=_now_iso(),
+        )
+        with self._lock:
+            self.stages[stage] = record
+            self._save()
+        return record
+
+    def partial_get(self, stage: str, key: str) -> Any:
+        with self._lock:
+            return (self.partial.get(stage) or {}).get(key)
+
+    def partial_set(self, stage: str, key: str, value: Any) -> None:
+        with self._lock:
+            self.partial.setdefault(stage, {})[key] = value
+            self.partial_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.partial_path.open('a', encoding='utf-8') as f:
+                f.write(json.dumps({'stage': stage, 'key': key, 'value': value}, ensure_ascii=False) + '\n')
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# resource classes a pipeline stage can occupy
+NETWORK = 'network'
+GPU = 'gpu'
+CPU = 'cpu'
+
+
+@dataclass(frozen=True)
+class ResourceUsage:
+    name: str
+    slots: int
+    tasks: int
+    busy_sec: float
+    wait_sec: float
+    peak: int
+    utilization: float  # busy time / (slots * wall time)
+
+
+class _Resource:
+    """Counting semaphore that admits waiters by priority (lower first), FIFO on ties."""
+
+    def __init__(self, name: str, slots: int) -> None:
+        self.name = name
+        self.slots = max(1, int(slots))
+        self._cond = threading.Condition()
+        self._free = self.slots
+        self._waiting: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self.tasks = 0
+        self.busy_sec = 0.0
+        self.wait_sec = 0.0
+        self.peak = 0
+
+    def acquire(self, priority: int) -> float:
+        t0 = time.perf_counter()
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._cond.wait_for(lambda: self._free > 0 and self._waiting[0] == ticket)
+            heapq.heappop(self._waiting)
+            self._free -= 1
+            self.peak = max(self.peak, self.slots - self._free)
+            self.wait_sec += time.perf_counter() - t0
+            # the next waiter may also fit if more than one slot is free
+            self._cond.notify_all()
+        return time.perf_counter()
+
+    def release(self, acquired_at: float) -> None:
+        with self._cond:
+            self._free += 1
+            self.tasks += 1
+            self.busy_sec += time.perf_counter() - acquired_at
+            self._cond.notify_all()
+
+
+class ResourceScheduler:
+    """Per-resource concurrency limits for pipeline stages, with utilization accounting.
+
+    Each stage runs inside `use(resource, priority)`; at most `slots` stages hold a
+    resource at once. Lower `priority` (e.g. the video's position in the batch) is
+    admitted first, so older videos finish before new downloads take the network.
+    """
+
+    def __init__(self, slots: dict[str, int]) -> None:
+        self._resources = {name: _Resource(name, n) for name, n in slots.items()}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def use(self, resource: str, priority: int = 0) -> Iterator[None]:
+        res = self._resources.get(resource)
+        if res is None:
+            yield
+            return
+        acquired_at = res.acquire(priority)
+        try:
+            yield
+        finally:
+            res.release(acquired_at)
+
+    def report(self) -> list[ResourceUsage]:
+        wall = max(1e-9, time.perf_counter() - self._started)
+        out: list[ResourceUsage] = []
+        for res in self._resources.values():
+            with res._cond:
+                out.append(
+                    ResourceUsage(
+                        name=res.name,
+                        slots=res.slots,
+                        tasks=res.tasks,
+                        busy_sec=round(res.busy_sec, 3),
+                        wait_sec=round(res.wait_sec, 3),
+                        peak=res.peak,
+                        utilization=round(min(1.0, res.busy_sec / (res.slots * wall)), 4),
+                    )
+                )
+        return out
+
+    def log_report(self) -> None:
+        for u in self.report():
+            logger.info(
+                'Resource utilization. resource=%s slots=%d tasks=%d busy=%.1fs wait=%.1fs peak=%d utilization=%.0f%%',
+                u.name,
+                u.slots,
+                u.tasks,
+                u.busy_sec,
+                u.wait_sec,
+                u.peak,
+                u.utilization * 100,
+            )
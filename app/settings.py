@@ -13,6 +13,7 @@ class Settings(BaseSettings):
     source_url: str = Field(default='')
     output_name: str = Field(default='final_output')
     metadata_dirname: str = Field(default='metadata')
+    journal_dirname: str = Field(default='journal')
 
     # yt-dlp
     cookie_file: str = Field(default='')
@@ -20,6 +21,11 @@ class Settings(BaseSettings):
     playlist_strategy: str = Field(default='first')
     ytdlp_video_format: str = Field(default='bestvideo[ext=mp4][vcodec^=avc1]/bestvideo[ext=mp4]/bestvideo')
     ytdlp_audio_format: str = Field(default='bestaudio[ext=m4a]/bestaudio')
+    ytdlp_concurrent_fragments: int = Field(default=4)
+    ytdlp_http_chunk_size: int = Field(default=10 * 1024 * 1024)
+    ytdlp_retries: int = Field(default=10)
+    ytdlp_stream_attempts: int = Field(default=3)
+    ytdlp_retry_backoff_sec: float = Field(default=2.0)
 
     # ffmpeg
     ffmpeg_path: str = Field(default='')
@@ -28,6 +34,7 @@ class Settings(BaseSettings):
     # logging
     log_level: str = Field(default='INFO')
     log_file: Path = Field(default=Path('runtime/logs/pipeline.log'))
+    progress_stdout: bool = Field(default=False)
 
     # whisper
     whisper_model: str = Field(default='large-v3')
@@ -36,10 +43,19 @@ class Settings(BaseSettings):
     whisper_model_cache_dir: Path = Field(default=Path('runtime/models'))
     whisper_download_to_local: bool = Field(default=True)
     whisper_download_proxy: str = Field(default='')
+    whisper_model_refresh: bool = Field(default=False)
     whisper_model_fallback_to_modelscope: bool = Field(default=True)
     whisper_device: str = Field(default='auto')
     whisper_compute_type: str = Field(default='auto')
     whisper_language: str = Field(default='en')
+    whisper_batched: bool = Field(default=False)
+    whisper_batch_size: int = Field(default=16)
+    whisper_beam_size: int = Field(default=5)
+    whisper_cpu_threads: int = Field(default=0)
+    whisper_num_workers: int = Field(default=1)
+    whisper_word_timestamps: bool = Field(default=False)
+    whisper_shard_count: int = Field(default=0)
+    whisper_shard_min_duration_sec: float = Field(default=900.0)
     transcribe_use_vocals: bool = Field(default=False)
     transcribe_vocals_fallback_to_original: bool = Field(default=True)
     transcribe_separation_dirname: str = Field(default='transcribe_separated')
@@ -68,10 +84,42 @@ class Settings(BaseSettings):
     discovery_max_duration_sec: int = Field(default=3600)
     discovery_http_retries: int = Field(default=3)
     discovery_http_retry_backoff_sec: float = Field(default=1.2)
+    discovery_http_timeout_sec: float = Field(default=30.0)
+    discovery_concurrency: int = Field(default=6)
+    discovery_daily_quota_budget: int = Field(default=9000)
+    discovery_refresh_limit: int = Field(default=200)
+    discovery_rescore_chunk_size: int = Field(default=5000)
+    discovery_rescore_interval_sec: float = Field(default=0.0)
+    discovery_http_cache_enabled: bool = Field(default=True)
+    discovery_http_cache_ttl_search_sec: float = Field(default=3600.0)
+    discovery_http_cache_ttl_videos_sec: float = Field(default=900.0)
+    discovery_api_base: str = Field(default='https://www.googleapis.com/youtube/v3')
     discovery_db_path: Path = Field(default=Path('runtime/discovery/discovery.db'))
+    discovery_db_wal: bool = Field(default=True)
+    discovery_db_busy_timeout_ms: int = Field(default=5000)
+    discovery_db_mmap_size: int = Field(default=268435456)
+
+    # discovery dashboard job workers
+    dashboard_workers: str = Field(default='1')
+    dashboard_job_executor: str = Field(default='subprocess')
+    dashboard_keep_models_warm: bool = Field(default=True)
+    dashboard_job_resource_class: str = Field(default='default')
+    dashboard_worker_heartbeat_sec: float = Field(default=15.0)
+    dashboard_stale_job_sec: float = Field(default=120.0)
+    dashboard_worker_idle_poll_sec: float = Field(default=30.0)
+    dashboard_job_max_attempts: int = Field(default=2)
+    dashboard_fair_share_window: int = Field(default=64)
+    dashboard_deadline_horizon_sec: float = Field(default=3600.0)
+    dashboard_boost_step: float = Field(default=5.0)
+    dashboard_event_buffer: int = Field(default=2000)
+    dashboard_db_pool_size: int = Field(default=8)
 
     # unified pipeline
     pipeline_enable_dubbing: bool = Field(default=True)
+    batch_max_in_flight: int = Field(default=4)
+    scheduler_network_slots: int = Field(default=4)
+    scheduler_gpu_slots: int = Field(default=1)
+    scheduler_cpu_slots: int = Field(default=2)
 
     # dubbing pipeline (independent from subtitle-only pipeline)
     dubbing_work_dirname: str = Field(default='dubbing')
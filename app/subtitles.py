@@ -2,21 +2,191 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Iterable, Iterator, Sequence
 
+import numpy as np
 
-@dataclass
+
+@dataclass(slots=True)
 class Segment:
     start: float
     end: float
     text: str
 
 
-def make_bilingual_segments(original: list[Segment], translated: list[Segment]) -> list[Segment]:
+class SegmentView:
+    """Read-only view of one row of a `SegmentTable` (duck-types `Segment`)."""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: SegmentTable, index: int) -> None:
+        self._table = table
+        self._index = index
+
+    @property
+    def start(self) -> float:
+        return float(self._table.starts[self._index])
+
+    @property
+    def end(self) -> float:
+        return float(self._table.ends[self._index])
+
+    @property
+    def text(self) -> str:
+        return self._table.texts[self._index]
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f'SegmentView(start={self.start!r}, end={self.end!r}, text={self.text!r})'
+
+
+class SegmentTable:
+    """Columnar subtitle segments: float64 `starts`/`ends` arrays plus a `texts` list.
+
+    Stages that only change text (translation, bilingual merge) share the time arrays
+    via `with_texts`, and timing operations run vectorized over the whole transcript.
+    """
+
+    __slots__ = ('starts', 'ends', 'texts')
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, texts: list[str]) -> None:
+        if not (len(starts) == len(ends) == len(texts)):
+            raise ValueError('starts, ends and texts length mismatch')
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.texts = texts
+
+    @classmethod
+    def empty(cls) -> SegmentTable:
+        return cls(np.empty(0), np.empty(0), [])
+
+    @classmethod
+    def from_columns(cls, starts: Sequence[float], ends: Sequence[float], texts: Sequence[str]) -> SegmentTable:
+        return cls(
+            np.fromiter(starts, dtype=np.float64, count=len(starts)),
+            np.fromiter(ends, dtype=np.float64, count=len(ends)),
+            list(texts),
+        )
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Segment | SegmentView]) -> SegmentTable:
+        starts: list[float] = []
+        ends: list[float] = []
+        texts: list[str] = []
+        for seg in segments:
+            starts.append(seg.start)
+            ends.append(seg.end)
+            texts.append(seg.text)
+        return cls.from_columns(starts, ends, texts)
+
+    @classmethod
+    def coerce(cls, segments: SegmentTable | Iterable[Segment | SegmentView]) -> SegmentTable:
+        return segments if isinstance(segments, SegmentTable) else cls.from_segments(segments)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: int) -> SegmentView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('segment index out of range')
+        return SegmentView(self, index)
+
+    def __iter__(self) -> Iterator[SegmentView]:
+        for i in range(len(self)):
+            yield SegmentView(self, i)
+
+    def to_segments(self) -> list[Segment]:
+        return [Segment(start=float(s), end=float(e), text=t) for s, e, t in zip(self.starts, self.ends, self.texts)]
+
+    def with_texts(self, texts: Sequence[str]) -> SegmentTable:
+        """Same timings, new texts. Time arrays are shared, not copied."""
+        if len(texts) != len(self):
+            raise ValueError('texts length mismatch')
+        return SegmentTable(self.starts, self.ends, list(texts))
+
+    def shift(self, offset_sec: float) -> SegmentTable:
+        return SegmentTable(
+            np.maximum(0.0, self.starts + offset_sec), np.maximum(0.0, self.ends + offset_sec), list(self.texts)
+        )
+
+    def filter(self, mask: np.ndarray) -> SegmentTable:
+        mask = np.asarray(mask, dtype=bool)
+        idx = np.flatnonzero(mask)
+        return SegmentTable(self.starts[idx], self.ends[idx], [self.texts[i] for i in idx])
+
+    def durations(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    def gaps(self) -> np.ndarray:
+        """Silence before each segment (0 for the first one and for overlaps)."""
+        out = np.zeros(len(self), dtype=np.float64)
+        if len(self) > 1:
+            out[1:] = np.maximum(0.0, self.starts[1:] - self.ends[:-1])
+        return out
+
+    def duration_stats(self) -> dict[str, float]:
+        if not len(self):
+            return {'count': 0, 'total': 0.0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        d = self.durations()
+        p50, p95 = np.percentile(d, [50, 95])
+        return {
+            'count': len(self),
+            'total': float(d.sum()),
+            'mean': float(d.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'max': float(d.max()),
+        }
+
+    def group_by_gap(self, gap_limit: float, max_duration: float) -> list[tuple[int, int]]:
+        """Row ranges `[first, last)` of neighbours closer than `gap_limit` and spanning at most `max_duration`.
+
+        Gap cuts are found vectorized; only rows inside a gap group are walked to apply
+        the duration cap (a row that would overflow the group starts a new one).
+        """
+        n = len(self)
+        if n == 0:
+            return []
+        hard_cuts = np.flatnonzero(self.gaps()[1:] > gap_limit) + 1
+        bounds = [0, *hard_cuts.tolist(), n]
+        groups: list[tuple[int, int]] = []
+        for lo, hi in zip(bounds, bounds[1:]):
+            # max, not the last end: with overlapping rows an earlier one may end later
+            if self.ends[lo:hi].max() - self.starts[lo] <= max_duration:
+                groups.append((lo, hi))
+                continue
+            first = lo
+            for i in range(lo + 1, hi):
+                if self.ends[i] - self.starts[first] > max_duration:
+                    groups.append((first, i))
+                    first = i
+            groups.append((first, hi))
+        return groups
+
+    def merge_by_gap(self, gap_limit: float, max_duration: float, sep: str = ' ') -> SegmentTable:
+        groups = self.group_by_gap(gap_limit, max_duration)
+        if not groups:
+            return SegmentTable.empty()
+        firsts = np.fromiter((g[0] for g in groups), dtype=np.int64, count=len(groups))
+        lasts = np.fromiter((g[1] - 1 for g in groups), dtype=np.int64, count=len(groups))
+        texts = [sep.join(t.strip() for t in self.texts[a:b] if t.strip()) for a, b in groups]
+        return SegmentTable(self.starts[firsts], self.ends[lasts], texts)
+
+
+Segments = list[Segment] | SegmentTable
+
+
+def make_bilingual_segments(original: Segments, translated: Segments) -> SegmentTable:
     """Build bilingual subtitles: translated (Chinese) first, source (English) second."""
     if len(original) != len(translated):
         raise ValueError('original and translated segments length mismatch')
 
-    out: list[Segment] = []
+    texts: list[str] = []
     for src, tgt in zip(original, translated):
         zh = (tgt.text or '').strip()
         en = (src.text or '').strip()
@@ -25,8 +195,8 @@ def make_bilingual_segments(original: list[Segment], translated: list[Segment])
             text = f"{zh}\\N{{\\fs34\\c&H00C8C8C8&}}{en}{{\\r}}"
         else:
             text = zh or en
-        out.append(Segment(start=src.start, end=src.end, text=text))
-    return out
+        texts.append(text)
+    return SegmentTable.coerce(original).with_texts(texts)
 
 
 def sec_to_srt(t: float) -> str:
@@ -45,14 +215,14 @@ def sec_to_ass(t: float) -> str:
     return f'{h}:{m:02d}:{s:02d}.{cs:02d}'
 
 
-def write_srt(segments: list[Segment], path: Path) -> None:
+def write_srt(segments: Segments, path: Path) -> None:
     lines: list[str] = []
     for i, seg in enumerate(segments, start=1):
         lines.extend([str(i), f'{sec_to_srt(seg.start)} --> {sec_to_srt(seg.end)}', seg.text.strip(), ''])
     path.write_text('\n'.join(lines), encoding='utf-8')
 
 
-def write_ass(segments: list[Segment], path: Path) -> None:
+def write_ass(segments: Segments, path: Path) -> None:
     header = """[Script Info]
 ScriptType: v4.00+
 Collisions: Normal
@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import logging
+import multiprocessing
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
 from faster_whisper import WhisperModel
 
+from app.model_registry import ModelRegistry
 from app.settings import settings
-from app.subtitles import Segment
+from app.subtitles import SegmentTable
+from app.word_timings import WordTimings
 
 logger = logging.getLogger(__name__)
 
@@ -67,10 +73,26 @@ def _download_huggingface_model_to_local(model_ref: str, cache_dir: Path) -> str
     return str(local_dir)
 
 
-def _resolve_whisper_model_ref(source: str | None = None) -> str:
-    """Resolve faster-whisper model ref/path based on configured source."""
+def _model_registry() -> ModelRegistry:
+    return ModelRegistry(settings.whisper_model_cache_dir.expanduser().resolve())
+
+
+def _registry_key(source: str) -> str:
+    if source == 'modelscope':
+        return f'modelscope:{settings.whisper_modelscope_repo.strip()}'
+    return f'{source}:{settings.whisper_model.strip()}'
+
+
+def _resolve_whisper_model_ref(source: str | None = None, refresh: bool | None = None) -> str:
+    """Resolve faster-whisper model ref/path based on configured source.
+
+    Models previously downloaded to `WHISPER_MODEL_CACHE_DIR` are served from the local
+    registry without any network request; pass `refresh=True` (or set
+    `WHISPER_MODEL_REFRESH=true`) to re-check the remote source.
+    """
     source = (source or settings.whisper_model_source).strip().lower()
     model_ref = settings.whisper_model.strip()
+    refresh = settings.whisper_model_refresh if refresh is None else refresh
 
     # local path always wins
     if model_ref and Path(model_ref).expanduser().exists():
@@ -78,35 +100,62 @@ def _resolve_whisper_model_ref(source: str | None = None) -> str:
         logger.info('Using local whisper model path: %s', local_path)
         return local_path
 
-    if source == 'huggingface':
-        if settings.whisper_download_to_local:
-            cache_dir = settings.whisper_model_cache_dir.expanduser().resolve()
-            return _download_huggingface_model_to_local(model_ref, cache_dir)
+    if source == 'huggingface' and not settings.whisper_download_to_local:
         return model_ref
+    if source not in {'huggingface', 'modelscope'}:
+        raise ValueError('WHISPER_MODEL_SOURCE must be one of: huggingface, modelscope')
+
+    registry = _model_registry()
+    key = _registry_key(source)
+    if not refresh:
+        cached = registry.lookup(key)
+        if cached is not None:
+            logger.info('Using registered whisper model. key=%s path=%s', key, cached)
+            return str(cached)
+
+    cache_dir = settings.whisper_model_cache_dir.expanduser().resolve()
+    if source == 'huggingface':
+        local_dir = _download_huggingface_model_to_local(model_ref, cache_dir)
+        registry.register(key, Path(local_dir))
+        return local_dir
+
+    repo_id = settings.whisper_modelscope_repo.strip()
+    if not repo_id:
+        raise ValueError('WHISPER_MODELSCOPE_REPO is required when WHISPER_MODEL_SOURCE=modelscope')
+    try:
+        from modelscope.hub.snapshot_download import snapshot_download
+    except Exception as exc:
+        raise RuntimeError(
+            'ModelScope support requires `modelscope` package. Please install it first.'
+        ) from exc
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    logger.info('Downloading whisper model from ModelScope. repo=%s cache_dir=%s', repo_id, cache_dir)
+    local_dir = snapshot_download(repo_id, cache_dir=str(cache_dir))
+    logger.info('ModelScope model ready: %s', local_dir)
+    registry.register(key, Path(local_dir))
+    return str(local_dir)
 
-    if source == 'modelscope':
-        repo_id = settings.whisper_modelscope_repo.strip()
-        if not repo_id:
-            raise ValueError('WHISPER_MODELSCOPE_REPO is required when WHISPER_MODEL_SOURCE=modelscope')
-        try:
-            from modelscope.hub.snapshot_download import snapshot_download
-        except Exception as exc:
-            raise RuntimeError(
-                'ModelScope support requires `modelscope` package. Please install it first.'
-            ) from exc
 
-        cache_dir = settings.whisper_model_cache_dir.expanduser().resolve()
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        logger.info('Downloading whisper model from ModelScope. repo=%s cache_dir=%s', repo_id, cache_dir)
-        local_dir = snapshot_download(repo_id, cache_dir=str(cache_dir))
-        logger.info('ModelScope model ready: %s', local_dir)
-        return str(local_dir)
+def _registered_model_key(model_path: str) -> str | None:
+    if not Path(model_path).is_dir():
+        return None
+    return _model_registry().find_key_by_path(Path(model_path))
 
-    raise ValueError('WHISPER_MODEL_SOURCE must be one of: huggingface, modelscope')
+
+def _load_whisper_model(model_ref: str, device: str, compute_type: str) -> WhisperModel:
+    return WhisperModel(
+        model_ref,
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=max(0, int(settings.whisper_cpu_threads)),
+        num_workers=max(1, int(settings.whisper_num_workers)),
+    )
 
 
 class FastWhisperTranscriber:
     def __init__(self) -> None:
+        self._batched_pipeline = None
         source = settings.whisper_model_source.strip().lower()
         _apply_download_proxy_env(settings.whisper_download_proxy.strip())
 
@@ -121,23 +170,26 @@ class FastWhisperTranscriber:
             resolved_device,
             resolved_compute_type,
         )
+        registry_key = _registered_model_key(resolved_model)
         try:
-            self.model = WhisperModel(
-                resolved_model,
-                device=resolved_device,
-                compute_type=resolved_compute_type,
-            )
+            self.model = _load_whisper_model(resolved_model, resolved_device, resolved_compute_type)
+            if registry_key:
+                _model_registry().pin_in_background(registry_key)
         except Exception as exc:
             msg = str(exc).lower()
+            # an OOM says nothing about the files, so do not hash a multi-GB model first
             if resolved_device == 'cuda' and ('out of memory' in msg or 'cuda failed' in msg):
                 logger.warning('Whisper CUDA load OOM, fallback to cpu/int8. err=%s', exc)
-                self.model = WhisperModel(
-                    resolved_model,
-                    device='cpu',
-                    compute_type='int8',
-                )
+                self.model = _load_whisper_model(resolved_model, 'cpu', 'int8')
                 logger.info('Loaded whisper model with CPU fallback after CUDA OOM.')
                 return
+            # never pin a checksum from files that just failed to load; unpinned means re-download
+            if registry_key and not _model_registry().verify(registry_key, pin=False):
+                logger.warning('Registered whisper model failed integrity check, refreshing. key=%s err=%s', registry_key, exc)
+                _model_registry().invalidate(registry_key)
+                resolved_model = _resolve_whisper_model_ref(source=source, refresh=True)
+                self.model = _load_whisper_model(resolved_model, resolved_device, resolved_compute_type)
+                return
             if (
                 source == 'huggingface'
                 and settings.whisper_model_fallback_to_modelscope
@@ -145,11 +197,7 @@ class FastWhisperTranscriber:
             ):
                 logger.warning('HuggingFace model load failed, fallback to ModelScope is enabled. err=%s', exc)
                 ms_model = _resolve_whisper_model_ref(source='modelscope')
-                self.model = WhisperModel(
-                    ms_model,
-                    device=resolved_device,
-                    compute_type=resolved_compute_type,
-                )
+                self.model = _load_whisper_model(ms_model, resolved_device, resolved_compute_type)
                 logger.info('Loaded whisper model from ModelScope fallback. path=%s', ms_model)
             else:
                 raise RuntimeError(
@@ -158,9 +206,256 @@ class FastWhisperTranscriber:
                     'or configure WHISPER_DOWNLOAD_PROXY.'
                 ) from exc
 
-    def transcribe(self, audio_path: str) -> list[Segment]:
-        logger.info('Transcription started. audio=%s language=%s', audio_path, settings.whisper_language)
-        segments, _info = self.model.transcribe(audio_path, language=settings.whisper_language, vad_filter=True)
-        result = [Segment(start=s.start, end=s.end, text=s.text) for s in segments]
-        logger.info('Transcription completed. segments=%d', len(result))
-        return result
+    def _decoder(self):
+        """Return the object whose `transcribe` runs decoding (plain or batched)."""
+        if not settings.whisper_batched:
+            return self.model
+        if self._batched_pipeline is None:
+            from faster_whisper import BatchedInferencePipeline
+
+            self._batched_pipeline = BatchedInferencePipeline(model=self.model)
+            logger.info('Batched whisper inference enabled. batch_size=%s', settings.whisper_batch_size)
+        return self._batched_pipeline
+
+    def _transcribe_kwargs(self) -> dict:
+        kwargs: dict = {
+            'language': settings.whisper_language,
+            'beam_size': max(1, int(settings.whisper_beam_size)),
+            'vad_filter': True,
+            'word_timestamps': bool(settings.whisper_word_timestamps),
+        }
+        if settings.whisper_batched:
+            kwargs['batch_size'] = max(1, int(settings.whisper_batch_size))
+        return kwargs
+
+    def transcribe(self, audio_path: str) -> SegmentTable:
+        segments, _words = self.transcribe_with_words(audio_path)
+        return segments
+
+    def transcribe_with_words(self, audio_path: str) -> tuple[SegmentTable, WordTimings | None]:
+        """Transcribe and, when `WHISPER_WORD_TIMESTAMPS=true`, also return per-word timings."""
+        logger.info(
+            'Transcription started. audio=%s language=%s batched=%s word_timestamps=%s',
+            audio_path,
+            settings.whisper_language,
+            settings.whisper_batched,
+            settings.whisper_word_timestamps,
+        )
+        segments, _info = self._decoder().transcribe(audio_path, **self._transcribe_kwargs())
+        raw = list(segments)
+        result = SegmentTable.from_columns([s.start for s in raw], [s.end for s in raw], [s.text for s in raw])
+        words = WordTimings.from_whisper_segments(raw) if settings.whisper_word_timestamps else None
+        logger.info('Transcription completed. segments=%d words=%d', len(result), len(words) if words is not None else 0)
+        return result, words
+
+
+_SAMPLE_RATE = 16000
+_SHARD_MODEL: WhisperModel | None = None
+_SHARED_TRANSCRIBER: FastWhisperTranscriber | ShardedWhisperTranscriber | None = None
+_SHARED_TRANSCRIBER_LOCK = threading.Lock()
+
+
+def _plan_shards(speech_chunks: list[dict], total_samples: int, shard_count: int) -> list[tuple[int, int]]:
+    """Split `[0, total_samples)` into at most `shard_count` ranges cut inside VAD silences.
+
+    Each cut is the midpoint of the silence gap closest to an equal-length target,
+    so no speech chunk is ever split across two shards.
+    """
+    if shard_count <= 1 or len(speech_chunks) < 2:
+        return [(0, total_samples)]
+
+    gap_mids = [
+        (int(prev['end']) + int(nxt['start'])) // 2
+        for prev, nxt in zip(speech_chunks, speech_chunks[1:])
+        if int(nxt['start']) > int(prev['end'])
+    ]
+    cuts: list[int] = []
+    for k in range(1, shard_count):
+        target = total_samples * k // shard_count
+        lower = cuts[-1] if cuts else 0
+        options = [m for m in gap_mids if m > lower]
+        if not options:
+            break
+        cuts.append(min(options, key=lambda m: abs(m - target)))
+
+    bounds = [0, *sorted(set(cuts)), total_samples]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _shard_clip_timestamps(speech_chunks: list[dict], start: int, end: int) -> list[float]:
+    """Flattened `[s0, e0, s1, e1, ...]` seconds of speech inside one shard, relative to its start."""
+    out: list[float] = []
+    for chunk in speech_chunks:
+        c_start, c_end = int(chunk['start']), int(chunk['end'])
+        if c_end <= start or c_start >= end:
+            continue
+        out.append((max(c_start, start) - start) / _SAMPLE_RATE)
+        out.append((min(c_end, end) - start) / _SAMPLE_RATE)
+    return out
+
+
+def _init_shard_worker(model_ref: str, device: str, compute_type: str, cpu_threads: int) -> None:
+    global _SHARD_MODEL
+    _SHARD_MODEL = WhisperModel(model_ref, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=1)
+
+
+def _shard_cpu_threads(shard_count: int) -> int:
+    """Per-worker share of `WHISPER_CPU_THREADS` (or all cores), so N workers never oversubscribe."""
+    total = int(settings.whisper_cpu_threads) or (os.cpu_count() or 1)
+    return max(1, total // max(1, shard_count))
+
+
+def _transcribe_shard(
+    audio: np.ndarray,
+    offset_sec: float,
+    clip_timestamps: list[float],
+    language: str,
+    beam_size: int,
+) -> list[tuple[float, float, str]]:
+    if _SHARD_MODEL is None:
+        raise RuntimeError('Shard worker model is not initialized')
+    # VAD already ran once in the parent; decode only the speech clips of this shard.
+    segments, _info = _SHARD_MODEL.transcribe(
+        audio,
+        language=language,
+        beam_size=beam_size,
+        vad_filter=False,
+        clip_timestamps=clip_timestamps,
+    )
+    return [(s.start + offset_sec, s.end + offset_sec, s.text) for s in segments]
+
+
+def _merge_shard_segments(shards: list[list[tuple[float, float, str]]], tolerance_sec: float = 0.3) -> SegmentTable:
+    """Concatenate shard outputs in time order and drop duplicates around shard boundaries."""
+    ordered = sorted((item for shard in shards for item in shard), key=lambda x: (x[0], x[1]))
+    starts: list[float] = []
+    ends: list[float] = []
+    texts: list[str] = []
+    prev_norm = ''
+    for start, end, text in ordered:
+        norm = ' '.join(text.lower().split())
+        if texts:
+            if norm == prev_norm and start < ends[-1] + tolerance_sec:
+                ends[-1] = max(ends[-1], end)
+                continue
+            start = max(start, ends[-1])
+        if end <= start:
+            continue
+        starts.append(start)
+        ends.append(end)
+        texts.append(text)
+        prev_norm = norm
+    return SegmentTable.from_columns(starts, ends, texts)
+
+
+class ShardedWhisperTranscriber:
+    """CPU transcriber that splits long audio at VAD silences and decodes shards in a process pool.
+
+    The pool of `shard_count` workers, each holding one model with its share of the CPU
+    threads, is started on the first call and kept until `close`, so a long-lived
+    (shared) transcriber pays the N model loads once. Audio shorter than
+    `WHISPER_SHARD_MIN_DURATION_SEC` is not split and runs on a single worker, i.e. with
+    only 1/N of the threads.
+    """
+
+    def __init__(self, shard_count: int | None = None) -> None:
+        self.shard_count = max(1, int(shard_count or settings.whisper_shard_count))
+        self.cpu_threads = _shard_cpu_threads(self.shard_count)
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        _apply_download_proxy_env(settings.whisper_download_proxy.strip())
+        # Resolve (and download) the model once in the parent so shard workers only load from disk.
+        self.model_ref = _resolve_whisper_model_ref()
+        self.device = 'cpu'
+        self.compute_type = _auto_select_compute_type(settings.whisper_compute_type, self.device)
+        logger.info(
+            'Sharded whisper transcriber ready. model=%s shards=%d compute_type=%s cpu_threads_per_shard=%d',
+            self.model_ref,
+            self.shard_count,
+            self.compute_type,
+            self.cpu_threads,
+        )
+
+    def _workers(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.shard_count,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_shard_worker,
+                    initargs=(self.model_ref, self.device, self.compute_type, self.cpu_threads),
+                )
+                logger.info('Shard worker pool started. workers=%d', self.shard_count)
+            return self._pool
+
+    def close(self) -> None:
+        """Stop the worker processes and free their models."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+            logger.info('Shard worker pool stopped.')
+
+    def transcribe(self, audio_path: str) -> SegmentTable:
+        from faster_whisper.audio import decode_audio
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        audio = decode_audio(audio_path, sampling_rate=_SAMPLE_RATE)
+        duration = len(audio) / _SAMPLE_RATE
+        speech_chunks = get_speech_timestamps(audio, VadOptions())
+        shard_count = self.shard_count if duration >= float(settings.whisper_shard_min_duration_sec) else 1
+        ranges = _plan_shards(speech_chunks, len(audio), shard_count)
+        language = settings.whisper_language
+        beam_size = max(1, int(settings.whisper_beam_size))
+        logger.info(
+            'Sharded transcription started. audio=%s duration=%.1fs speech_chunks=%d shards=%d cpu_threads=%d',
+            audio_path,
+            duration,
+            len(speech_chunks),
+            len(ranges),
+            self.cpu_threads,
+        )
+
+        jobs = []
+        for start, end in ranges:
+            clips = _shard_clip_timestamps(speech_chunks, start, end)
+            if clips:
+                jobs.append((audio[start:end], start / _SAMPLE_RATE, clips))
+        if not jobs:
+            logger.info('Sharded transcription found no speech. audio=%s', audio_path)
+            return SegmentTable.empty()
+
+        pool = self._workers()
+        futures = [pool.submit(_transcribe_shard, *job, language, beam_size) for job in jobs]
+        results = [f.result() for f in futures]
+
+        merged = _merge_shard_segments(results)
+        logger.info('Sharded transcription completed. segments=%d', len(merged))
+        return merged
+
+    def transcribe_with_words(self, audio_path: str) -> tuple[SegmentTable, WordTimings | None]:
+        if settings.whisper_word_timestamps:
+            logger.warning('WHISPER_WORD_TIMESTAMPS is not supported in sharded mode; word timings skipped.')
+        return self.transcribe(audio_path), None
+
+
+def create_transcriber() -> FastWhisperTranscriber | ShardedWhisperTranscriber:
+    if int(settings.whisper_shard_count) > 1:
+        device = _auto_select_device(settings.whisper_device)
+        if device == 'cpu':
+            return ShardedWhisperTranscriber()
+        logger.info('WHISPER_SHARD_COUNT ignored on device=%s, using single-model transcriber', device)
+    return FastWhisperTranscriber()
+
+
+def shared_transcriber() -> FastWhisperTranscriber | ShardedWhisperTranscriber:
+    """Process-wide transcriber, loaded once and kept warm for long-running hosts.
+
+    faster-whisper models accept concurrent `transcribe` calls from several threads
+    (parallelism is bounded by `WHISPER_NUM_WORKERS`).
+    """
+    global _SHARED_TRANSCRIBER
+    with _SHARED_TRANSCRIBER_LOCK:
+        if _SHARED_TRANSCRIBER is None:
+            _SHARED_TRANSCRIBER = create_transcriber()
+        return _SHARED_TRANSCRIBER
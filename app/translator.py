@@ -4,8 +4,9 @@ import logging
 
 from openai import OpenAI
 
+from app import progress
 from app.settings import settings
-from app.subtitles import Segment
+from app.subtitles import Segments, SegmentTable
 
 logger = logging.getLogger(__name__)
 
@@ -64,23 +65,26 @@ class SubtitleTranslator:
         content = rsp.choices[0].message.content or ''
         return self._parse_batch_output(content, texts)
 
-    def translate(self, segments: list[Segment]) -> list[Segment]:
+    def translate_texts(self, texts: list[str]) -> list[str]:
         if not self.enabled:
-            return segments
+            return list(texts)
 
-        out: list[Segment] = []
+        out: list[str] = []
         batch_size = max(1, int(settings.translation_batch_size))
-        logger.info('Translation started. segments=%d batch_size=%d', len(segments), batch_size)
-
-        for start in range(0, len(segments), batch_size):
-            batch = segments[start : start + batch_size]
-            inputs = [s.text.strip() for s in batch]
-            translated_texts = self._translate_batch(inputs)
-
-            for seg, translated in zip(batch, translated_texts):
-                out.append(Segment(start=seg.start, end=seg.end, text=translated.strip()))
+        logger.info('Translation started. segments=%d batch_size=%d', len(texts), batch_size)
 
-            logger.info('Translation progress: %d/%d', min(start + batch_size, len(segments)), len(segments))
+        for start in range(0, len(texts), batch_size):
+            inputs = [t.strip() for t in texts[start : start + batch_size]]
+            out.extend(t.strip() for t in self._translate_batch(inputs))
+            logger.info('Translation progress: %d/%d', min(start + batch_size, len(texts)), len(texts))
+            progress.update(min(start + batch_size, len(texts)), len(texts))
 
         logger.info('Translation completed. segments=%d', len(out))
         return out
+
+    def translate(self, segments: Segments) -> SegmentTable:
+        """Translate texts; the result shares the source timing arrays."""
+        table = SegmentTable.coerce(segments)
+        if not self.enabled:
+            return table
+        return table.with_texts(self.translate_texts(table.texts))
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import logging
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def words_path_for(srt_path: Path) -> Path:
+    """Word timings live next to the SRT: `<stem>.srt` -> `<stem>.words.npz`."""
+    return srt_path.with_suffix('.words.npz')
+
+
+@dataclass(frozen=True)
+class WordTimings:
+    """Per-word timings stored column-wise.
+
+    Every field is one flat array; word `i` is `text[offsets[i]:offsets[i + 1]]`, so a
+    multi-hour transcript costs a few arrays instead of millions of small objects.
+    """
+
+    starts: np.ndarray
+    ends: np.ndarray
+    probabilities: np.ndarray
+    segment_index: np.ndarray
+    offsets: np.ndarray
+    text: str
+    segment_count: int
+
+    @classmethod
+    def from_whisper_segments(cls, segments: Iterable[object]) -> WordTimings:
+        """Build from faster-whisper segments transcribed with `word_timestamps=True`."""
+        starts = array('f')
+        ends = array('f')
+        probs = array('f')
+        seg_idx = array('i')
+        offsets = array('i', [0])
+        parts: list[str] = []
+        cursor = 0
+        count = 0
+        for i, seg in enumerate(segments):
+            count = i + 1
+            for w in getattr(seg, 'words', None) or []:
+                starts.append(float(w.start))
+                ends.append(float(w.end))
+                probs.append(float(w.probability))
+                seg_idx.append(i)
+                parts.append(w.word)
+                cursor += len(w.word)
+                offsets.append(cursor)
+        return cls(
+            starts=np.frombuffer(starts, dtype=np.float32),
+            ends=np.frombuffer(ends, dtype=np.float32),
+            probabilities=np.frombuffer(probs, dtype=np.float32),
+            segment_index=np.frombuffer(seg_idx, dtype=np.int32),
+            offsets=np.frombuffer(offsets, dtype=np.int32),
+            text=''.join(parts),
+            segment_count=count,
+        )
+
+    def __len__(self) -> int:
+        return int(self.starts.shape[0])
+
+    def word(self, i: int) -> str:
+        return self.text[int(self.offsets[i]) : int(self.offsets[i + 1])]
+
+    def text_range(self, first: int, last: int) -> str:
+        """Joined text of words `[first, last)` (whisper words carry their own leading spaces)."""
+        return self.text[int(self.offsets[first]) : int(self.offsets[last])].strip()
+
+    def pauses(self) -> np.ndarray:
+        """Silence before each word in seconds; the first word has 0."""
+        out = np.zeros(len(self), dtype=np.float32)
+        if len(self) > 1:
+            out[1:] = np.maximum(0.0, self.starts[1:] - self.ends[:-1])
+        return out
+
+    def save(self, path: Path) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('wb') as f:
+            np.savez_compressed(
+                f,
+                starts=self.starts,
+                ends=self.ends,
+                probabilities=self.probabilities,
+                segment_index=self.segment_index,
+                offsets=self.offsets,
+                text=np.array(self.text),
+                segment_count=np.array(self.segment_count, dtype=np.int64),
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> WordTimings:
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                starts=data['starts'],
+                ends=data['ends'],
+                probabilities=data['probabilities'],
+                segment_index=data['segment_index'],
+                offsets=data['offsets'],
+                text=str(data['text']),
+                segment_count=int(data['segment_count']),
+            )
+
+    @classmethod
+    def load_for_srt(cls, srt_path: Path, expected_segments: int) -> WordTimings | None:
+        """Load the sidecar of `srt_path` if present and still matching the SRT."""
+        path = words_path_for(srt_path)
+        if not path.exists():
+            return None
+        try:
+            timings = cls.load(path)
+        except (OSError, ValueError, KeyError):
+            logger.warning('Word timings unreadable, ignoring. path=%s', path, exc_info=True)
+            return None
+        if timings.segment_count != expected_segments:
+            logger.warning(
+                'Word timings do not match SRT, ignoring. path=%s words_segments=%d srt_segments=%d',
+                path,
+                timings.segment_count,
+                expected_segments,
+            )
+            return None
+        return timings
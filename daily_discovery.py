@@ -3,8 +3,9 @@ from __future__ import annotations
 
 import argparse
 import logging
+import time
 
-from app.discovery.repository import init_db, upsert_candidates
+from app.discovery.repository import init_db, rescore_candidates
 from app.discovery.service import run_discovery_once
 from app.logging_utils import setup_logging
 from app.settings import settings
@@ -12,9 +13,21 @@ from app.settings import settings
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description='Daily YouTube discovery: fetch + score + store')
+    p.add_argument(
+        'mode',
+        nargs='?',
+        default='run',
+        choices=['run', 'rescore'],
+        help='run: discover via the API (default); rescore: recompute stored scores without API calls',
+    )
     p.add_argument('--top-n', type=int, default=0, help='Override DISCOVERY_TOP_N')
     p.add_argument('--days-back', type=int, default=0, help='Override DISCOVERY_DAYS_BACK')
     p.add_argument('--dry-run', action='store_true', help='Do not write DB, only print results')
+    p.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only search past each keyword cursor and refresh stats of known candidates (for hourly runs)',
+    )
     return p.parse_args()
 
 
@@ -23,16 +36,33 @@ def main() -> None:
     setup_logging(settings.log_level, settings.log_file)
     logger = logging.getLogger(__name__)
 
-    raw, selected = run_discovery_once(top_n=args.top_n, days_back=args.days_back)
+    if args.mode == 'rescore':
+        db_path = settings.discovery_db_path.resolve()
+        init_db(db_path)
+        t0 = time.perf_counter()
+        scanned, updated = rescore_candidates(db_path, chunk_size=settings.discovery_rescore_chunk_size)
+        logger.info(
+            'Discovery rescore done. scanned=%d updated=%d elapsed=%.2fs',
+            scanned,
+            updated,
+            time.perf_counter() - t0,
+        )
+        print(f'完成: rescored={updated}/{scanned} db={db_path}')
+        return
+
+    db_path = settings.discovery_db_path.resolve()
+    _raw, selected = run_discovery_once(
+        top_n=args.top_n,
+        days_back=args.days_back,
+        db_path=db_path,
+        incremental=args.incremental,
+        dry_run=args.dry_run,
+    )
     if args.dry_run:
         for idx, x in enumerate(selected, start=1):
             print(f'{idx:02d}. score={x.score:.3f} views={x.view_count} comments={x.comment_count} lang={x.language_hint} url={x.url}')
         return
-
-    db_path = settings.discovery_db_path.resolve()
-    init_db(db_path)
-    count = upsert_candidates(db_path, selected)
-    print(f'完成: discovered={count} db={db_path}')
+    print(f'完成: discovered={len(selected)} db={db_path}')
 
 
 if __name__ == '__main__':
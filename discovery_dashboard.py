@@ -3,20 +3,39 @@ from __future__ import annotations
 
 import argparse
 import html
+import json
+import logging
 import os
-import sqlite3
 import subprocess
 import sys
 import threading
-import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
 from pathlib import Path
+from typing import Callable
 from urllib.parse import parse_qs, urlencode, urlparse
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-from app.discovery.repository import claim_next_job, complete_job, enqueue_processing_job, init_db, list_jobs, upsert_candidates
+from app import progress
+from app.discovery.api import handle_api
+from app.discovery.db import SharedConnectionPool, close_thread_connections, get_connection, leased_connections
+from app.discovery.events import EventBus
+from app.discovery.refresh import RefreshStatus, SingleFlightRefresh
+from app.discovery.repository import (
+    base_language,
+    boost_job,
+    enqueue_processing_job,
+    init_db,
+    list_jobs,
+    rescore_candidates,
+)
 from app.discovery.service import run_discovery_once
+from app.discovery.worker_pool import JobResult, JobWorkerPool
+from app.logging_utils import setup_logging
 from app.settings import settings
 
+logger = logging.getLogger(__name__)
+
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description='Local web dashboard for discovery results')
@@ -26,21 +45,20 @@ def parse_args() -> argparse.Namespace:
     return p.parse_args()
 
 
-def _query_rows(db_path: Path, min_score: float, language_prefix: str, limit: int) -> list[tuple]:
-    with sqlite3.connect(db_path) as conn:
-        sql = """
-        SELECT video_id, title, channel_title, published_at, language_hint, view_count, comment_count, score, url
-        FROM discovered_videos
-        WHERE score >= ?
-        """
-        params: list[object] = [min_score]
-        if language_prefix:
-            sql += ' AND lower(language_hint) LIKE ?'
-            params.append(f'{language_prefix.lower()}%')
-        sql += ' ORDER BY score DESC, discovered_at DESC LIMIT ?'
-        params.append(max(1, min(limit, 500)))
-        cur = conn.execute(sql, params)
-        return list(cur.fetchall())
+def _query_rows(db_path: Path, min_score: float, language: str, limit: int) -> list[tuple]:
+    sql = """
+    SELECT video_id, title, channel_title, published_at, language_hint, view_count, comment_count, score, url
+    FROM discovered_videos
+    WHERE score >= ?
+    """
+    params: list[object] = [min_score]
+    if language.strip():
+        sql += ' AND lang = ?'
+        params.append(base_language(language))
+    sql += ' ORDER BY score DESC, discovered_at DESC LIMIT ?'
+    params.append(max(1, min(limit, 500)))
+    cur = get_connection(db_path).execute(sql, params)
+    return list(cur.fetchall())
 
 
 def _parse_outputs(log_path: Path) -> tuple[str, str]:
@@ -60,67 +78,197 @@ def _parse_outputs(log_path: Path) -> tuple[str, str]:
     return bilingual, dubbed
 
 
-def _worker_loop(db_path: Path, repo_root: Path) -> None:
-    jobs_dir = (settings.work_dir.resolve() / 'discovery' / 'job_logs').resolve()
-    jobs_dir.mkdir(parents=True, exist_ok=True)
-    while True:
-        job = claim_next_job(db_path)
-        if not job:
-            time.sleep(2.5)
-            continue
+def _run_job_subprocess(job: dict, jobs_dir: Path, repo_root: Path, bus: EventBus | None = None) -> JobResult:
+    job_id = int(job['id'])
+    video_id = str(job['video_id'])
+    url = str(job['url'])
+    log_path = jobs_dir / f'job_{job_id}_{video_id}.log'
+    cmd = [sys.executable, 'main.py', url]
+    # the child prints `@@progress` lines; they are forwarded to the bus and kept in the log
+    env = {**os.environ, 'PROGRESS_STDOUT': 'true', 'PYTHONUNBUFFERED': '1'}
+
+    try:
+        with log_path.open('w', encoding='utf-8') as f:
+            proc = subprocess.Popen(
+                cmd,
+                cwd=repo_root,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+            )
+            assert proc.stdout is not None
+            for line in proc.stdout:
+                f.write(line)
+                event = progress.parse_progress_line(line) if bus is not None else None
+                if event is not None:
+                    bus.publish({'type': 'progress', 'job_id': job_id, **event.to_dict()})
+            proc.wait()
+    except Exception as exc:
+        return JobResult(success=False, error=str(exc), log_path=str(log_path))
+
+    bilingual, dubbed = _parse_outputs(log_path)
+    return JobResult(
+        success=proc.returncode == 0,
+        error='' if proc.returncode == 0 else f'pipeline rc={proc.returncode}',
+        bilingual_video=bilingual,
+        dubbed_video=dubbed,
+        log_path=str(log_path),
+    )
+
+
+class _ThreadLogFilter(logging.Filter):
+    """Pass only records emitted by one thread, so concurrent in-process jobs get separate logs."""
+
+    def __init__(self, thread_id: int) -> None:
+        super().__init__()
+        self.thread_id = thread_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.thread == self.thread_id
+
+
+def _run_job_inprocess(job: dict, jobs_dir: Path, bus: EventBus | None = None) -> JobResult:
+    # Heavy imports (yt_dlp/torch/faster_whisper/openai) happen on the first job only.
+    from app.pipeline import Pipeline
+    from app.transcriber import shared_transcriber
+
+    job_id = int(job['id'])
+    video_id = str(job['video_id'])
+    log_path = jobs_dir / f'job_{job_id}_{video_id}.log'
+    handler = logging.FileHandler(log_path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s | %(levelname)s | %(name)s | %(message)s', datefmt='%Y-%m-%d %H:%M:%S'))
+    handler.addFilter(_ThreadLogFilter(threading.get_ident()))
+    root = logging.getLogger()
+    root.addHandler(handler)
+
+    def forward(event: progress.ProgressEvent) -> None:
+        if bus is not None:
+            bus.publish({'type': 'progress', 'job_id': job_id, **event.to_dict()})
+
+    try:
+        transcriber = shared_transcriber() if settings.dashboard_keep_models_warm else None
+        with progress.thread_sink(forward):
+            outputs = Pipeline(transcriber=transcriber).run(str(job['url']))
+        return JobResult(
+            success=True,
+            bilingual_video=str(outputs.bilingual_video),
+            dubbed_video=str(outputs.dubbed_video or ''),
+            log_path=str(log_path),
+        )
+    except Exception as exc:
+        logger.exception('In-process pipeline failed. job=%d url=%s', job_id, job['url'])
+        return JobResult(success=False, error=str(exc), log_path=str(log_path))
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+
 
+def _with_job_events(run_job: Callable[[dict], JobResult], bus: EventBus) -> Callable[[dict], JobResult]:
+    def run(job: dict) -> JobResult:
         job_id = int(job['id'])
-        video_id = str(job['video_id'])
-        url = str(job['url'])
-        log_path = jobs_dir / f'job_{job_id}_{video_id}.log'
-        cmd = [sys.executable, 'main.py', url]
+        bus.publish({'type': 'job', 'job_id': job_id, 'video_id': str(job['video_id']), 'status': 'running'})
+        result = JobResult(success=False, error='job runner crashed')
+        try:
+            result = run_job(job)
+            return result
+        finally:
+            status = 'success' if result.success else 'failed'
+            bus.publish({'type': 'job', 'job_id': job_id, 'status': status, 'error': result.error})
+
+    return run
+
 
+def _start_worker_pool(db_path: Path, repo_root: Path, bus: EventBus) -> JobWorkerPool:
+    jobs_dir = (settings.work_dir.resolve() / 'discovery' / 'job_logs').resolve()
+    jobs_dir.mkdir(parents=True, exist_ok=True)
+    executor = settings.dashboard_job_executor.strip().lower()
+    if executor == 'inprocess':
+        run_job = partial(_run_job_inprocess, jobs_dir=jobs_dir, bus=bus)
+    elif executor == 'subprocess':
+        run_job = partial(_run_job_subprocess, jobs_dir=jobs_dir, repo_root=repo_root, bus=bus)
+    else:
+        raise ValueError('DASHBOARD_JOB_EXECUTOR must be one of: subprocess, inprocess')
+    pool = JobWorkerPool(
+        db_path,
+        _with_job_events(run_job, bus),
+        worker_spec=settings.dashboard_workers,
+        heartbeat_sec=settings.dashboard_worker_heartbeat_sec,
+        stale_after_sec=settings.dashboard_stale_job_sec,
+        idle_poll_sec=settings.dashboard_worker_idle_poll_sec,
+        max_attempts=settings.dashboard_job_max_attempts,
+        fair_share_window=settings.dashboard_fair_share_window,
+        deadline_horizon_sec=settings.dashboard_deadline_horizon_sec,
+    )
+    pool.start()
+    return pool
+
+
+def _start_rescore_loop(db_path: Path) -> threading.Event | None:
+    """Keep stored scores current by rescoring every `DISCOVERY_RESCORE_INTERVAL_SEC`."""
+    interval = float(settings.discovery_rescore_interval_sec)
+    if interval <= 0:
+        return None
+    stop = threading.Event()
+
+    def loop() -> None:
         try:
-            with log_path.open('w', encoding='utf-8') as f:
-                proc = subprocess.run(
-                    cmd,
-                    cwd=repo_root,
-                    stdout=f,
-                    stderr=subprocess.STDOUT,
-                    check=False,
-                    env=os.environ.copy(),
-                )
-            bilingual, dubbed = _parse_outputs(log_path)
-            if proc.returncode == 0:
-                complete_job(
-                    db_path,
-                    job_id=job_id,
-                    success=True,
-                    bilingual_video=bilingual,
-                    dubbed_video=dubbed,
-                    log_path=str(log_path),
-                )
-            else:
-                complete_job(
-                    db_path,
-                    job_id=job_id,
-                    success=False,
-                    error=f'pipeline rc={proc.returncode}',
-                    bilingual_video=bilingual,
-                    dubbed_video=dubbed,
-                    log_path=str(log_path),
-                )
-        except Exception as exc:
-            complete_job(
-                db_path,
-                job_id=job_id,
-                success=False,
-                error=str(exc),
-                log_path=str(log_path),
-            )
+            while not stop.is_set():
+                try:
+                    scanned, updated = rescore_candidates(db_path, chunk_size=settings.discovery_rescore_chunk_size)
+                    logger.info('Discovery rescore done. scanned=%d updated=%d', scanned, updated)
+                except Exception:
+                    logger.exception('Discovery rescore failed')
+                stop.wait(interval)
+        finally:
+            close_thread_connections()
 
+    threading.Thread(target=loop, name='discovery-rescore', daemon=True).start()
+    return stop
 
-def _html_page(rows: list[tuple], jobs: list[tuple], min_score: float, language: str, limit: int, msg: str) -> str:
+
+def _refresh_discovery(db_path: Path) -> int:
+    try:
+        _raw, selected = run_discovery_once(db_path=db_path)
+        return len(selected)
+    finally:
+        close_thread_connections()
+
+
+def _refresh_html(status: RefreshStatus) -> str:
+    info = status.as_dict()
+    if status.running:
+        text, color = f'抓取进行中，已用 {info["elapsed_sec"]:.0f}s（页面自动刷新）', '#b70'
+    elif status.state == 'success':
+        text, color = f'上次刷新完成，新增/更新 {status.selected} 条，用时 {info["elapsed_sec"]:.0f}s', '#0b6'
+    elif status.state == 'failed':
+        text, color = f'上次刷新失败: {status.error}', '#c00'
+    else:
+        return ''
+    return f'<p style="color:{color};">{html.escape(text)}</p>'
+
+
+def _html_page(
+    rows: list[tuple],
+    jobs: list[tuple],
+    min_score: float,
+    language: str,
+    limit: int,
+    msg: str,
+    refresh: RefreshStatus,
+    job_classes: list[str],
+) -> str:
     trs: list[str] = []
     query_filter = urlencode({'min_score': min_score, 'lang': language, 'limit': limit})
     for r in rows:
         vid, title, channel, published, lang, views, comments, score, url = r
-        enqueue_link = f'/?action=enqueue&video_id={html.escape(str(vid))}&{query_filter}'
+        enqueue_links = ' '.join(
+            f'<a href="/?action=enqueue&video_id={html.escape(str(vid))}&resource_class={html.escape(c)}&{query_filter}">'
+            f'{"触发处理" if len(job_classes) == 1 else html.escape(f"触发处理({c})")}</a>'
+            for c in job_classes
+        )
         trs.append(
             '<tr>'
             f'<td>{html.escape(str(vid))}</td>'
@@ -131,19 +279,22 @@ def _html_page(rows: list[tuple], jobs: list[tuple], min_score: float, language:
             f'<td>{int(views):,}</td>'
             f'<td>{int(comments):,}</td>'
             f'<td>{float(score):.3f}</td>'
-            f'<td><a href="{enqueue_link}">触发处理</a></td>'
+            f'<td>{enqueue_links}</td>'
             '</tr>'
         )
     rows_html = '\n'.join(trs) if trs else '<tr><td colspan="9">No data</td></tr>'
 
     jtrs: list[str] = []
     for j in jobs:
-        jid, vid, status, created, started, finished, error, bilingual, dubbed = j
+        jid, vid, status, created, started, finished, error, bilingual, dubbed, priority = j
+        boost_link = f'/?action=boost&job_id={int(jid)}&{query_filter}'
+        boost_html = f' <a href="{boost_link}">提升</a>' if status == 'pending' else ''
         jtrs.append(
             '<tr>'
             f'<td>{jid}</td>'
             f'<td>{html.escape(str(vid))}</td>'
             f'<td>{html.escape(str(status))}</td>'
+            f'<td>{float(priority):.2f}{boost_html}</td>'
             f'<td>{html.escape(str(created))}</td>'
             f'<td>{html.escape(str(started))}</td>'
             f'<td>{html.escape(str(finished))}</td>'
@@ -152,16 +303,19 @@ def _html_page(rows: list[tuple], jobs: list[tuple], min_score: float, language:
             f'<td>{html.escape(str(dubbed or ""))}</td>'
             '</tr>'
         )
-    jobs_html = '\n'.join(jtrs) if jtrs else '<tr><td colspan="9">No jobs</td></tr>'
+    jobs_html = '\n'.join(jtrs) if jtrs else '<tr><td colspan="10">No jobs</td></tr>'
     msg_html = f'<p style="color:#0b6;">{html.escape(msg)}</p>' if msg else ''
 
     refresh_link = f'/?action=refresh&{query_filter}'
+    # poll the page while a background refresh runs
+    auto_reload = f'<meta http-equiv="refresh" content="3; url=/?{query_filter}" />' if refresh.running else ''
 
     return f"""<!doctype html>
 <html>
 <head>
   <meta charset="utf-8" />
   <meta name="viewport" content="width=device-width, initial-scale=1" />
+  {auto_reload}
   <title>Discovery Dashboard</title>
   <style>
     body {{ font-family: -apple-system, Segoe UI, Roboto, sans-serif; margin: 18px; }}
@@ -180,6 +334,7 @@ def _html_page(rows: list[tuple], jobs: list[tuple], min_score: float, language:
 <body>
   <h1>YouTube AI Discovery</h1>
   {msg_html}
+  {_refresh_html(refresh)}
   <div class="actions">
     <a href="{refresh_link}">手动刷新抓取</a>
   </div>
@@ -203,12 +358,35 @@ def _html_page(rows: list[tuple], jobs: list[tuple], min_score: float, language:
   <table>
     <thead>
       <tr>
-        <th>ID</th><th>Video ID</th><th>Status</th><th>Created</th><th>Started</th><th>Finished</th>
+        <th>ID</th><th>Video ID</th><th>Status</th><th>Priority</th><th>Created</th><th>Started</th><th>Finished</th>
         <th>Error</th><th>Bilingual Output</th><th>Dubbed Output</th>
       </tr>
     </thead>
     <tbody>{jobs_html}</tbody>
   </table>
+
+  <h2>Live Progress</h2>
+  <ul id="live"><li>No events yet</li></ul>
+  <script>
+    const live = {{}};
+    const render = () => {{
+      document.getElementById('live').innerHTML = Object.keys(live).sort((a, b) => b - a)
+        .map((id) => `<li>job ${{id}}: ${{live[id]}}</li>`).join('');
+    }};
+    const es = new EventSource('/api/events');
+    es.addEventListener('progress', (e) => {{
+      const ev = JSON.parse(e.data);
+      const pct = ev.percent == null ? '' : ` ${{ev.percent}}%`;
+      const eta = ev.eta_sec == null ? '' : ` ETA ${{Math.round(ev.eta_sec)}}s`;
+      live[ev.job_id] = `stage ${{ev.index}}/${{ev.total}} ${{ev.stage}} ${{ev.event}}${{pct}}${{eta}}`;
+      render();
+    }});
+    es.addEventListener('job', (e) => {{
+      const ev = JSON.parse(e.data);
+      live[ev.job_id] = ev.status + (ev.error ? `: ${{ev.error}}` : '');
+      render();
+    }});
+  </script>
 </body>
 </html>
 """
@@ -217,13 +395,75 @@ def _html_page(rows: list[tuple], jobs: list[tuple], min_score: float, language:
 def run_server(host: str, port: int, db_path: Path) -> None:
     repo_root = Path(__file__).resolve().parent
     init_db(db_path)
+    if settings.dashboard_job_executor.strip().lower() == 'inprocess':
+        # in-process jobs log through the root logger; subprocess jobs configure their own
+        setup_logging(settings.log_level, settings.log_file)
+
+    bus = EventBus(settings.dashboard_event_buffer)
+    pool = _start_worker_pool(db_path, repo_root, bus)
+    # the default class plus one enqueue link per named worker class, so every class gets work
+    job_classes = list(dict.fromkeys([settings.dashboard_job_resource_class.strip() or 'default', *pool.resource_classes]))
+    pool.check_job_classes(job_classes)
+    _start_rescore_loop(db_path)
+    refresher = SingleFlightRefresh(partial(_refresh_discovery, db_path))
 
-    worker = threading.Thread(target=_worker_loop, args=(db_path, repo_root), daemon=True)
-    worker.start()
+    db_pool = SharedConnectionPool(db_path, max_idle=settings.dashboard_db_pool_size)
 
     class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: bytes, headers: dict[str, str]) -> None:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def _stream_events(self, query: str) -> None:
+            """Server-Sent Events from the bus, optionally for one `job_id`."""
+            q = parse_qs(query)
+            job_filter = (q.get('job_id') or [''])[0].strip()
+            try:
+                # resume after a reconnect; a new client gets the buffered history
+                last_id = int(self.headers.get('Last-Event-ID') or (q.get('since') or ['0'])[0] or 0)
+            except ValueError:
+                last_id = 0
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            try:
+                while True:
+                    events = bus.since(last_id, timeout=15.0)
+                    chunks: list[str] = []
+                    for event_id, payload in events:
+                        last_id = event_id
+                        if job_filter and str(payload.get('job_id')) != job_filter:
+                            continue
+                        data = json.dumps(payload, ensure_ascii=False)
+                        chunks.append(f'id: {event_id}\nevent: {payload.get("type", "message")}\ndata: {data}\n\n')
+                    # a comment line keeps proxies from closing an idle stream
+                    self.wfile.write(''.join(chunks or [': ping\n\n']).encode('utf-8'))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
         def do_GET(self) -> None:  # noqa: N802
             parsed = urlparse(self.path)
+            if parsed.path == '/api/events':
+                self._stream_events(parsed.query)
+                return
+            if parsed.path.startswith('/api/'):
+                headers = {k.lower(): v for k, v in self.headers.items()}
+                resp = handle_api(db_path, parsed.path, parsed.query, headers)
+                self._send(resp.status, resp.body, resp.headers)
+                return
+            if parsed.path == '/refresh/status':
+                body = json.dumps(refresher.status().as_dict()).encode('utf-8')
+                self._send(200, body, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'})
+                return
             if parsed.path not in {'/', ''}:
                 self.send_response(404)
                 self.end_headers()
@@ -237,33 +477,71 @@ def run_server(host: str, port: int, db_path: Path) -> None:
 
             action = (q.get('action') or [''])[0].strip().lower()
             if action == 'refresh':
-                try:
-                    _raw, selected = run_discovery_once()
-                    upsert_candidates(db_path, selected)
-                    msg = f'刷新完成，新增/更新 {len(selected)} 条'
-                except Exception as exc:
-                    msg = f'刷新失败: {exc}'
+                # runs in the background; a click while one is in flight joins it
+                refresher.start()
+                self.send_response(303)
+                self.send_header('Location', '/?' + urlencode({'min_score': min_score, 'lang': language, 'limit': limit}))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
             elif action == 'enqueue':
                 video_id = (q.get('video_id') or [''])[0].strip()
-                ok, m = enqueue_processing_job(db_path, video_id)
+                resource_class = (q.get('resource_class') or [''])[0].strip() or settings.dashboard_job_resource_class
+                boost = float((q.get('boost') or ['0'])[0] or 0)
+                deadline_hours = float((q.get('deadline_hours') or ['0'])[0] or 0)
+                deadline_at = (
+                    (datetime.now(timezone.utc) + timedelta(hours=deadline_hours)).isoformat() if deadline_hours > 0 else ''
+                )
+                if pool.serves(resource_class):
+                    ok, m = enqueue_processing_job(
+                        db_path,
+                        video_id,
+                        resource_class=resource_class,
+                        boost=boost,
+                        deadline_at=deadline_at,
+                    )
+                else:
+                    ok, m = False, f'no worker claims resource class {resource_class}'
+                if ok:
+                    pool.notify()
                 msg = m if ok else f'入队失败: {m}'
-
-            rows = _query_rows(db_path, min_score=min_score, language_prefix=language, limit=limit)
+            elif action == 'boost':
+                job_id = int((q.get('job_id') or ['0'])[0] or 0)
+                if boost_job(db_path, job_id, settings.dashboard_boost_step):
+                    msg = f'任务 {job_id} 优先级 +{settings.dashboard_boost_step:g}'
+                else:
+                    msg = f'提升失败: 任务 {job_id} 不在排队中'
+
+            rows = _query_rows(db_path, min_score=min_score, language=language, limit=limit)
             jobs = list_jobs(db_path, limit=40)
-            page = _html_page(rows, jobs, min_score=min_score, language=language, limit=limit, msg=msg).encode('utf-8')
+            page = _html_page(
+                rows,
+                jobs,
+                min_score=min_score,
+                language=language,
+                limit=limit,
+                msg=msg,
+                refresh=refresher.status(),
+                job_classes=job_classes,
+            ).encode('utf-8')
             self.send_response(200)
             self.send_header('Content-Type', 'text/html; charset=utf-8')
             self.send_header('Content-Length', str(len(page)))
             self.end_headers()
             self.wfile.write(page)
 
+        def handle_one_request(self) -> None:
+            # one thread per client connection: lease from the shared pool instead of opening a fresh one
+            with leased_connections(db_pool):
+                super().handle_one_request()
+
         def log_message(self, fmt: str, *args: object) -> None:
             return
 
     server = ThreadingHTTPServer((host, port), Handler)
     print(f'Dashboard running: http://{host}:{port}')
     print(f'Database: {db_path}')
-    print('Worker: started (polling pending jobs)')
+    print(f'Workers: {pool.describe()} executor={settings.dashboard_job_executor}')
     server.serve_forever()
 
 
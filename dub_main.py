@@ -6,6 +6,7 @@ import logging
 from pathlib import Path
 
 from app.dubbing_pipeline import DubbingPipeline
+from app import progress
 from app.logging_utils import setup_logging
 from app.settings import settings
 
@@ -17,6 +18,7 @@ def parse_args() -> argparse.Namespace:
     p.add_argument('--srt', type=Path, required=True, help='Input SRT path')
     p.add_argument('--ass', type=Path, required=True, help='Input ASS path')
     p.add_argument('--stem', type=str, default='', help='Output stem; default uses video stem')
+    p.add_argument('--resume', action='store_true', help='Skip stages the run journal shows as completed')
     return p.parse_args()
 
 
@@ -24,6 +26,8 @@ def main() -> None:
     args = parse_args()
     setup_logging(settings.log_level, settings.log_file)
     logger = logging.getLogger(__name__)
+    if settings.progress_stdout:
+        progress.add_sink(progress.stdout_sink)
 
     output = DubbingPipeline().run(
         video_path=args.video.resolve(),
@@ -31,6 +35,7 @@ def main() -> None:
         srt_path=args.srt.resolve(),
         ass_path=args.ass.resolve(),
         stem=args.stem.strip() or None,
+        resume=args.resume,
     )
     logger.info('Dubbing pipeline completed. output=%s', output)
     print(f'完成: {output}')
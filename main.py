@@ -3,22 +3,104 @@ from __future__ import annotations
 
 import argparse
 import logging
+import sys
+from pathlib import Path
 
+from app import progress
 from app.logging_utils import setup_logging
 from app.pipeline import Pipeline
 from app.settings import settings
 
 
+def _read_url_file(path: Path) -> list[str]:
+    """One URL per line; blank lines and `#` comments are skipped."""
+    lines = path.read_text(encoding='utf-8').splitlines()
+    return [ln.strip() for ln in lines if ln.strip() and not ln.strip().startswith('#')]
+
+
+def _run_batch(urls: list[str], args: argparse.Namespace, logger: logging.Logger) -> int:
+    from app.batch import BatchItem, run_batch
+    from app.downloader import expand_urls
+    from app.transcriber import shared_transcriber
+
+    expanded: list[str] = []
+    unexpanded: list[BatchItem] = []
+    for url in urls:
+        if not args.expand:
+            video_urls = [url]
+        else:
+            try:
+                video_urls = expand_urls(url, settings.cookie_file, settings.ytdlp_proxy, limit=args.limit)
+            except Exception as exc:
+                # one bad playlist/channel link must not sink the rest of the batch
+                logger.exception('Batch input expansion failed. url=%s', url)
+                unexpanded.append(BatchItem(url=url, error=str(exc), failed_stage='expand'))
+                continue
+        for video_url in video_urls:
+            if video_url not in expanded:
+                expanded.append(video_url)
+    if args.limit > 0:
+        expanded = expanded[: args.limit]
+    logger.info(
+        'Batch input expanded. inputs=%d videos=%d expand_failed=%d', len(urls), len(expanded), len(unexpanded)
+    )
+
+    report = run_batch(
+        expanded,
+        Pipeline(transcriber=shared_transcriber()),
+        max_in_flight=args.max_in_flight,
+        network_slots=args.network_slots,
+        gpu_slots=args.gpu_slots,
+        cpu_slots=args.cpu_slots,
+        resume=args.resume,
+    )
+    items = unexpanded + report.items
+    for item in items:
+        if item.outputs is None:
+            print(f'失败 [{item.failed_stage}]: {item.url} {item.error}')
+            continue
+        print(f'完成: {item.url}')
+        print(f'双语原声视频: {item.outputs.bilingual_video}')
+        print(f'中文配音视频: {item.outputs.dubbed_video or "未生成（已禁用）"}')
+    failed = sum(1 for x in items if x.outputs is None)
+    print(f'批处理完成: 成功 {len(items) - failed} / 失败 {failed}，耗时 {report.elapsed_sec:.1f}s')
+    for u in report.resources:
+        print(
+            f'资源 {u.name}: 并发上限 {u.slots}，任务 {u.tasks}，忙碌 {u.busy_sec:.1f}s，'
+            f'等待 {u.wait_sec:.1f}s，峰值 {u.peak}，利用率 {u.utilization:.0%}'
+        )
+    return 1 if failed else 0
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description='高效版 YouTube 全流程处理器（纯 Python）')
-    parser.add_argument('url', help='视频链接')
+    parser.add_argument('url', nargs='*', help='视频链接；多个链接、--file 或 --expand 时进入批处理模式')
+    parser.add_argument('--resume', action='store_true', help='按运行日志跳过已完成的阶段，从中断处继续')
+    parser.add_argument('--file', type=Path, help='批处理：从文件读取链接（每行一个，# 开头为注释）')
+    parser.add_argument('--expand', action='store_true', help='批处理：把播放列表/频道链接展开为其中的视频')
+    parser.add_argument('--limit', type=int, default=0, help='批处理：最多处理的视频数（0 表示不限）')
+    parser.add_argument('--max-in-flight', type=int, default=0, help='覆盖 BATCH_MAX_IN_FLIGHT')
+    parser.add_argument('--network-slots', type=int, default=0, help='覆盖 SCHEDULER_NETWORK_SLOTS')
+    parser.add_argument('--gpu-slots', type=int, default=0, help='覆盖 SCHEDULER_GPU_SLOTS')
+    parser.add_argument('--cpu-slots', type=int, default=0, help='覆盖 SCHEDULER_CPU_SLOTS')
     args = parser.parse_args()
 
+    urls = list(args.url)
+    if args.file:
+        urls.extend(_read_url_file(args.file))
+    if not urls:
+        parser.error('至少需要一个视频链接或 --file')
+
     setup_logging(settings.log_level, settings.log_file)
     logger = logging.getLogger(__name__)
-    logger.info('Pipeline started for url=%s', args.url)
+    if settings.progress_stdout:
+        progress.add_sink(progress.stdout_sink)
+
+    if len(urls) > 1 or args.file or args.expand:
+        sys.exit(_run_batch(urls, args, logger))
 
-    outputs = Pipeline().run(args.url)
+    logger.info('Pipeline started for url=%s', urls[0])
+    outputs = Pipeline().run(urls[0], resume=args.resume)
     logger.info('Pipeline completed. bilingual=%s dubbed=%s', outputs.bilingual_video, outputs.dubbed_video)
     print(f'双语原声视频: {outputs.bilingual_video}')
     print(f'中文配音视频: {outputs.dubbed_video or "未生成（已禁用）"}')
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.discovery.db import close_thread_connections, get_connection
+from app.discovery.models import VideoCandidate
+from app.discovery.repository import (
+    claim_next_job,
+    complete_job,
+    enqueue_processing_job,
+    init_db,
+    list_jobs,
+    upsert_candidates,
+)
+from app.settings import settings
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Micro-benchmark of discovery job claim/complete under concurrent readers.')
+    p.add_argument('--jobs', type=int, default=400, help='Jobs to enqueue and drain.')
+    p.add_argument('--workers', type=int, default=4, help='Threads claiming and completing jobs.')
+    p.add_argument('--readers', type=int, default=4, help='Threads polling the dashboard queries meanwhile.')
+    p.add_argument('--no-wal', action='store_true', help='Use the rollback journal instead of WAL for comparison.')
+    p.add_argument('--work-dir', type=Path, help='Work directory. If omitted, use a temporary directory.')
+    return p.parse_args()
+
+
+def _candidate(i: int) -> VideoCandidate:
+    return VideoCandidate(
+        video_id=f'bench{i:06d}',
+        url=f'https://www.youtube.com/watch?v=bench{i:06d}',
+        title=f'bench video {i}',
+        description='',
+        channel_id='bench',
+        channel_title='bench',
+        published_at='2024-01-01T00:00:00Z',
+        language_hint='en',
+        duration_sec=600,
+        view_count=1000 + i,
+        comment_count=10,
+        like_count=100,
+        keyword='bench',
+        score=float(i % 100),
+        raw_json='{}',
+    )
+
+
+def _run_once(base: Path, jobs: int, workers: int, readers: int) -> dict[str, float]:
+    base.mkdir(parents=True, exist_ok=True)
+    db_path = base / 'bench.db'
+    init_db(db_path)
+    upsert_candidates(db_path, [_candidate(i) for i in range(jobs)])
+    for i in range(jobs):
+        enqueue_processing_job(db_path, f'bench{i:06d}')
+
+    done = threading.Event()
+    claimed = [0] * workers
+    reads = [0] * readers
+    busy = [0] * (workers + readers)
+    errors: list[BaseException] = []
+
+    def worker(idx: int) -> None:
+        try:
+            while True:
+                try:
+                    job = claim_next_job(db_path, worker_id=f'bench:{idx}')
+                except sqlite3.OperationalError:
+                    busy[idx] += 1
+                    continue
+                if not job:
+                    return
+                while True:
+                    try:
+                        complete_job(db_path, job_id=int(job['id']), success=True)
+                        break
+                    except sqlite3.OperationalError:
+                        busy[idx] += 1
+                claimed[idx] += 1
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+        finally:
+            close_thread_connections()
+
+    def reader(idx: int) -> None:
+        try:
+            conn = get_connection(db_path)
+            while not done.is_set():
+                try:
+                    conn.execute(
+                        'SELECT video_id, score FROM discovered_videos WHERE score >= ? ORDER BY score DESC LIMIT 100',
+                        (10.0,),
+                    ).fetchall()
+                    list_jobs(db_path, limit=40)
+                except sqlite3.OperationalError:
+                    # `database is locked` after busy_timeout: reader starved by writers
+                    busy[workers + idx] += 1
+                    continue
+                reads[idx] += 1
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+        finally:
+            close_thread_connections()
+
+    reader_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    worker_threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in reader_threads:
+        t.start()
+    t0 = time.perf_counter()
+    for t in worker_threads:
+        t.start()
+    for t in worker_threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    done.set()
+    for t in reader_threads:
+        t.join()
+    close_thread_connections()
+
+    if errors:
+        raise RuntimeError(f'benchmark thread failed: {errors[0]!r}')
+    if sum(claimed) != jobs:
+        raise RuntimeError(f'claimed {sum(claimed)} jobs, expected {jobs}')
+    return {
+        'elapsed_sec': elapsed,
+        'jobs_per_sec': jobs / elapsed if elapsed > 0 else 0.0,
+        'reads_per_sec': sum(reads) / elapsed if elapsed > 0 else 0.0,
+        'busy_errors': float(sum(busy)),
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    settings.discovery_db_wal = not args.no_wal
+    mode = 'rollback' if args.no_wal else 'wal'
+    if args.work_dir:
+        stats = _run_once(args.work_dir.resolve(), args.jobs, args.workers, args.readers)
+    else:
+        with tempfile.TemporaryDirectory(prefix='discovery-bench-') as td:
+            stats = _run_once(Path(td), args.jobs, args.workers, args.readers)
+    print(
+        f'[OK] discovery queue bench journal={mode} jobs={args.jobs} workers={args.workers} readers={args.readers} '
+        f'elapsed={stats["elapsed_sec"]:.2f}s claim+complete/s={stats["jobs_per_sec"]:.1f} '
+        f'reads/s={stats["reads_per_sec"]:.1f} busy_errors={int(stats["busy_errors"])}'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.discovery.models import VideoCandidate
+from app.discovery.scoring import dedupe_and_sort, score_batch
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Micro-benchmark of batch scoring and streaming top-N selection.')
+    p.add_argument('--rows', type=int, default=1_000_000, help='Synthetic candidates to score and rank.')
+    p.add_argument('--distinct', type=float, default=0.8, help='Share of distinct video ids (rest are repeats).')
+    p.add_argument('--top-n', type=int, default=200, help='How many candidates to select.')
+    p.add_argument('--seed', type=int, default=7)
+    return p.parse_args()
+
+
+def _scalar_score(view_count: int, comment_count: int, published_at: str, now: datetime) -> float:
+    """The per-item formula the batch scorer replaced, kept here as the reference."""
+    views_term = math.log10(max(10, view_count))
+    comments_term = math.log10(max(5, comment_count)) * 1.3
+    try:
+        dt = datetime.fromisoformat(published_at.replace('Z', '+00:00')).astimezone(timezone.utc)
+        age_hours = max(1.0, (now - dt).total_seconds() / 3600.0)
+        freshness = 24.0 / age_hours
+    except Exception:
+        freshness = 0.0
+    return round(views_term + comments_term + freshness, 6)
+
+
+def _sorted_top(candidates: list[VideoCandidate], top_n: int) -> list[VideoCandidate]:
+    latest: dict[str, VideoCandidate] = {}
+    for item in candidates:
+        prev = latest.get(item.video_id)
+        if prev is None or item.score > prev.score:
+            latest[item.video_id] = item
+    return sorted(latest.values(), key=lambda x: x.score, reverse=True)[: max(1, top_n)]
+
+
+def main() -> None:
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    rows = max(1, args.rows)
+    distinct = max(1, int(rows * min(1.0, max(0.01, args.distinct))))
+    views = [int(rnd.paretovariate(1.2) * 1000) for _ in range(rows)]
+    comments = [int(rnd.paretovariate(1.5) * 10) for _ in range(rows)]
+    published = [
+        (now - timedelta(seconds=rnd.randrange(3600, 30 * 86400))).strftime('%Y-%m-%dT%H:%M:%SZ') for _ in range(rows)
+    ]
+
+    t0 = time.perf_counter()
+    scalar = [_scalar_score(v, c, p, now) for v, c, p in zip(views, comments, published)]
+    scalar_sec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    batch = score_batch(views, comments, published, now=now)
+    batch_sec = time.perf_counter() - t0
+    worst = max(abs(a - b) for a, b in zip(scalar, batch.tolist()))
+    assert worst < 2e-6, f'batch score differs from scalar: {worst}'
+
+    ids = [f'v{rnd.randrange(distinct):08d}' for _ in range(rows)]
+    candidates = [
+        VideoCandidate(vid, '', '', '', '', '', '', 'en', 0, 0, 0, 0, '', score, '')
+        for vid, score in zip(ids, batch.tolist())
+    ]
+    t0 = time.perf_counter()
+    expected = _sorted_top(candidates, args.top_n)
+    sort_sec = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    got = dedupe_and_sort(candidates, args.top_n)
+    heap_sec = time.perf_counter() - t0
+    assert [(x.video_id, x.score) for x in got] == [(x.video_id, x.score) for x in expected], 'top-N mismatch'
+
+    print(
+        f'rows={rows} distinct~{distinct} top_n={args.top_n}\n'
+        f'score scalar={scalar_sec:.2f}s batch={batch_sec:.2f}s speedup={scalar_sec / max(batch_sec, 1e-9):.1f}x\n'
+        f'select sort={sort_sec:.2f}s heap={heap_sec:.2f}s speedup={sort_sec / max(heap_sec, 1e-9):.1f}x'
+    )
+
+
+if __name__ == '__main__':
+    main()
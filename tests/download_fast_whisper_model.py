@@ -5,20 +5,32 @@ from __future__ import annotations
 
 Usage:
   python tests/download_fast_whisper_model.py
+  python tests/download_fast_whisper_model.py --refresh   # re-check remote source
+  python tests/download_fast_whisper_model.py --verify    # deep checksum of registered model
 """
 
+import argparse
 from pathlib import Path
 
 from app.logging_utils import setup_logging
 from app.settings import settings
 from app.transcriber import (
     _apply_download_proxy_env,
-    _download_huggingface_model_to_local,
+    _model_registry,
+    _registry_key,
     _resolve_whisper_model_ref,
 )
 
 
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Prepare fast-whisper model in the local registry.')
+    p.add_argument('--refresh', action='store_true', help='Re-check the remote source even if the model is registered.')
+    p.add_argument('--verify', action='store_true', help='Run a full checksum verification of the registered model.')
+    return p.parse_args()
+
+
 def main() -> int:
+    args = parse_args()
     setup_logging(settings.log_level, settings.log_file)
     try:
         _apply_download_proxy_env(settings.whisper_download_proxy.strip())
@@ -27,12 +39,16 @@ def main() -> int:
         model_ref = settings.whisper_model.strip()
 
         if source == 'huggingface' and not Path(model_ref).expanduser().exists():
-            local_path = _download_huggingface_model_to_local(
-                model_ref=model_ref,
-                cache_dir=settings.whisper_model_cache_dir.expanduser().resolve(),
-            )
-        else:
-            local_path = _resolve_whisper_model_ref(source=source)
+            # This script always materializes HF models locally, regardless of WHISPER_DOWNLOAD_TO_LOCAL.
+            settings.whisper_download_to_local = True
+        local_path = _resolve_whisper_model_ref(source=source, refresh=args.refresh)
+
+        if args.verify:
+            key = _registry_key(source)
+            if not _model_registry().verify(key):
+                print(f'[ERROR] model verification failed: {key}')
+                return 1
+            print(f'Model verified: {key}')
 
         print(f'Model prepared locally: {local_path}')
         return 0
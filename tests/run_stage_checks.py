@@ -9,9 +9,13 @@ STAGES = [
     ('tests.test_downloader_stage', []),
     ('tests.test_ffmpeg_stage', []),
     ('tests.test_subtitles_stage', []),
+    ('tests.test_word_timings_stage', []),
+    ('tests.test_discovery_stage', []),
+    ('tests.test_scheduler_stage', []),
     ('tests.test_merge_ass_audio_video', []),
     ('tests.test_transcriber_stage', []),
     ('tests.test_translator_stage', []),
+    ('tests.test_run_journal_stage', []),
     ('tests.test_dubbing_pipeline_stage', []),
     ('tests.test_pipeline_e2e', []),
 ]
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from app.discovery.http_cache import ResponseCache
+from app.discovery.http_client import ApiHttpClient
+from app.discovery.db import get_connection
+from app.discovery.quota import API_COST, KeywordStats, QuotaBudget, plan_keywords, quota_day
+from app.discovery.repository import (
+    init_db,
+    list_candidates_page,
+    load_keyword_cursors,
+    load_keyword_stats,
+    quota_spent,
+    record_quota_usage,
+    rescore_candidates,
+    upsert_candidates,
+)
+from app.discovery.scoring import compute_hot_score
+from app.discovery.service import run_discovery_once
+from app.discovery.youtube_discovery import DiscoveryRun, discover_candidates
+from app.settings import settings
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Discovery stage test against a local stand-in YouTube Data API server.')
+    p.add_argument('--keywords', type=int, default=8, help='Number of synthetic keywords.')
+    p.add_argument('--latency', type=float, default=0.15, help='Artificial server latency per request in seconds.')
+    p.add_argument('--concurrency', type=int, default=4, help='DISCOVERY_CONCURRENCY for the concurrent run.')
+    return p.parse_args()
+
+
+class FakeYouTubeApi:
+    """Minimal `search` + `videos` endpoints with overlapping results across keywords."""
+
+    def __init__(self, latency: float, ids_per_keyword: int = 6, id_space: int = 20, quota_limit: int = 0) -> None:
+        self.latency = latency
+        self.quota_limit = quota_limit
+        self.quota_used = 0
+        # close every connection after its response without `Connection: close`, like an idle timeout
+        self.drop_keepalive = False
+        self.not_modified = 0
+        self.new_ids: dict[str, list[str]] = {}
+        # keyword -> long result list, already in descending view order like `order=viewCount`
+        self.deep: dict[str, list[str]] = {}
+        self.published_after: dict[str, str] = {}
+        self.ids_per_keyword = ids_per_keyword
+        self.id_space = id_space
+        self.requests: dict[str, int] = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self) -> None:
+                with api._lock:
+                    api.connections += 1
+                super().handle()
+
+            def do_GET(self) -> None:  # noqa: N802
+                parsed = urlparse(self.path)
+                endpoint = parsed.path.rstrip('/').rsplit('/', 1)[-1]
+                with api._lock:
+                    api.requests[endpoint] = api.requests.get(endpoint, 0) + 1
+                    api.quota_used += API_COST.get(endpoint, 1)
+                    over_quota = api.quota_limit > 0 and api.quota_used > api.quota_limit
+                time.sleep(api.latency)
+                q = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                if over_quota:
+                    err = {'error': {'code': 403, 'errors': [{'reason': 'quotaExceeded', 'domain': 'youtube.quota'}]}}
+                    data = json.dumps(err).encode('utf-8')
+                    self.send_response(403)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    return
+                if endpoint == 'search':
+                    body = api.search(q)
+                elif endpoint == 'videos':
+                    body = api.videos(q)
+                else:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                data = json.dumps(body).encode('utf-8')
+                etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    with api._lock:
+                        api.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                if api.drop_keepalive:
+                    self.close_connection = True
+
+            def log_message(self, fmt: str, *args: object) -> None:
+                return
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/youtube/v3'
+
+    def start(self) -> FakeYouTubeApi:
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def keyword_ids(self, q: str) -> list[str]:
+        if q in self.deep:
+            return self.deep[q]
+        k = int(q.rsplit('-', 1)[-1]) if q.rsplit('-', 1)[-1].isdigit() else len(q)
+        ids = [f'vid{(k * 3 + j) % self.id_space:04d}' for j in range(self.ids_per_keyword)]
+        return self.new_ids.get(q, []) + ids
+
+    @staticmethod
+    def published_at(vid: str) -> str:
+        """Ids >= 100 are "just published"; older ids are one hour apart."""
+        n = int(vid[3:])
+        # whole hours keep bodies (and ETags) stable between runs
+        base = (datetime.now(timezone.utc) - timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+        dt = base if n >= 100 else base - timedelta(hours=n + 1)
+        return dt.isoformat().replace('+00:00', 'Z')
+
+    def search(self, q: dict[str, str]) -> dict:
+        after = q.get('publishedAfter', '')
+        with self._lock:
+            self.published_after[q.get('q', '')] = after
+        ids = [vid for vid in self.keyword_ids(q.get('q', '')) if self.published_at(vid) >= after]
+        start = int(q.get('pageToken') or '0')
+        end = start + int(q.get('maxResults', '50'))
+        body: dict = {'items': [{'id': {'kind': 'youtube#video', 'videoId': vid}} for vid in ids[start:end]]}
+        if end < len(ids):
+            body['nextPageToken'] = str(end)
+        return body
+
+    def videos(self, q: dict[str, str]) -> dict:
+        items = []
+        for vid in [x for x in q.get('id', '').split(',') if x]:
+            n = int(vid[3:])
+            items.append(
+                {
+                    'id': vid,
+                    'snippet': {
+                        'title': f'video {n}',
+                        'description': '',
+                        'channelId': f'ch{n % 4}',
+                        'channelTitle': f'channel {n % 4}',
+                        'publishedAt': self.published_at(vid),
+                        'defaultAudioLanguage': 'en',
+                    },
+                    'contentDetails': {'duration': 'PT10M'},
+                    'statistics': {'viewCount': str(100000 + n * 1000), 'commentCount': str(500 + n), 'likeCount': '10'},
+                }
+            )
+        return {'items': items}
+
+
+def _discover(
+    api: FakeYouTubeApi,
+    keywords: list[str],
+    concurrency: int,
+    budget: QuotaBudget | None = None,
+    cache: ResponseCache | None = None,
+    max_results: int = 25,
+    top_n: int = 0,
+) -> tuple[list, ApiHttpClient, float]:
+    settings.discovery_api_base = api.base_url
+    settings.discovery_concurrency = concurrency
+    client = ApiHttpClient(max_connections=concurrency, timeout_sec=10, retries=1, backoff_sec=0.2, cache=cache)
+    t0 = time.perf_counter()
+    try:
+        out = discover_candidates(
+            api_key='test-key',
+            keywords=keywords,
+            days_back=3,
+            max_results_per_keyword=max_results,
+            min_views=1000,
+            min_comments=10,
+            min_duration_sec=60,
+            max_duration_sec=3600,
+            client=client,
+            budget=budget,
+            top_n=top_n,
+        )
+    finally:
+        client.close()
+    return out, client, time.perf_counter() - t0
+
+
+def _check_quota(latency: float) -> str:
+    keywords = [f'kw-{i}' for i in range(6)]
+
+    # local budget: room for three searches, each holding back one videos unit for its details
+    api = FakeYouTubeApi(latency).start()
+    budget = QuotaBudget(daily_budget=3 * (API_COST['search'] + API_COST['videos']))
+    try:
+        out, _, _ = _discover(api, keywords, concurrency=2, budget=budget)
+    finally:
+        api.stop()
+    if api.requests.get('search') != 3 or api.requests.get('videos') != 1 or not budget.exhausted:
+        raise RuntimeError(f'budget not enforced: requests={api.requests} exhausted={budget.exhausted}')
+    if budget.reserved != 2:
+        raise RuntimeError(f'details call did not consume a reserved videos unit: reserved={budget.reserved}')
+    if not out:
+        raise RuntimeError('budget stop dropped the partial result')
+
+    # server-side quota: the first 403 quotaExceeded stops the remaining keywords
+    api = FakeYouTubeApi(latency, quota_limit=2 * API_COST['search']).start()
+    server_budget = QuotaBudget(daily_budget=10_000)
+    try:
+        _discover(api, keywords, concurrency=1, budget=server_budget)
+    finally:
+        api.stop()
+    if not server_budget.exhausted or api.requests.get('search') != 3:
+        raise RuntimeError(f'quotaExceeded not handled: requests={api.requests}')
+
+    with tempfile.TemporaryDirectory(prefix='discovery-quota-') as td:
+        db_path = Path(td) / 'discovery.db'
+        init_db(db_path)
+        day = quota_day()
+        kept = {kw: n for kw, n in zip(keywords, [1, 5, 0])}
+        record_quota_usage(db_path, day, budget.usage, kept)
+        if quota_spent(db_path, day) != budget.spent_today:
+            raise RuntimeError('quota ledger total mismatch')
+        stats = load_keyword_stats(db_path)
+        planned = plan_keywords(['new-kw', *keywords[:3]], stats)
+        if planned != ['new-kw', 'kw-1', 'kw-0', 'kw-2']:
+            raise RuntimeError(f'keyword plan not ordered by yield: {planned} {stats}')
+    ranked = {'a': KeywordStats('a', units=100, kept=1), 'b': KeywordStats('b', units=100, kept=2)}
+    if plan_keywords(['a', 'b'], ranked) != ['b', 'a']:
+        raise RuntimeError('plan_keywords ordering mismatch')
+    return f'quota_spent={budget.spent_today}'
+
+
+def _check_cache(latency: float) -> str:
+    keywords = [f'kw-{i}' for i in range(4)]
+    with tempfile.TemporaryDirectory(prefix='discovery-cache-') as td:
+        db_path = Path(td) / 'discovery.db'
+        init_db(db_path)
+        api = FakeYouTubeApi(latency).start()
+        try:
+            cache = ResponseCache(db_path, {'search': 3600, 'videos': 3600})
+            first, _, _ = _discover(api, keywords, concurrency=2, budget=QuotaBudget(daily_budget=10_000), cache=cache)
+            cold_requests = sum(api.requests.values())
+
+            warm_budget = QuotaBudget(daily_budget=10_000)
+            warm, _, _ = _discover(api, keywords, concurrency=2, budget=warm_budget, cache=cache)
+            if sum(api.requests.values()) != cold_requests or warm_budget.spent_today != 0:
+                raise RuntimeError(f'fresh cache hit still hit the network: requests={api.requests}')
+            if [x.video_id for x in warm] != [x.video_id for x in first]:
+                raise RuntimeError('cached discovery result differs')
+
+            expired = ResponseCache(db_path, {'search': 0, 'videos': 0})
+            _discover(api, keywords, concurrency=2, budget=QuotaBudget(daily_budget=10_000), cache=expired)
+            if api.not_modified != cold_requests:
+                raise RuntimeError(f'expired entries not revalidated: not_modified={api.not_modified}')
+        finally:
+            api.stop()
+    return f'cache_revalidated={api.not_modified}'
+
+
+def _check_incremental(latency: float) -> str:
+    keywords = [f'kw-{i}' for i in range(4)]
+    settings.youtube_api_key = 'test-key'
+    settings.discovery_topic_types = ''
+    settings.discovery_keywords = ','.join(keywords)
+    settings.discovery_http_cache_enabled = False
+    settings.discovery_min_views = 1000
+    settings.discovery_min_comments = 10
+    settings.discovery_min_duration_sec = 60
+    # every result is stored, so each fully paged keyword's cursor reaches its newest result
+    settings.discovery_top_n = 50
+    with tempfile.TemporaryDirectory(prefix='discovery-incremental-') as td:
+        db_path = Path(td) / 'discovery.db'
+        api = FakeYouTubeApi(latency).start()
+        try:
+            settings.discovery_api_base = api.base_url
+            run_discovery_once(db_path=db_path, dry_run=True)
+            if load_keyword_cursors(db_path):
+                raise RuntimeError('a dry run moved keyword cursors')
+            _, first = run_discovery_once(db_path=db_path)
+            cursors = load_keyword_cursors(db_path)
+            if sorted(cursors) != keywords:
+                raise RuntimeError(f'keyword cursors not stored: {cursors}')
+
+            api.new_ids['kw-0'] = ['vid0100']
+            before = dict(api.requests)
+            raw, selected = run_discovery_once(db_path=db_path, incremental=True)
+        finally:
+            api.stop()
+    for kw in keywords:
+        if api.published_after.get(kw) != cursors[kw]:
+            raise RuntimeError(f'incremental search ignored the cursor: {kw} {api.published_after.get(kw)}')
+    if 'vid0100' not in {c.video_id for c in raw}:
+        raise RuntimeError('new video not discovered incrementally')
+    known = {c.video_id for c in first}
+    if not known <= {c.video_id for c in selected}:
+        raise RuntimeError('known candidates were not refreshed')
+    if api.requests['videos'] - before['videos'] != 1:
+        raise RuntimeError('new and refreshed ids were not fetched in one batched call')
+    return f'incremental_refreshed={len(known)}'
+
+
+def _check_cursor_marks() -> str:
+    run = DiscoveryRun(
+        candidates=[],
+        searched=['a', 'b', 'c', 'd'],
+        found={'a': ['v3', 'v1', 'v2'], 'b': ['v1'], 'c': ['v4'], 'd': ['v5', 'v1']},
+        fully_paged={'a', 'b', 'd'},
+        published_at={'v1': '2026-01-01', 'v2': '2026-01-02', 'v3': '2026-01-03', 'v4': '2026-01-04', 'r9': '2026-01-09'},
+        refreshed_ids={'r9'},
+    )
+    # `a` stops before unstored v3, `c` was truncated, `d` has a result without details (time unknown)
+    marks = run.cursor_marks({'v1', 'v2', 'v4', 'v5', 'r9'})
+    if marks != {'a': '2026-01-02', 'b': '2026-01-01'}:
+        raise RuntimeError(f'cursor marks passed unstored or unpaged results: {marks}')
+    return f'cursor_marks={len(marks)}/{len(run.searched)}'
+
+
+def _check_paging(latency: float) -> str:
+    deep = [f'vid{n:04d}' for n in range(1199, 999, -1)]
+    api = FakeYouTubeApi(latency / 3).start()
+    api.deep['deep'] = deep
+    try:
+        full, _, _ = _discover(api, ['deep'], concurrency=2, max_results=len(deep))
+        full_pages = api.requests['search']
+        early, _, _ = _discover(api, ['deep'], concurrency=2, max_results=len(deep), top_n=10)
+        early_pages = api.requests['search'] - full_pages
+    finally:
+        api.stop()
+    if full_pages != 4 or len(full) != len(deep):
+        raise RuntimeError(f'pagination incomplete: pages={full_pages} candidates={len(full)}')
+    if early_pages != 2:
+        raise RuntimeError(f'paging did not stop at the top-N cutoff: pages={early_pages}')
+    top = sorted(full, key=lambda x: x.score, reverse=True)[:10]
+    if {x.video_id for x in top} - {x.video_id for x in early}:
+        raise RuntimeError('early termination lost a top-N candidate')
+    return f'paging_pages={full_pages}->{early_pages}'
+
+
+def _check_keepalive_drop(latency: float) -> str:
+    api = FakeYouTubeApi(latency).start()
+    api.drop_keepalive = True
+    # a backoff sleep or a counted error would show up in the elapsed time and the stats
+    client = ApiHttpClient(max_connections=1, timeout_sec=10, retries=2, backoff_sec=5.0)
+    calls = 4
+    t0 = time.perf_counter()
+    try:
+        for i in range(calls):
+            client.get_json(f'{api.base_url}/search?q=kw-{i}&part=snippet')
+    finally:
+        client.close()
+        api.stop()
+    elapsed = time.perf_counter() - t0
+    st = client.stats()['search']
+    if st.errors or st.retries or st.requests != calls:
+        raise RuntimeError(f'dropped keep-alive counted as an endpoint failure: {st}')
+    if elapsed > 2.0:
+        raise RuntimeError(f'dropped keep-alive retried with backoff: elapsed={elapsed:.2f}s')
+    if client.connections_opened != calls or api.connections != calls:
+        raise RuntimeError(f'expected one fresh connection per call: opened={client.connections_opened}')
+    return f'keepalive_reconnects={client.connections_opened - 1}'
+
+
+def _check_rescore(candidates: list) -> str:
+    later = datetime.now(timezone.utc) + timedelta(hours=6)
+    with tempfile.TemporaryDirectory(prefix='discovery-rescore-') as td:
+        db_path = Path(td) / 'discovery.db'
+        init_db(db_path)
+        upsert_candidates(db_path, candidates)
+        scanned, updated = rescore_candidates(db_path, chunk_size=7, now=later)
+        _, again = rescore_candidates(db_path, chunk_size=7, now=later)
+        rows = get_connection(db_path).execute(
+            'SELECT view_count, comment_count, published_at, score FROM discovered_videos'
+        ).fetchall()
+    if scanned != len(candidates) or updated == 0 or again != 0:
+        raise RuntimeError(f'rescore counts wrong: scanned={scanned} updated={updated} again={again}')
+    for views, comments, published_at, score in rows:
+        if score != compute_hot_score(views, comments, published_at, now=later):
+            raise RuntimeError(f'rescored value mismatch: {published_at} {score}')
+    return f'rescored={updated}/{scanned}'
+
+
+def _check_language_listing(candidates: list) -> str:
+    with tempfile.TemporaryDirectory(prefix='discovery-listing-') as td:
+        db_path = Path(td) / 'discovery.db'
+        init_db(db_path)
+        upsert_candidates(db_path, candidates)
+        conn = get_connection(db_path)
+        executed: list[str] = []
+        conn.set_trace_callback(executed.append)
+        try:
+            page = list_candidates_page(db_path, language='EN-us', limit=5)
+        finally:
+            conn.set_trace_callback(None)
+        plan = ' | '.join(str(r[3]) for r in conn.execute('EXPLAIN QUERY PLAN ' + executed[-1]).fetchall())
+    if len(page) != min(5, len(candidates)) or any(r['language_hint'] != 'en' for r in page):
+        raise RuntimeError(f'language filter returned the wrong rows: {page}')
+    if 'idx_discovered_lang_score' not in plan or 'TEMP B-TREE' in plan:
+        raise RuntimeError(f'language listing is not served in index order: {plan}')
+    return 'lang_listing=index'
+
+
+def main() -> int:
+    args = parse_args()
+    keywords = [f'kw-{i}' for i in range(args.keywords)]
+
+    serial_api = FakeYouTubeApi(args.latency).start()
+    try:
+        serial, _, serial_sec = _discover(serial_api, keywords, concurrency=1)
+    finally:
+        serial_api.stop()
+
+    api = FakeYouTubeApi(args.latency).start()
+    try:
+        out, client, elapsed = _discover(api, keywords, concurrency=args.concurrency)
+    finally:
+        api.stop()
+
+    if not out:
+        raise RuntimeError('no candidates discovered')
+    if [x.video_id for x in out] != [x.video_id for x in serial]:
+        raise RuntimeError('concurrent discovery changed the result order')
+    total_requests = sum(api.requests.values())
+    if api.connections > args.concurrency or api.connections >= total_requests:
+        raise RuntimeError(f'connections not reused: connections={api.connections} requests={total_requests}')
+    if args.concurrency > 1 and elapsed > serial_sec * 0.75:
+        raise RuntimeError(f'concurrency did not help: serial={serial_sec:.2f}s concurrent={elapsed:.2f}s')
+    expected: dict[str, list[str]] = {}
+    for kw in keywords:
+        for vid in api.keyword_ids(kw):
+            expected.setdefault(vid, []).append(kw)
+    for x in out:
+        if list(x.matched_keywords) != expected[x.video_id] or x.keyword != expected[x.video_id][0]:
+            raise RuntimeError(f'matched keywords mismatch for {x.video_id}: {x.matched_keywords}')
+    if len(out) != len(expected):
+        raise RuntimeError(f'duplicate or missing candidates: got={len(out)} unique={len(expected)}')
+    if api.requests.get('videos') != -(-len(expected) // 50):
+        raise RuntimeError(f'video details not batched: videos_calls={api.requests.get("videos")}')
+    stats = client.stats()
+    if sum(st.requests for st in stats.values()) != total_requests:
+        raise RuntimeError('latency metrics do not match server request count')
+    quota_summary = _check_quota(args.latency)
+    cache_summary = _check_cache(args.latency)
+    incremental_summary = _check_incremental(args.latency)
+    paging_summary = _check_paging(args.latency)
+    cursor_summary = _check_cursor_marks()
+    keepalive_summary = _check_keepalive_drop(args.latency)
+    rescore_summary = _check_rescore(out)
+    listing_summary = _check_language_listing(out)
+
+    print(
+        f'[OK] discovery stage completed: candidates={len(out)} requests={dict(sorted(api.requests.items()))} '
+        f'connections={api.connections} serial={serial_sec:.2f}s concurrent={elapsed:.2f}s '
+        f'search_p95={stats["search"].percentile(0.95):.3f}s {quota_summary} {cache_summary} {incremental_summary} {paging_summary}'
+        f' {cursor_summary} {keepalive_summary} {rescore_summary} {listing_summary}'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
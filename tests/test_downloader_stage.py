@@ -8,7 +8,7 @@ import tempfile
 import threading
 from pathlib import Path
 
-from app.downloader import download_media
+from app.downloader import _PERMANENT_FAILURE, _RANGE_NOT_SATISFIABLE, download_media
 from app.ffmpeg_tools import run_ffmpeg
 from app.settings import settings
 
@@ -57,8 +57,24 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def _check_error_classes() -> None:
+    range_errors = ['ERROR: unable to download video data: HTTP Error 416: Requested Range Not Satisfiable']
+    permanent = [
+        "ERROR: [youtube] abc: Private video. Sign in if you've been granted access to this video",
+        'ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader',
+        'ERROR: [youtube] abc: Sign in to confirm your age. This video may be inappropriate for some users.',
+    ]
+    transient = ['ERROR: fragment 416 of 900 not found, unable to continue', 'HTTP Error 503: Service Unavailable']
+    for msg in range_errors + permanent + transient:
+        if bool(_RANGE_NOT_SATISFIABLE.search(msg)) != (msg in range_errors):
+            raise RuntimeError(f'416 classification mismatch: {msg}')
+        if bool(_PERMANENT_FAILURE.search(msg)) != (msg in permanent):
+            raise RuntimeError(f'permanent error classification mismatch: {msg}')
+
+
 def main() -> int:
     args = parse_args()
+    _check_error_classes()
     if args.url.strip():
         out_video = run_test(url=args.url.strip(), out_dir=args.out_dir.resolve(), seconds=args.seconds)
         print(f'[OK] downloader stage completed: {out_video}')
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from app.dubbing_pipeline import DubbingPipeline
+from app.dubbing_segments import DubbingSegment
+from app.run_journal import RunJournal, fingerprint
+from app.settings import settings
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Run journal resume stage test (TTS engine mocked).')
+    p.add_argument('--work-dir', type=Path, help='Work directory. If omitted, use a temporary directory.')
+    p.add_argument('--segments', type=int, default=4, help='Number of TTS segments in the partial-resume check.')
+    return p.parse_args()
+
+
+def _check_stage_resume(base: Path) -> None:
+    journal_dir = base / 'journal'
+    src = base / 'in.txt'
+    out = base / 'out.txt'
+    src.write_text('source', encoding='utf-8')
+    out.write_text('result', encoding='utf-8')
+
+    RunJournal.for_stem(journal_dir, 'demo').record('convert', {'src': src}, {'out': out}, {'n': 1})
+
+    journal = RunJournal.for_stem(journal_dir, 'demo', resume=True)
+    record = journal.completed('convert', {'src': src})
+    if record is None or record.data != {'n': 1} or record.output_path('out') != out.resolve():
+        raise RuntimeError(f'valid stage not resumed: {record}')
+    if RunJournal.for_stem(journal_dir, 'demo').completed('convert', {'src': src}) is not None:
+        raise RuntimeError('stage resumed without --resume')
+
+    src.write_text('source changed', encoding='utf-8')
+    if journal.completed('convert', {'src': src}) is not None:
+        raise RuntimeError('stage resumed although its input changed')
+
+    journal.record('convert', {'src': src}, {'out': out})
+    out.unlink()
+    if journal.completed('convert', {'src': src}) is not None:
+        raise RuntimeError('stage resumed although its output is missing')
+
+
+def _check_partial_log(base: Path) -> None:
+    journal_dir = base / 'journal'
+    journal = RunJournal.for_stem(journal_dir, 'partial')
+    journal.partial_set('tts', '1', {'text': 'a'})
+    journal.partial_set('tts', '2', {'text': 'b'})
+    if journal.path.exists() or not journal.partial_path.exists():
+        raise RuntimeError('partial items should only append to the side log')
+    with journal.partial_path.open('a', encoding='utf-8') as f:
+        f.write('{"stage": "tts", "key": "3", "val')  # torn by a crash
+
+    reloaded = RunJournal.for_stem(journal_dir, 'partial', resume=True)
+    if reloaded.partial_get('tts', '2') != {'text': 'b'} or reloaded.partial_get('tts', '3') is not None:
+        raise RuntimeError(f'partial log replay mismatch: {reloaded.partial}')
+    reloaded.record('noop', {}, {})
+    if reloaded.partial_path.exists():
+        raise RuntimeError('full save should fold the side log into the journal')
+    if RunJournal.for_stem(journal_dir, 'partial').partial_get('tts', '1') != {'text': 'a'}:
+        raise RuntimeError('partial items lost after folding the side log')
+
+
+def _check_tts_reuse(base: Path, n_segments: int) -> int:
+    synthesized: list[str] = []
+
+    class _FakeTTS:
+        def synthesize_to_wav(self, text: str, out_path: Path) -> Path:
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            out_path.write_bytes(f'RIFF {text} {len(synthesized)}'.encode('utf-8'))
+            synthesized.append(text)
+            return out_path
+
+    def segments(texts: list[str]) -> list[DubbingSegment]:
+        return [DubbingSegment(i, i, i + 1.0, f'src {i}', t) for i, t in enumerate(texts, start=1)]
+
+    with (
+        mock.patch.object(settings, 'work_dir', base / 'work'),
+        mock.patch('app.dubbing_pipeline.create_tts_engine', _FakeTTS),
+        mock.patch.object(DubbingPipeline, '_trim_tts_wav_silence'),
+    ):
+        dubbing = DubbingPipeline()
+        journal_dir = base / 'journal'
+        texts = [f'第{i}段' for i in range(1, n_segments + 1)]
+        clips = dubbing._tts_segments(segments(texts), 'tts', RunJournal.for_stem(journal_dir, 'tts'))
+        if len(synthesized) != n_segments:
+            raise RuntimeError(f'first run should synthesize every segment: {synthesized}')
+
+        # segment 1: text edited; segment 2: wav rewritten behind the journal's back
+        texts[0] = '改过的第1段'
+        clips[1].wav_path.write_bytes(b'RIFF tampered')
+        synthesized.clear()
+        dubbing._tts_segments(segments(texts), 'tts', RunJournal.for_stem(journal_dir, 'tts', resume=True))
+        if synthesized != texts[:2]:
+            raise RuntimeError(f'only changed segments should be re-synthesized: {synthesized}')
+
+        synthesized.clear()
+        journal = RunJournal.for_stem(journal_dir, 'tts', resume=True)
+        dubbing._tts_segments(segments(texts), 'tts', journal)
+        if synthesized:
+            raise RuntimeError(f'unchanged segments re-synthesized: {synthesized}')
+        if journal.partial_get('tts', '1') != {'text': texts[0], 'wav': fingerprint(clips[0].wav_path)}:
+            raise RuntimeError('journal does not hold the re-synthesized segment')
+    return n_segments
+
+
+def _run_once(base: Path, n_segments: int) -> int:
+    for sub in ('stage', 'partial', 'tts'):
+        (base / sub).mkdir(parents=True, exist_ok=True)
+    _check_stage_resume(base / 'stage')
+    _check_partial_log(base / 'partial')
+    return _check_tts_reuse(base / 'tts', n_segments)
+
+
+def main() -> int:
+    args = parse_args()
+    if args.segments < 2:
+        raise SystemExit('--segments must be at least 2')
+    if args.work_dir:
+        n = _run_once(args.work_dir.resolve(), args.segments)
+        print(f'[OK] run journal stage completed: segments={n}')
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix='run-journal-stage-') as td:
+        n = _run_once(Path(td), args.segments)
+        print(f'[OK] run journal stage completed: segments={n}')
+        return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+
+from app.batch import Step, run_scheduled
+from app.scheduler import CPU, NETWORK, ResourceScheduler
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Resource scheduler / batch run_scheduled stage test (no mock).')
+    p.add_argument('--items', type=int, default=6, help='Number of batch items pushed through run_scheduled.')
+    p.add_argument('--step-sec', type=float, default=0.05, help='Duration of each simulated step.')
+    return p.parse_args()
+
+
+def _wait_until(cond, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise RuntimeError('timed out waiting for scheduler state')
+        time.sleep(0.005)
+
+
+def _check_priority_order() -> list[int]:
+    scheduler = ResourceScheduler({NETWORK: 1})
+    res = scheduler._resources[NETWORK]
+    admitted: list[int] = []
+    hold = threading.Event()
+
+    def holder() -> None:
+        with scheduler.use(NETWORK, priority=0):
+            hold.wait()
+
+    def waiter(priority: int) -> None:
+        with scheduler.use(NETWORK, priority=priority):
+            admitted.append(priority)
+
+    threads = [threading.Thread(target=holder)]
+    threads[0].start()
+    _wait_until(lambda: res._free == 0)
+    for n, priority in enumerate((3, 1, 2), start=1):
+        t = threading.Thread(target=waiter, args=(priority,))
+        t.start()
+        threads.append(t)
+        # queue them one by one so arrival order differs from priority order
+        _wait_until(lambda: len(res._waiting) == n)
+    hold.set()
+    for t in threads:
+        t.join()
+    if admitted != [1, 2, 3]:
+        raise RuntimeError(f'waiters not admitted by priority: {admitted}')
+    return admitted
+
+
+def _check_slot_limit(step_sec: float) -> int:
+    scheduler = ResourceScheduler({CPU: 2})
+    lock = threading.Lock()
+    active = peak = 0
+
+    def task(priority: int) -> None:
+        nonlocal active, peak
+        with scheduler.use(CPU, priority=priority):
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(step_sec)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=task, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    usage = {u.name: u for u in scheduler.report()}[CPU]
+    if peak != 2 or usage.peak != 2:
+        raise RuntimeError(f'slot limit not respected: observed={peak} reported={usage.peak}')
+    if usage.tasks != 6 or usage.busy_sec <= 0:
+        raise RuntimeError(f'usage accounting mismatch: {usage}')
+    return usage.peak
+
+
+def _check_run_scheduled(n_items: int, step_sec: float) -> tuple[int, int]:
+    scheduler = ResourceScheduler({NETWORK: 2, CPU: 1})
+    lock = threading.Lock()
+    in_flight = max_in_flight_seen = 0
+    failing = 2
+
+    def fetch(i: int) -> int:
+        nonlocal in_flight, max_in_flight_seen
+        with lock:
+            in_flight += 1
+            max_in_flight_seen = max(max_in_flight_seen, in_flight)
+        # later items finish their first step sooner, so input order is not completion order
+        time.sleep(step_sec * (n_items - i) / n_items)
+        return i
+
+    def encode(i: int) -> int:
+        nonlocal in_flight
+        time.sleep(step_sec / 2)
+        with lock:
+            in_flight -= 1
+        if i == failing:
+            raise ValueError(f'encode failed for item {i}')
+        return i * 10
+
+    steps = [Step('fetch', NETWORK, fetch), Step('encode', CPU, encode)]
+    results = run_scheduled(list(range(n_items)), steps, scheduler, max_in_flight=2)
+
+    if max_in_flight_seen > 2:
+        raise RuntimeError(f'max_in_flight exceeded: {max_in_flight_seen}')
+    if [r.index for r in results] != list(range(n_items)):
+        raise RuntimeError(f'results not in input order: {[r.index for r in results]}')
+    for r in results:
+        if r.index == failing:
+            if not isinstance(r.error, ValueError) or r.failed_step != 'encode' or r.value is not None:
+                raise RuntimeError(f'failing item not recorded: {r}')
+        elif r.error is not None or r.value != r.index * 10:
+            raise RuntimeError(f'item {r.index} did not finish: {r}')
+    usage = {u.name: u for u in scheduler.report()}
+    if usage[NETWORK].tasks != n_items or usage[CPU].tasks != n_items or usage[CPU].peak != 1:
+        raise RuntimeError(f'scheduler accounting mismatch: {usage}')
+    return max_in_flight_seen, sum(1 for r in results if r.error is None)
+
+
+def main() -> int:
+    args = parse_args()
+    if args.items < 3:
+        raise SystemExit('--items must be at least 3')
+    admitted = _check_priority_order()
+    peak = _check_slot_limit(args.step_sec)
+    seen, ok = _check_run_scheduled(args.items, args.step_sec)
+    print(
+        f'[OK] scheduler stage completed: admitted={admitted} peak={peak} '
+        f'in_flight_max={seen} finished={ok}/{args.items}'
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
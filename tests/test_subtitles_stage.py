@@ -5,13 +5,16 @@ import argparse
 import tempfile
 from pathlib import Path
 
-from app.subtitles import Segment, sec_to_ass, sec_to_srt, write_ass, write_srt
+import numpy as np
+
+from app.subtitles import Segment, SegmentTable, sec_to_ass, sec_to_srt, write_ass, write_srt
 
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description='Real subtitles format/write stage test (no mock).')
     p.add_argument('--work-dir', type=Path, help='Work directory. If omitted, use a temporary directory.')
     p.add_argument('--text', type=str, default='hello\nworld', help='Subtitle text content to write.')
+    p.add_argument('--gap-trials', type=int, default=200, help='Random transcripts checked against the merge loop.')
     return p.parse_args()
 
 
@@ -41,8 +44,55 @@ def _run_once(base: Path, text: str) -> tuple[Path, Path]:
     return srt, ass
 
 
+def _group_by_gap_loop(segments: list[Segment], gap_limit: float, max_duration: float) -> list[tuple[int, int]]:
+    # the per-segment loop `group_by_gap` replaced, kept as the reference
+    groups: list[tuple[int, int]] = []
+    first = 0
+    for i in range(1, len(segments)):
+        gap = max(0.0, segments[i].start - segments[i - 1].end)
+        if gap > gap_limit or segments[i].end - segments[first].start > max_duration:
+            groups.append((first, i))
+            first = i
+    if segments:
+        groups.append((first, len(segments)))
+    return groups
+
+
+def _check_group_by_gap(trials: int) -> int:
+    rng = np.random.default_rng(7)
+    for trial in range(trials):
+        n = int(rng.integers(0, 40))
+        # gaps straddle the limit and some are negative, i.e. overlapping segments
+        starts = np.cumsum(rng.uniform(-0.3, 1.5, n)).clip(min=0.0)
+        ends = starts + rng.uniform(0.1, 4.0, n)
+        segments = [Segment(float(a), float(b), f'w{i}' if i % 5 else ' ') for i, (a, b) in enumerate(zip(starts, ends))]
+        gap_limit, max_duration = float(rng.uniform(0.0, 1.0)), float(rng.uniform(1.0, 12.0))
+
+        table = SegmentTable.from_segments(segments)
+        expected = _group_by_gap_loop(segments, gap_limit, max_duration)
+        got = table.group_by_gap(gap_limit, max_duration)
+        if got != expected:
+            raise RuntimeError(f'group_by_gap mismatch in trial {trial}: {got} != {expected}')
+        merged = table.merge_by_gap(gap_limit, max_duration)
+        want = [
+            Segment(segments[a].start, segments[b - 1].end, ' '.join(s.text.strip() for s in segments[a:b] if s.text.strip()))
+            for a, b in expected
+        ]
+        if [(m.start, m.end, m.text) for m in merged] != [(w.start, w.end, w.text) for w in want]:
+            raise RuntimeError(f'merge_by_gap mismatch in trial {trial}')
+
+    table = SegmentTable.from_segments([Segment(0.0, 1.0, 'a'), Segment(1.0, 2.0, 'b')])
+    shifted = table.shift(0.5)
+    shifted.texts[0] = 'changed'
+    if table.texts[0] != 'a':
+        raise RuntimeError('shift() must not share the texts list with its source')
+    return trials
+
+
 def main() -> int:
     args = parse_args()
+    trials = _check_group_by_gap(args.gap_trials)
+    print(f'[OK] group_by_gap matches the merge loop: trials={trials}')
     if args.work_dir:
         srt, ass = _run_once(args.work_dir.resolve(), args.text)
         print(f'[OK] subtitles stage completed: {srt} / {ass}')
@@ -7,7 +7,15 @@ from pathlib import Path
 
 from app.ffmpeg_tools import run_ffmpeg
 from app.settings import settings
-from app.transcriber import FastWhisperTranscriber
+from app.transcriber import (
+    FastWhisperTranscriber,
+    _merge_shard_segments,
+    _plan_shards,
+    _shard_clip_timestamps,
+    _shard_cpu_threads,
+)
+
+_SR = 16000
 
 
 def parse_args() -> argparse.Namespace:
@@ -21,6 +29,49 @@ def parse_args() -> argparse.Namespace:
     return p.parse_args()
 
 
+def _check_shard_helpers() -> str:
+    # speech at 0-2s, 3-5s, 6-8s, 9-10s of a 10s clip (sample offsets)
+    chunks = [{'start': a * _SR, 'end': b * _SR} for a, b in [(0, 2), (3, 5), (6, 8), (9, 10)]]
+    total = 10 * _SR
+    if _plan_shards(chunks, total, 1) != [(0, total)] or _plan_shards(chunks[:1], total, 4) != [(0, total)]:
+        raise RuntimeError('single shard plan mismatch')
+    ranges = _plan_shards(chunks, total, 2)
+    if ranges != [(0, int(5.5 * _SR)), (int(5.5 * _SR), total)]:
+        raise RuntimeError(f'shard cut not at the silence midpoint: {ranges}')
+    for start, end in _plan_shards(chunks, total, 3):
+        for c in chunks:
+            if c['start'] < end and c['end'] > start and not (start <= c['start'] and c['end'] <= end):
+                raise RuntimeError(f'speech chunk split across shards: {c} in {(start, end)}')
+    many = _plan_shards(chunks, total, 10)
+    if len(many) != 4 or many[0][0] != 0 or many[-1][1] != total:
+        raise RuntimeError(f'shard count not capped by silences: {many}')
+
+    clips = _shard_clip_timestamps(chunks, int(5.5 * _SR), total)
+    if clips != [0.5, 2.5, 3.5, 4.5]:
+        raise RuntimeError(f'shard clip timestamps mismatch: {clips}')
+
+    merged = _merge_shard_segments(
+        [
+            [(0.0, 2.0, 'Hello there'), (3.0, 5.2, 'second line')],
+            [(5.0, 5.4, 'Second  line'), (5.1, 6.0, 'overlap'), (6.0, 8.0, 'third')],
+        ]
+    )
+    if merged.texts != ['Hello there', 'second line', 'overlap', 'third']:
+        raise RuntimeError(f'shard merge texts mismatch: {merged.texts}')
+    if list(merged.ends) != [2.0, 5.4, 6.0, 8.0] or float(merged.starts[2]) != 5.4:
+        raise RuntimeError(f'shard merge timings mismatch: {merged.to_segments()}')
+
+    old_threads = settings.whisper_cpu_threads
+    try:
+        settings.whisper_cpu_threads = 8
+        threads = [_shard_cpu_threads(n) for n in (1, 3, 4, 16)]
+    finally:
+        settings.whisper_cpu_threads = old_threads
+    if threads != [8, 2, 2, 1]:
+        raise RuntimeError(f'configured CPU threads not split across shards: {threads}')
+    return f'shards={len(ranges)} merged={len(merged)} threads_per_shard={threads}'
+
+
 def _run_transcribe(audio_path: Path, model: str, source: str, language: str) -> int:
     old_model = settings.whisper_model
     old_source = settings.whisper_model_source
@@ -46,6 +97,7 @@ def _run_transcribe(audio_path: Path, model: str, source: str, language: str) ->
 
 def main() -> int:
     args = parse_args()
+    print(f'[OK] shard helpers: {_check_shard_helpers()}')
     if not args.run_real:
         print('[SKIP] transcriber stage skipped: add --run-real to execute real transcription')
         return 0
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.dubbing_segments import _build_from_words
+from app.word_timings import WordTimings, words_path_for
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description='Word timings sidecar / word-level dubbing segments stage test (no mock).')
+    p.add_argument('--work-dir', type=Path, help='Work directory. If omitted, use a temporary directory.')
+    return p.parse_args()
+
+
+def _whisper_segments(rows: list[list[tuple[str, float, float]]]) -> list[SimpleNamespace]:
+    """faster-whisper shaped segments: each has `.words` with word/start/end/probability."""
+    return [
+        SimpleNamespace(words=[SimpleNamespace(word=w, start=s, end=e, probability=0.9) for w, s, e in words])
+        for words in rows
+    ]
+
+
+def _check_round_trip(base: Path) -> WordTimings:
+    timings = WordTimings.from_whisper_segments(
+        _whisper_segments(
+            [
+                [(' Hello', 0.0, 0.4), (' world.', 0.45, 0.9)],
+                [],
+                [(' 你好', 2.0, 2.5)],
+            ]
+        )
+    )
+    if len(timings) != 3 or timings.segment_count != 3 or timings.word(2) != ' 你好':
+        raise RuntimeError(f'unexpected word timings: len={len(timings)} segments={timings.segment_count}')
+
+    srt = base / 'demo.srt'
+    srt.write_text('', encoding='utf-8')
+    path = timings.save(words_path_for(srt))
+    if path.name != 'demo.words.npz':
+        raise RuntimeError(f'unexpected sidecar name: {path.name}')
+    loaded = WordTimings.load_for_srt(srt, expected_segments=3)
+    if loaded is None:
+        raise RuntimeError('sidecar not loaded for a matching SRT')
+    for name in ('starts', 'ends', 'probabilities', 'segment_index', 'offsets'):
+        if not np.array_equal(getattr(loaded, name), getattr(timings, name)):
+            raise RuntimeError(f'round trip changed {name}')
+    if loaded.text != timings.text or loaded.text_range(0, 2) != 'Hello world.':
+        raise RuntimeError(f'round trip changed text: {loaded.text!r}')
+
+    # the SRT was re-segmented after the sidecar was written: fall back to SRT timing
+    if WordTimings.load_for_srt(srt, expected_segments=2) is not None:
+        raise RuntimeError('sidecar used although its segment count does not match the SRT')
+    path.write_bytes(b'not an npz')
+    if WordTimings.load_for_srt(srt, expected_segments=3) is not None:
+        raise RuntimeError('unreadable sidecar not ignored')
+    path.unlink()
+    if WordTimings.load_for_srt(srt, expected_segments=3) is not None:
+        raise RuntimeError('missing sidecar not reported as None')
+    return loaded
+
+
+def _check_build_from_words() -> int:
+    # one subtitle segment holding two sentences separated by a 1s pause
+    words = WordTimings.from_whisper_segments(
+        _whisper_segments(
+            [
+                [
+                    (' First', 0.0, 0.3),
+                    (' sentence.', 0.35, 0.8),
+                    (' Second', 1.8, 2.1),
+                    (' one', 2.15, 2.4),
+                    (' here.', 2.45, 2.9),
+                ]
+            ]
+        )
+    )
+    by_pause = _build_from_words(words, gap_limit=0.5, max_duration=10.0)
+    got = [(s.start, s.end, s.source_text) for s in by_pause]
+    if got != [(0.0, 0.8, 'First sentence.'), (1.8, 2.9, 'Second one here.')]:
+        raise RuntimeError(f'pause cut mismatch: {got}')
+
+    # no pause over the limit, but the duration cap forces a cut at the longest pause
+    capped = _build_from_words(words, gap_limit=5.0, max_duration=2.5)
+    got = [s.source_text for s in capped]
+    if got != ['First sentence.', 'Second one here.']:
+        raise RuntimeError(f'duration cut should land on the longest pause: {got}')
+    if [s.id for s in capped] != [1, 2]:
+        raise RuntimeError('segment ids not sequential')
+    return len(by_pause) + len(capped)
+
+
+def _run_once(base: Path) -> tuple[int, int]:
+    base.mkdir(parents=True, exist_ok=True)
+    loaded = _check_round_trip(base)
+    return len(loaded), _check_build_from_words()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.work_dir:
+        n_words, n_segments = _run_once(args.work_dir.resolve())
+    else:
+        with tempfile.TemporaryDirectory(prefix='word-timings-stage-') as td:
+            n_words, n_segments = _run_once(Path(td))
+    print(f'[OK] word timings stage completed: words={n_words} segments={n_segments}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())